@@ -47,6 +47,7 @@ def init(default_conf="client", **kwargs):
     if clear_mem_cache:
         H.clear()
     C.set(default_conf, **kwargs)
+    H.set_limit()
     get_module_logger.setLevel(C.logging_level)
 
     # mount nfs
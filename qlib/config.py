@@ -122,11 +122,25 @@ _default_config = {
     # cache
     "expression_cache": None,
     "calendar_cache": None,
+    # the directory of the memory-mapped calendars shared by the processes, a temporary directory is used if None
+    "calendar_cache_dir": None,
     # for simple dataset cache
     "local_cache_path": None,
     # kernels can be a fixed value or a callable function lie `def (freq: str) -> int`
     # If the kernels are arctic_kernels, `min(NUM_USABLE_CPU, 30)` may be a good value
     "kernels": NUM_USABLE_CPU,
+    # the dtype of the calculated features, e.g. "float32" or "float64"; the result of each expression, the dataset
+    # and the dataset cache are converted to it. The dtypes are not converted if it is None
+    "compute_dtype": None,
+    # how the workers of `DatasetProvider.dataset_processor` transfer the data of the instruments to the parent process
+    # "mmap": written into a panel in the shared memory (it requires free space for the whole panel in `/dev/shm`);
+    # "pickle": returned as the pickled DataFrames
+    "dataset_transfer": "pickle",
+    # trace the peak memory of each step of the processors of `DataHandlerLP` by `tracemalloc`, which slows them down
+    "trace_processor_memory": False,
+    # the directory to cache the fitted processors of `DataHandlerLP` (e.g. the medians of `RobustZScoreNorm`), which are
+    # loaded when the same processors are fitted on the same data again. The processors are not cached if it is None
+    "processor_fit_cache_dir": None,
     # pickle.dump protocol version
     "dump_protocol_version": PROTOCOL_VERSION,
     # How many tasks belong to one process. Recommend 1 for high-frequency data and None for daily data.
@@ -134,11 +148,24 @@ _default_config = {
     # If joblib_backend is None, use loky
     "joblib_backend": "multiprocessing",
     "default_disk_cache": 1,  # 0:skip/1:use
+    # the limit of the memory cache `H`, it could be a dict to set the limits of the namespaces separately,
+    # e.g. {"c": 500, "i": 500, "f": 4 * 1024 ** 3} with limit type {"c": "length", "i": "length", "f": "bytes"}
     "mem_cache_size_limit": 500,
+    # length/sizeof/bytes
     "mem_cache_limit_type": "length",
+    # keep the leaf features in the memory cache until all the derived expressions are evicted
+    "mem_cache_pin_feature": False,
+    # reuse the cached expressions of the overlapping ranges instead of recalculating them; only the audited
+    # operators (see `Expression.is_range_invariant`) are reused
+    "mem_cache_range": False,
+    # the max number of `.bin` files kept mapped by `MmapFeatureStorage` in each process
+    "mmap_cache_size_limit": 512,
     # memory cache expire second, only in used 'DatasetURICache' and 'client D.calendar'
     # default 1 hour
     "mem_cache_expire": 60 * 60,
+    # the format of the data of `DiskDatasetCache`: "hdf" or "parquet"
+    # the parquet cache only reads the row groups in the range and the columns of the fields, it requires pyarrow
+    "dataset_cache_format": "hdf",
     # cache dir name
     "dataset_cache_dir_name": "dataset_cache",
     "features_cache_dir_name": "features_cache",
@@ -147,6 +174,11 @@ _default_config = {
     "redis_host": "127.0.0.1",
     "redis_port": 6379,
     "redis_task_db": 1,
+    # the backend of the locks of the disk cache: "redis" or "file"
+    # "file" uses `fcntl.flock` on the lock files, which works across the processes on one machine without redis
+    "cache_lock_backend": "redis",
+    # the directory of the lock files of the "file" backend, the temporary directory is used if it is None
+    "cache_lock_dir": None,
     # This value can be reset via qlib.init
     "logging_level": logging.INFO,
     # Global configuration of qlib log
@@ -238,6 +270,15 @@ MODE_CONF = {
         # The nfs should be auto-mounted by qlib on other
         # serversS(such as PAI) [auto_mount:True]
         "timeout": 100,
+        # the transport of ClientProvider: "socketio" (the features are responded by the uri of the cache on the
+        # shared disk), "arrow" (the features are streamed in Arrow record batches, see `qlib.data.protocol`) or
+        # "local" (the features are mapped from the shared memory of `LocalFeatureServer` on `client_socket_path`)
+        "client_transport": "socketio",
+        "client_socket_path": None,
+        # the compression of the features of the "arrow" transport: None/"zstd"/"lz4"
+        "client_compression": None,
+        # the max number of the idle connections kept by the "arrow" transport
+        "client_pool_size": 4,
         "logging_level": logging.INFO,
         "region": REG_CN,
         # custom operator
@@ -425,7 +466,9 @@ class QlibConfig(Config):
 
         self.resolve_path()
 
-        if not (self["expression_cache"] is None and self["dataset_cache"] is None):
+        if self["cache_lock_backend"] == "redis" and not (
+            self["expression_cache"] is None and self["dataset_cache"] is None
+        ):
             # check redis
             if not can_use_cache():
                 log_str = ""
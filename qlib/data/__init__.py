@@ -18,6 +18,7 @@ from .data import (
     LocalPITProvider,
     LocalExpressionProvider,
     LocalDatasetProvider,
+    PanelDatasetProvider,
     ClientCalendarProvider,
     ClientInstrumentProvider,
     ClientDatasetProvider,
@@ -50,6 +51,7 @@ __all__ = [
     "LocalPITProvider",
     "LocalExpressionProvider",
     "LocalDatasetProvider",
+    "PanelDatasetProvider",
     "ClientCalendarProvider",
     "ClientInstrumentProvider",
     "ClientDatasetProvider",
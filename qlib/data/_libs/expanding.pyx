@@ -4,9 +4,11 @@ cimport cython
 cimport numpy as np
 import numpy as np
 
-from libc.math cimport sqrt, isnan, NAN
+from libc.math cimport sqrt, fabs, isnan, NAN
 from libcpp.vector cimport vector
 
+from qlib.data._libs.rolling import as_finite, rolling_mad
+
 
 cdef class Expanding:
     """1-D array expanding"""
@@ -150,3 +152,97 @@ def expanding_rsquare(np.ndarray a):
 def expanding_resi(np.ndarray a):
     cdef Resi r = Resi()
     return expanding(r, a)
+
+
+cdef np.ndarray[double, ndim=1] _expanding_argext(np.ndarray[double, ndim=1] a, bint is_max):
+    """1-D array expanding position (starts from 1) of the max/min
+
+    The same as `np.argmax`/`np.argmin` + 1 on the expanding data: the position of the first NaN is returned
+    if there is NaN.
+    """
+    cdef int  i
+    cdef int  best = -1
+    cdef int  first_nan = -1
+    cdef int  N = len(a)
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    for i in range(N):
+        if isnan(a[i]):
+            if first_nan < 0:
+                first_nan = i
+        elif best < 0 or (is_max and a[i] > a[best]) or (not is_max and a[i] < a[best]):
+            best = i
+        if best < 0:
+            ret[i] = NAN
+        elif first_nan >= 0:
+            ret[i] = first_nan + 1
+        else:
+            ret[i] = best + 1
+    return ret
+
+
+cdef np.ndarray[double, ndim=1] _expanding_wma(np.ndarray[double, ndim=1] a):
+    """1-D array expanding weighted mean
+
+    The weights are 1, 2, ..., size of the data (normalized), NaN is skipped when averaging.
+    """
+    cdef int  i
+    cdef int  count = 0
+    cdef int  N = len(a)
+    cdef double wsum = 0
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    for i in range(N):
+        if not isnan(a[i]):
+            wsum += (i + 1) * a[i]
+            count += 1
+        if count == 0:
+            ret[i] = NAN
+        else:
+            ret[i] = wsum / ((i + 1) * (i + 2) / 2.0) / count
+    return ret
+
+
+cdef np.ndarray[double, ndim=1] _expanding_ema(np.ndarray[double, ndim=1] a):
+    """1-D array expanding exponential weighted mean
+
+    The decay of the weights is 1 - 2 / (1 + size of the data), NaN is skipped when summing.
+
+    NOTE: the decay changes with the size of the data, so the weighted sum can't be updated from the previous one
+    and each value costs O(size) (O(n^2) for the array). The weighted sum is evaluated by Horner's method and the
+    sum of the weights is the closed form of the geometric series.
+    """
+    cdef int  i, j
+    cdef int  count = 0
+    cdef int  N = len(a)
+    cdef double alpha, vsum
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    for i in range(N):
+        if not isnan(a[i]):
+            count += 1
+        if count == 0:
+            ret[i] = NAN
+            continue
+        alpha = 1 - 2.0 / (i + 2)
+        vsum = 0
+        for j in range(i + 1):
+            vsum *= alpha
+            if not isnan(a[j]):
+                vsum += a[j]
+        # sum(alpha ** k for k in range(i + 1))
+        ret[i] = vsum * (1 - alpha) / (1 - alpha ** (i + 1))
+    return ret
+
+def expanding_idxmax(np.ndarray a):
+    return _expanding_argext(as_finite(a), True)
+
+def expanding_idxmin(np.ndarray a):
+    return _expanding_argext(as_finite(a), False)
+
+def expanding_mad(np.ndarray a):
+    # the expanding window is the rolling window of the whole length, O(n log n)
+    return rolling_mad(a, max(len(a), 1))
+
+def expanding_wma(np.ndarray a):
+    return _expanding_wma(as_finite(a))
+
+def expanding_ema(np.ndarray a):
+    return _expanding_ema(as_finite(a))
@@ -4,7 +4,7 @@ cimport cython
 cimport numpy as np
 import numpy as np
 
-from libc.math cimport sqrt, isnan, NAN
+from libc.math cimport sqrt, fabs, isnan, NAN
 from libcpp.deque cimport deque
 
 
@@ -205,3 +205,165 @@ def rolling_rsquare(np.ndarray a, int window):
 def rolling_resi(np.ndarray a, int window):
     cdef Resi r = Resi(window)
     return rolling(r, a)
+
+
+cdef np.ndarray[double, ndim=1] _rolling_argext(np.ndarray[double, ndim=1] a, int window, bint is_max):
+    """1-D array rolling position (starts from 1) of the max/min in the window
+
+    The same as `np.argmax`/`np.argmin` + 1 on each window: the position of the first NaN is returned
+    if there is NaN in the window.
+    """
+    cdef int  i, start
+    cdef int  N = len(a)
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    # the candidates of the max/min: the values are monotonic and the first occurrence is kept
+    cdef deque[int] cand
+    cdef deque[int] nans
+    for i in range(N):
+        start = i - window + 1
+        if start < 0:
+            start = 0
+        if isnan(a[i]):
+            nans.push_back(i)
+        else:
+            if is_max:
+                while not cand.empty() and a[cand.back()] < a[i]:
+                    cand.pop_back()
+            else:
+                while not cand.empty() and a[cand.back()] > a[i]:
+                    cand.pop_back()
+            cand.push_back(i)
+        while not cand.empty() and cand.front() < start:
+            cand.pop_front()
+        while not nans.empty() and nans.front() < start:
+            nans.pop_front()
+        if cand.empty():
+            ret[i] = NAN
+        elif not nans.empty():
+            ret[i] = nans.front() - start + 1
+        else:
+            ret[i] = cand.front() - start + 1
+    return ret
+
+
+cdef np.ndarray[double, ndim=1] _rolling_mad(np.ndarray[double, ndim=1] a, int window):
+    """1-D array rolling mean absolute deviation, NaN is skipped
+
+    The values in the window are kept in two Fenwick trees (the counts and the sums) indexed by the ranks of the values,
+    so the sum of the deviations is `mean * count_below - sum_below + sum_above - mean * count_above`, which is got by
+    a binary search of the mean and a prefix query in O(log n) instead of scanning the window.
+    """
+    cdef int  i, j, k, count
+    cdef int  N = len(a)
+    cdef double offset, mean, below, dsum, total
+    cdef int  cnt_below
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    cdef np.ndarray[np.int64_t, ndim=1] valid = np.flatnonzero(~np.isnan(a))
+    cdef int  M = len(valid)
+    if M == 0:
+        ret[:] = NAN
+        return ret
+    # the deviations are irrelevant to the offset, which keeps the sums small
+    offset = a[valid].mean()
+    cdef np.ndarray[double, ndim=1] b = a - offset
+    cdef np.ndarray[np.int64_t, ndim=1] order = valid[np.argsort(b[valid], kind="stable")]
+    cdef np.ndarray[double, ndim=1] sorted_b = b[order]
+    # the 1-based rank of each value, 0 for NaN
+    cdef np.ndarray[np.int64_t, ndim=1] rank = np.zeros(N, dtype=np.int64)
+    rank[order] = np.arange(1, M + 1)
+    cdef np.ndarray[np.int64_t, ndim=1] cnt_tree = np.zeros(M + 1, dtype=np.int64)
+    cdef np.ndarray[double, ndim=1] sum_tree = np.zeros(M + 1)
+    count = 0
+    for i in range(N):
+        if i >= window and rank[i - window] > 0:
+            k = rank[i - window]
+            while k <= M:
+                cnt_tree[k] -= 1
+                sum_tree[k] -= b[i - window]
+                k += k & -k
+            count -= 1
+        if rank[i] > 0:
+            k = rank[i]
+            while k <= M:
+                cnt_tree[k] += 1
+                sum_tree[k] += b[i]
+                k += k & -k
+            count += 1
+        if count == 0:
+            ret[i] = NAN
+            continue
+        total = 0
+        k = M
+        while k > 0:
+            total += sum_tree[k]
+            k -= k & -k
+        mean = total / count
+        # the number of the values <= mean in all the data
+        j = 0
+        k = M
+        while j < k:
+            if sorted_b[(j + k) >> 1] <= mean:
+                j = ((j + k) >> 1) + 1
+            else:
+                k = (j + k) >> 1
+        cnt_below = 0
+        below = 0
+        k = j
+        while k > 0:
+            cnt_below += cnt_tree[k]
+            below += sum_tree[k]
+            k -= k & -k
+        dsum = mean * cnt_below - below + (total - below) - mean * (count - cnt_below)
+        ret[i] = (dsum if dsum > 0 else 0) / count
+    return ret
+
+
+cdef np.ndarray[double, ndim=1] _rolling_wma(np.ndarray[double, ndim=1] a, int window):
+    """1-D array rolling weighted mean
+
+    The weights of the window are 1, 2, ..., size of the window (normalized), NaN is skipped when averaging.
+    """
+    cdef int  i, size
+    cdef int  count = 0
+    cdef int  N = len(a)
+    cdef double vsum = 0  # sum of the values in the window
+    cdef double wsum = 0  # sum of the weighted values in the window
+    cdef np.ndarray[double, ndim=1] ret = np.empty(N)
+    for i in range(N):
+        if i >= window:
+            # all the weights decrease by 1 and the weight of the dropped value becomes 0
+            wsum -= vsum
+            if not isnan(a[i - window]):
+                vsum -= a[i - window]
+                count -= 1
+            size = window
+        else:
+            size = i + 1
+        if not isnan(a[i]):
+            wsum += size * a[i]
+            vsum += a[i]
+            count += 1
+        if count == 0:
+            ret[i] = NAN
+        else:
+            ret[i] = wsum / (size * (size + 1) / 2.0) / count
+    return ret
+
+def as_finite(np.ndarray a):
+    """the values in float64 with +/-inf replaced by NaN, like the window functions of pandas"""
+    a = np.asarray(a, dtype=np.float64)
+    if np.isinf(a).any():
+        a = np.where(np.isinf(a), np.nan, a)
+    return a
+
+def rolling_idxmax(np.ndarray a, int window):
+    return _rolling_argext(as_finite(a), window, True)
+
+def rolling_idxmin(np.ndarray a, int window):
+    return _rolling_argext(as_finite(a), window, False)
+
+def rolling_mad(np.ndarray a, int window):
+    return _rolling_mad(as_finite(a), window)
+
+def rolling_wma(np.ndarray a, int window):
+    return _rolling_wma(as_finite(a), window)
@@ -6,8 +6,68 @@ from __future__ import division
 from __future__ import print_function
 
 import abc
+import numpy as np
 import pandas as pd
 from ..log import get_module_logger
+from ..utils import astype_compute_dtype
+
+
+class PanelContext:
+    """The state shared by the expressions evaluated on one panel
+
+    A panel is a `pd.DataFrame` indexed by the calendar index with one column per instrument, so an operator
+    is applied to a group of instruments at once instead of instrument by instrument.
+
+    Parameters
+    ----------
+    instruments : list
+        the instruments, i.e. the columns of the panels.
+    start_index : int
+        the start index [in calendar] the leaf features are loaded from; narrower ranges are sliced from it.
+    end_index : int
+        the end index [in calendar] the leaf features are loaded to.
+    """
+
+    def __init__(self, instruments, start_index=None, end_index=None):
+        self.instruments = list(instruments)
+        self.start_index = start_index
+        self.end_index = end_index
+        # the panels of the leaf features, shared by all the expressions: {(feature, freq): (panel, mask)}
+        self.features = {}
+        # the panels of the operators of the expression being evaluated
+        self.cache = {}
+        # the leaf features the expression being evaluated depends on
+        self.used = set()
+
+    def reset(self):
+        """start the evaluation of a new expression"""
+        self.cache.clear()
+        self.used.clear()
+
+    def mask(self, start_index, end_index):
+        """the rows in [start_index, end_index] each instrument has data for in the leaf features used since `reset`
+
+        The per-instrument data of an expression is indexed by the union of the indexes of its leaf features,
+        so this is the part of the panel which exists in the per-instrument result.
+
+        Returns
+        -------
+        np.ndarray
+            a bool array with the shape (end_index - start_index + 1, len(instruments))
+        """
+        mask = np.zeros((end_index - start_index + 1, len(self.instruments)), dtype=bool)
+        for key in self.used:
+            panel, _mask = self.features[key]
+            _start = panel.index[0] if len(panel.index) > 0 else start_index
+            lo, hi = max(start_index, _start), min(end_index, _start + len(panel.index) - 1)
+            if lo <= hi:
+                mask[lo - start_index : hi - start_index + 1] |= _mask[lo - _start : hi - _start + 1]
+        return mask
+
+
+def _slice(series, start_index, end_index):
+    # the empty series may not have an integer index
+    return series if series.empty else series.loc[start_index:end_index]
 
 
 class Expression(abc.ABC):
@@ -181,16 +241,23 @@ class Expression(abc.ABC):
         pd.Series
             feature series: The index of the series is the calendar index
         """
+        from ..config import C  # pylint: disable=C0415
         from .cache import H  # pylint: disable=C0415
 
         # cache
         cache_key = str(self), instrument, start_index, end_index, *args
-        if cache_key in H["f"]:
-            return H["f"][cache_key]
+        series = H["f"].get(cache_key)
+        if series is not None:
+            return series
         if start_index is not None and end_index is not None and start_index > end_index:
             raise ValueError("Invalid index range: {} {}".format(start_index, end_index))
         try:
-            series = self._load_internal(instrument, start_index, end_index, *args)
+            if type(self)._load_internal is Feature._load_internal and self._use_range_cache(start_index, end_index):
+                # the leaf features only load the ranges which are not cached yet
+                series = self._load_range(instrument, start_index, end_index, args, self._load_internal)
+                series = _slice(series, start_index, end_index)
+            else:
+                series = self._load_internal(instrument, start_index, end_index, *args)
         except Exception as e:
             get_module_logger("data").debug(
                 f"Loading data error: instrument={instrument}, expression={str(self)}, "
@@ -198,14 +265,237 @@ class Expression(abc.ABC):
                 f"error info: {str(e)}"
             )
             raise
+        # keep the compute dtype (e.g. the rolling and arithmetic operators of pandas upcast float32 to float64)
+        series = astype_compute_dtype(series)
         series.name = str(self)
         H["f"][cache_key] = series
+        if C.get("mem_cache_pin_feature", False) and isinstance(self, Feature):
+            # the leaf features are the most expensive to reload
+            H["f"].pin(cache_key)
+        return series
+
+    def load_range(self, instrument, start_index, end_index, *args):
+        """load feature like `load`, reusing the cached results of the other ranges
+
+        If the range is covered by a cached range, the result is sliced from the cached series. Otherwise only the
+        missing parts are loaded, and they are merged with the overlapping or adjacent cached ranges into one
+        cached series.
+
+        The values in the extended window (i.e. the first `lft_etd` and the last `rght_etd` values of the range, see
+        `get_extended_window_size`) may differ from `load` because they are calculated with more data. So the
+        result should be sliced like `ExpressionProvider.expression` does. The expressions whose results depend on
+        the range they are loaded with (see `is_range_invariant`) are loaded by `load` directly.
+
+        Parameters
+        ----------
+        instrument : str
+            instrument code.
+        start_index : int
+            feature start index [in calendar].
+        end_index : int
+            feature end  index  [in calendar].
+
+        Returns
+        ----------
+        pd.Series
+            feature series: The index of the series is the calendar index
+        """
+        from .cache import H  # pylint: disable=C0415
+
+        if not self._use_range_cache(start_index, end_index) or not self.is_range_invariant():
+            return self.load(instrument, start_index, end_index, *args)
+        series = H["f"].get((str(self), instrument, start_index, end_index, *args))
+        if series is not None:
+            return series
+        series = self._load_range(instrument, start_index, end_index, args, self.load)
+        return _slice(series, start_index, end_index)
+
+    def find_range(self, instrument, start_index, end_index, *args):
+        """find the cached result covering the range, see `load_range`
+
+        Returns
+        ----------
+        Union[pd.Series, None]
+            the cached series sliced to the range, None if the range is not covered by any cached range
+        """
+        if not self._use_range_cache(start_index, end_index) or not self.is_range_invariant():
+            return None
+        series = self._load_range(instrument, start_index, end_index, args, None)
+        return None if series is None else _slice(series, start_index, end_index)
+
+    def is_range_invariant(self):
+        """whether the values of the expression are irrelevant to the range it is loaded with
+
+        Only the values in the extended window (see `get_extended_window_size`) are affected by the range for most
+        of the expressions. But the expressions like `Mean($close, 0)`, `EMA($close, 10)` and `FFillNan($close)`
+        depend on all the history in the range, so their cached results can't be shared between different ranges.
+
+        It is opt-in: only the classes setting `range_invariant = True` themselves (not inherited from their parents)
+        are range invariant, so the subclasses and the custom operators are always calculated with the queried
+        range unless they are audited.
+        """
+        if not type(self).__dict__.get("range_invariant", False):
+            return False
+        return all(e.is_range_invariant() for e in self.get_dependencies())
+
+    @staticmethod
+    def _use_range_cache(start_index, end_index):
+        from ..config import C  # pylint: disable=C0415
+
+        return (
+            C.get("mem_cache_range", False)
+            and isinstance(start_index, (int, np.integer))
+            and isinstance(end_index, (int, np.integer))
+        )
+
+    def _load_range(self, instrument, start_index, end_index, args, loader):
+        """load the range by merging the cached ranges and the missing ranges loaded by `loader`
+
+        The merged series is the same as loading the expression with the merged range, and it replaces the merged
+        ranges in the cache. If `loader` is None, only the cached series covering the range is returned.
+        """
+        from ..config import C  # pylint: disable=C0415
+        from .cache import H  # pylint: disable=C0415
+
+        lft_etd, rght_etd = self.get_extended_window_size()
+        name = str(self)
+
+        def _valid(lo, hi):
+            # the range in which the values are the same as loading with any larger range
+            return (lo + lft_etd if lo > 0 else 0), hi - rght_etd
+
+        lo, hi = _valid(start_index, end_index)
+        if lo > hi:
+            return None if loader is None else loader(instrument, start_index, end_index, *args)
+        pieces = []
+        for rng in H["f"].get_ranges(name, instrument, *args):
+            v_lo, v_hi = _valid(*rng)
+            if v_lo <= v_hi and v_lo <= hi + 1 and v_hi >= lo - 1:
+                if v_lo <= lo and v_hi >= hi:
+                    return H["f"][(name, instrument, *rng, *args)]
+                pieces.append((v_lo, v_hi, rng))
+        if loader is None:
+            return None
+
+        gaps = []
+        cur = lo
+        for v_lo, v_hi, _ in sorted(pieces):
+            if cur < v_lo and cur <= hi:
+                gaps.append((cur, min(v_lo - 1, hi)))
+            cur = max(cur, v_hi + 1)
+        if cur <= hi:
+            gaps.append((cur, hi))
+        data = {rng: H["f"][(name, instrument, *rng, *args)] for _, _, rng in pieces}
+        for g_lo, g_hi in gaps:
+            rng = max(0, g_lo - lft_etd), g_hi + rght_etd
+            data[rng] = loader(instrument, *rng, *args)
+            pieces.append((*_valid(*rng), rng))
+
+        # the first piece keeps the values before its valid range and the last one keeps the values after it
+        pieces.sort()
+        parts = []
+        cur = None
+        for v_lo, v_hi, rng in pieces:
+            if cur is None:
+                parts.append(_slice(data[rng], None, v_hi))
+                merged_lo, cur, last = rng[0], v_hi, rng
+            elif v_hi > cur:
+                parts.append(_slice(data[rng], cur + 1, v_hi))
+                cur, last = v_hi, rng
+        parts.append(_slice(data[last], cur + 1, None))
+        series = data[last] if len(pieces) == 1 else pd.concat(parts)
+        series.name = name
+
+        merged_key = name, instrument, merged_lo, last[1], *args
+        for rng in data:
+            key = name, instrument, *rng, *args
+            if key != merged_key and H["f"].peek(key) is not None:
+                H["f"].pop(key)
+        H["f"][merged_key] = series
+        H["f"].index_range(merged_key)
+        if C.get("mem_cache_pin_feature", False) and isinstance(self, Feature):
+            H["f"].pin(merged_key)
         return series
 
     @abc.abstractmethod
     def _load_internal(self, instrument, start_index, end_index, *args) -> pd.Series:
         raise NotImplementedError("This function must be implemented in your newly defined feature")
 
+    def load_panel(self, ctx, start_index, end_index, *args):
+        """load feature of all the instruments in ``ctx`` as a panel
+
+        This is the vectorized counterpart of `load`: the result holds the same values as calling `load` for each
+        instrument, aligned to the calendar index range [start_index, end_index] with NaN on the missing dates.
+
+        Parameters
+        ----------
+        ctx : PanelContext
+            the instruments and the panels shared during the evaluation.
+        start_index : int
+            feature start index [in calendar].
+        end_index : int
+            feature end  index  [in calendar].
+
+        Returns
+        ----------
+        pd.DataFrame
+            feature panel: the index is the calendar index and the columns are the instruments
+
+        Raises
+        ----------
+        NotImplementedError
+            the expression can't be calculated on a panel, it should be loaded instrument by instrument
+        """
+        cache_key = str(self), start_index, end_index, *args
+        if cache_key in ctx.cache:
+            return ctx.cache[cache_key]
+        if start_index is not None and end_index is not None and start_index > end_index:
+            raise ValueError("Invalid index range: {} {}".format(start_index, end_index))
+        if not self._support_panel():
+            raise NotImplementedError(f"{type(self).__name__} does not support panel calculation")
+        try:
+            panel = self._load_panel_internal(ctx, start_index, end_index, *args)
+        except NotImplementedError:
+            raise
+        except Exception as e:
+            get_module_logger("data").debug(
+                f"Loading panel error: expression={str(self)}, "
+                f"start_index={start_index}, end_index={end_index}, args={args}. "
+                f"error info: {str(e)}"
+            )
+            raise
+        panel = astype_compute_dtype(panel)
+        ctx.cache[cache_key] = panel
+        return panel
+
+    def _support_panel(self):
+        # An expression overriding `_load_internal` without overriding `_load_panel_internal` can't reuse the panel
+        # calculation of its parent class
+        for klass in type(self).__mro__:
+            if "_load_panel_internal" in vars(klass):
+                return True
+            if "_load_internal" in vars(klass):
+                return False
+        return False
+
+    def _load_panel_internal(self, ctx, start_index, end_index, *args) -> pd.DataFrame:
+        raise NotImplementedError(f"{type(self).__name__} does not support panel calculation")
+
+    def get_dependencies(self):
+        """Get the sub-expressions this expression loads with the same instrument and arguments
+
+        This is designed for sharing the calculation of the common sub-expressions of different expressions
+        (e.g. `$close` in `Mean($close, 5) / $close`). The sub-expressions loaded with another instrument
+        (e.g. `ChangeInstrument`) or other arguments (e.g. `P`) are calculated inside the expression, so they are not
+        included.
+
+        Returns
+        ----------
+        List[Expression]
+            the sub-expressions which are loaded with the same `start_index`, `end_index` and `args`
+        """
+        return []
+
     @abc.abstractmethod
     def get_longest_back_rolling(self):
         """Get the longest length of historical data the feature has accessed
@@ -241,6 +531,8 @@ class Feature(Expression):
     This kind of feature will load data from provider
     """
 
+    range_invariant = True
+
     def __init__(self, name=None):
         if name:
             self._name = name
@@ -256,6 +548,30 @@ class Feature(Expression):
 
         return FeatureD.feature(instrument, str(self), start_index, end_index, freq)
 
+    def _load_panel_internal(self, ctx, start_index, end_index, freq):
+        from .data import FeatureD  # pylint: disable=C0415
+
+        key = str(self), freq
+        if key in ctx.features:
+            panel, _ = ctx.features[key]
+            if len(panel.index) == 0 or panel.index[0] > start_index or panel.index[-1] < end_index:
+                del ctx.features[key]
+        if key not in ctx.features:
+            lo = start_index if ctx.start_index is None else min(start_index, ctx.start_index)
+            hi = end_index if ctx.end_index is None else max(end_index, ctx.end_index)
+            index = pd.RangeIndex(lo, hi + 1)
+            mask = np.zeros((len(index), len(ctx.instruments)), dtype=bool)
+            data = {}
+            for i, inst in enumerate(ctx.instruments):
+                series = FeatureD.feature(inst, str(self), lo, hi, freq)
+                if not series.empty:
+                    mask[series.index[0] - lo : series.index[-1] - lo + 1, i] = True
+                data[inst] = series
+            panel = pd.DataFrame(data, index=index, columns=ctx.instruments, dtype=np.float32)
+            ctx.features[key] = panel, mask
+        ctx.used.add(key)
+        return ctx.features[key][0].loc[start_index:end_index]
+
     def get_longest_back_rolling(self):
         return 0
 
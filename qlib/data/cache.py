@@ -14,10 +14,12 @@ import traceback
 import redis_lock
 import contextlib
 import abc
+import hashlib
+import tempfile
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from typing import Union, Iterable
+from typing import List, Union, Iterable
 from collections import OrderedDict
 
 from ..config import C
@@ -29,24 +31,59 @@ from ..utils import (
     remove_fields_space,
     normalize_cache_fields,
     normalize_cache_instruments,
+    astype_compute_dtype,
 )
 
 from ..log import get_module_logger
 from .base import Feature
 from .ops import Operators  # pylint: disable=W0611  # noqa: F401
 
+try:
+    import fcntl
+except ImportError:
+    # fcntl is not available on Windows
+    fcntl = None
+
+# the magic number at the beginning of the parquet files
+PARQUET_MAGIC = b"PAR1"
+
+
+def _import_parquet():
+    try:
+        import pyarrow as pa  # pylint: disable=C0415
+        import pyarrow.parquet as pq  # pylint: disable=C0415
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required by the parquet dataset cache, please install it by `pip install pyarrow`"
+        ) from e
+    return pa, pq
+
 
 class QlibCacheException(RuntimeError):
     pass
 
 
 class MemCacheUnit(abc.ABC):
-    """Memory Cache Unit."""
+    """Memory Cache Unit.
+
+    A LRU cache limited by `size_limit` (no limit if `size_limit` <= 0). The size of each item is decided by
+    `_get_value_size`.
+
+    The items can be pinned by `pin`: the pinned items are evicted only when there is no unpinned item left, so that
+    the expensive items (e.g. the leaf features loaded from the disk) are kept longer than the cheap ones.
+    """
 
     def __init__(self, *args, **kwargs):
         self.size_limit = kwargs.pop("size_limit", 0)
         self._size = 0
         self.od = OrderedDict()
+        # the pinned items, evicted after all the items in `od`
+        self.pinned_od = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # {(name, instrument, *args): {(start_index, end_index)}}, the ranges of the indexed items
+        self._ranges = {}
 
     def __setitem__(self, key, value):
         # TODO: thread safe?__setitem__ failure might cause inconsistent size?
@@ -54,32 +91,44 @@ class MemCacheUnit(abc.ABC):
         # precalculate the size after od.__setitem__
         self._adjust_size(key, value)
 
-        self.od.__setitem__(key, value)
+        od = self.pinned_od if key in self.pinned_od else self.od
+        od.__setitem__(key, value)
 
         # move the key to end,make it latest
-        self.od.move_to_end(key)
+        od.move_to_end(key)
 
-        if self.limited:
-            # pop the oldest items beyond size limit
-            while self._size > self.size_limit:
-                self.popitem(last=False)
+        self._evict()
 
     def __getitem__(self, key):
-        v = self.od.__getitem__(key)
-        self.od.move_to_end(key)
+        od = self.pinned_od if key in self.pinned_od else self.od
+        v = od.__getitem__(key)
+        od.move_to_end(key)
         return v
 
     def __contains__(self, key):
-        return key in self.od
+        return key in self.od or key in self.pinned_od
+
+    def get(self, key, default=None):
+        """look up the item of `key` like `__getitem__`, `default` if it is not cached
+
+        The hits and misses of the lookups by `get` are counted in `stats`, the other accesses (e.g. `key in cache`
+        and `cache[key]`) don't change the counters.
+        """
+        if key not in self:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return self[key]
 
     def __len__(self):
-        return self.od.__len__()
+        return self.od.__len__() + self.pinned_od.__len__()
 
     def __repr__(self):
-        return f"{self.__class__.__name__}<size_limit:{self.size_limit if self.limited else 'no limit'} total_size:{self._size}>\n{self.od.__repr__()}"
+        return f"{self.__class__.__name__}<size_limit:{self.size_limit if self.limited else 'no limit'} total_size:{self._size}>\n{self.od.__repr__()}\npinned: {self.pinned_od.__repr__()}"
 
     def set_limit_size(self, limit):
         self.size_limit = limit
+        self._evict()
 
     @property
     def limited(self):
@@ -90,25 +139,90 @@ class MemCacheUnit(abc.ABC):
     def total_size(self):
         return self._size
 
+    @property
+    def stats(self) -> dict:
+        """the counters of the cache: hits and misses of `get`, evictions, the number of (pinned) items and the total size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self),
+            "pinned": len(self.pinned_od),
+            "size": self._size,
+            "size_limit": self.size_limit,
+        }
+
+    def keys(self):
+        return list(self.od.keys()) + list(self.pinned_od.keys())
+
     def clear(self):
         self._size = 0
         self.od.clear()
+        self.pinned_od.clear()
+        self._ranges.clear()
+
+    def peek(self, key, default=None):
+        """get the item of `key` without updating the order and the counters"""
+        if key in self.od:
+            return self.od[key]
+        return self.pinned_od.get(key, default)
+
+    def index_range(self, key):
+        """index the range of the item of `key`
+
+        The format of `key` is `(name, instrument, start_index, end_index, *args)`, which is the key of the
+        expressions in `H["f"]`. The ranges of the indexed items with the same `name`, `instrument` and `args` can
+        be got by `get_ranges` without scanning the cache. The range is removed from the index with the item.
+        """
+        if key in self.od or key in self.pinned_od:
+            self._ranges.setdefault((key[0], key[1], *key[4:]), set()).add((key[2], key[3]))
+
+    def get_ranges(self, name, instrument, *args) -> list:
+        """the sorted ranges of the indexed items of `name`, `instrument` and `args`"""
+        return sorted(self._ranges.get((name, instrument, *args), ()))
+
+    def _unindex_range(self, key):
+        if self._ranges and isinstance(key, tuple) and len(key) >= 4:
+            group = key[0], key[1], *key[4:]
+            ranges = self._ranges.get(group)
+            if ranges is not None:
+                ranges.discard((key[2], key[3]))
+                if not ranges:
+                    del self._ranges[group]
+
+    def pin(self, key):
+        """pin the item of `key`, it will be evicted after the unpinned items"""
+        if key in self.od:
+            self.pinned_od[key] = self.od.pop(key)
 
     def popitem(self, last=True):
-        k, v = self.od.popitem(last=last)
+        od = self.od if len(self.od) > 0 else self.pinned_od
+        k, v = od.popitem(last=last)
         self._size -= self._get_value_size(v)
+        self._unindex_range(k)
 
         return k, v
 
     def pop(self, key):
-        v = self.od.pop(key)
+        od = self.pinned_od if key in self.pinned_od else self.od
+        v = od.pop(key)
         self._size -= self._get_value_size(v)
+        self._unindex_range(key)
 
         return v
 
+    def _evict(self):
+        if self.limited:
+            # pop the oldest items beyond size limit
+            while self._size > self.size_limit and len(self) > 0:
+                self.popitem(last=False)
+                self.evictions += 1
+
     def _adjust_size(self, key, value):
         if key in self.od:
             self._size -= self._get_value_size(self.od[key])
+        elif key in self.pinned_od:
+            self._size -= self._get_value_size(self.pinned_od[key])
 
         self._size += self._get_value_size(value)
 
@@ -133,33 +247,98 @@ class MemCacheSizeofUnit(MemCacheUnit):
         return sys.getsizeof(value)
 
 
+class MemCacheBytesUnit(MemCacheUnit):
+    """Memory Cache Unit limited by the bytes of the data
+
+    Unlike `MemCacheSizeofUnit`, the data in the containers (e.g. the `(value, time)` tuples of `MemCacheExpire`)
+    are counted, and the numpy arrays are counted by `nbytes` even if they are views.
+    """
+
+    def __init__(self, size_limit=0):
+        super().__init__(size_limit=size_limit)
+
+    def _get_value_size(self, value):
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(index=True, deep=False))
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(index=True, deep=False).sum())
+        if isinstance(value, (np.ndarray, pd.Index)):
+            return int(value.nbytes)
+        if isinstance(value, (tuple, list)):
+            return sys.getsizeof(value) + sum(self._get_value_size(v) for v in value)
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(self._get_value_size(v) for v in value.values())
+        return sys.getsizeof(value)
+
+
 class MemCache:
     """Memory cache."""
 
+    NAMESPACES = ("c", "i", "f")
+
     def __init__(self, mem_cache_size_limit=None, limit_type="length"):
         """
 
         Parameters
         ----------
         mem_cache_size_limit:
-            cache max size.
+            cache max size; it could be a dict to set different limits for different namespaces (e.g.
+            `{"c": 500, "i": 500, "f": 4 * 1024 ** 3}`), the namespaces not in the dict are not limited.
         limit_type:
-            length or sizeof; length(call fun: len), size(call fun: sys.getsizeof).
+            length or sizeof or bytes; length(call fun: len), size(call fun: sys.getsizeof),
+            bytes(the bytes of the data, see `MemCacheBytesUnit`); it could be a dict like `mem_cache_size_limit`.
         """
+        self.__calendar_mem_cache = None
+        self.__instrument_mem_cache = None
+        self.__feature_mem_cache = None
+        self.set_limit(mem_cache_size_limit, limit_type)
 
+    def set_limit(self, mem_cache_size_limit=None, limit_type=None):
+        """set the limits of the namespaces; the items exceeding the new limits are evicted
+
+        The parameters are the same as `__init__`, and the values in `C` are used if they are None.
+        """
         size_limit = C.mem_cache_size_limit if mem_cache_size_limit is None else mem_cache_size_limit
         limit_type = C.mem_cache_limit_type if limit_type is None else limit_type
 
-        if limit_type == "length":
-            klass = MemCacheLengthUnit
-        elif limit_type == "sizeof":
-            klass = MemCacheSizeofUnit
-        else:
-            raise ValueError(f"limit_type must be length or sizeof, your limit_type is {limit_type}")
+        units = []
+        for ns in self.NAMESPACES:
+            _size_limit = size_limit.get(ns, 0) if isinstance(size_limit, dict) else size_limit
+            _limit_type = limit_type.get(ns, "length") if isinstance(limit_type, dict) else limit_type
+            if _limit_type == "length":
+                klass = MemCacheLengthUnit
+            elif _limit_type == "sizeof":
+                klass = MemCacheSizeofUnit
+            elif _limit_type == "bytes":
+                klass = MemCacheBytesUnit
+            else:
+                raise ValueError(f"limit_type must be length, sizeof or bytes, your limit_type is {_limit_type}")
 
-        self.__calendar_mem_cache = klass(size_limit)
-        self.__instrument_mem_cache = klass(size_limit)
-        self.__feature_mem_cache = klass(size_limit)
+            unit = self[ns] if self._get_unit(ns) is not None else None
+            if type(unit) is klass:  # pylint: disable=C0123
+                unit.set_limit_size(_size_limit)
+            else:
+                new_unit = klass(_size_limit)
+                if unit is not None:
+                    # keep the items from the oldest to the latest
+                    for key in list(unit.od.keys()):
+                        new_unit[key] = unit.od[key]
+                    for key in list(unit.pinned_od.keys()):
+                        new_unit[key] = unit.pinned_od[key]
+                        new_unit.pin(key)
+                    for (name, instrument, *args), ranges in unit._ranges.items():
+                        for start_index, end_index in ranges:
+                            new_unit.index_range((name, instrument, start_index, end_index, *args))
+                unit = new_unit
+            units.append(unit)
+        self.__calendar_mem_cache, self.__instrument_mem_cache, self.__feature_mem_cache = units
+
+    def _get_unit(self, key):
+        return {
+            "c": self.__calendar_mem_cache,
+            "i": self.__instrument_mem_cache,
+            "f": self.__feature_mem_cache,
+        }[key]
 
     def __getitem__(self, key):
         if key == "c":
@@ -171,6 +350,11 @@ class MemCache:
         else:
             raise KeyError("Unknown memcache unit")
 
+    @property
+    def stats(self) -> dict:
+        """the counters of the namespaces, see `MemCacheUnit.stats`"""
+        return {ns: self[ns].stats for ns in self.NAMESPACES}
+
     def clear(self):
         self.__calendar_mem_cache.clear()
         self.__instrument_mem_cache.clear()
@@ -213,8 +397,32 @@ class CacheUtils:
     def organize_meta_file():
         pass
 
+    @staticmethod
+    def use_file_lock() -> bool:
+        backend = C.get("cache_lock_backend", "redis")
+        if backend not in ("redis", "file"):
+            raise ValueError(f"cache_lock_backend must be redis or file, your cache_lock_backend is {backend}")
+        if backend == "file" and fcntl is None:
+            raise QlibCacheException(
+                "The file lock backend depends on `fcntl`, which is not available on this platform"
+            )
+        return backend == "file"
+
+    @staticmethod
+    def get_lock_dir() -> Path:
+        lock_dir = C.get("cache_lock_dir", None)
+        lock_dir = Path(tempfile.gettempdir()).joinpath("qlib_cache_locks") if lock_dir is None else Path(lock_dir)
+        lock_dir = lock_dir.expanduser()
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        return lock_dir
+
     @staticmethod
     def reset_lock():
+        if CacheUtils.use_file_lock():
+            # NOTE: the processes holding or waiting for the locks must be stopped before resetting
+            for p in CacheUtils.get_lock_dir().glob("*.lock"):
+                p.unlink()
+            return
         r = get_redis_connection()
         redis_lock.reset_all(r)
 
@@ -252,9 +460,36 @@ class CacheUtils:
                 """
             ) from lock_acquired
 
+    @staticmethod
+    @contextlib.contextmanager
+    def file_lock(lock_name: str, shared: bool):
+        """Lock `lock_name` with `fcntl.flock` on a lock file
+
+        The shared locks (readers) can be held together while the exclusive lock (writer) excludes all the others.
+        `flock` is bound to the opened file, so the locks also work between the threads of one process.
+
+        Parameters
+        ----------
+        lock_name : str
+            the name of the lock, the lock file is named by its hash.
+        shared : bool
+            acquire a shared lock or an exclusive lock.
+        """
+        lock_path = CacheUtils.get_lock_dir().joinpath(f"{hashlib.md5(lock_name.encode()).hexdigest()}.lock")
+        with lock_path.open("a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
     @staticmethod
     @contextlib.contextmanager
     def reader_lock(redis_t, lock_name: str):
+        if CacheUtils.use_file_lock():
+            with CacheUtils.file_lock(lock_name, shared=True):
+                yield
+            return
         current_cache_rlock = redis_lock.Lock(redis_t, f"{lock_name}-rlock")
         current_cache_wlock = redis_lock.Lock(redis_t, f"{lock_name}-wlock")
         lock_reader = f"{lock_name}-reader"
@@ -283,6 +518,10 @@ class CacheUtils:
     @staticmethod
     @contextlib.contextmanager
     def writer_lock(redis_t, lock_name):
+        if CacheUtils.use_file_lock():
+            with CacheUtils.file_lock(lock_name, shared=False):
+                yield
+            return
         current_cache_wlock = redis_lock.Lock(redis_t, f"{lock_name}-wlock", id=CacheUtils.LOCK_ID)
         CacheUtils.acquire(current_cache_wlock, lock_name)
         try:
@@ -311,10 +550,13 @@ class BaseProviderCache:
 
     @staticmethod
     def clear_cache(cache_path: Union[str, Path]):
+        cache_path = Path(cache_path)
         for p in [
             cache_path,
             cache_path.with_suffix(".meta"),
             cache_path.with_suffix(".index"),
+            # the data appended by `DiskDatasetCache.update`
+            *cache_path.parent.glob(f"{cache_path.name}.part-*"),
         ]:
             if p.exists():
                 p.unlink()
@@ -474,7 +716,8 @@ class DatasetCache(BaseProviderCache):
         data = data.loc[:, not_space_fields]
         # set features fields
         data.columns = [str(i) for i in fields]
-        return data
+        # the data may be cached with another dtype, or be changed by the instrument processors
+        return astype_compute_dtype(data)
 
     @staticmethod
     def normalize_uri_args(instruments, fields, freq):
@@ -510,7 +753,8 @@ class DiskExpressionCache(ExpressionCache):
         # get calendar
         from .data import Cal  # pylint: disable=C0415
 
-        _calendar = Cal.calendar(freq=freq)
+        _calendar = Cal.calendar_array(freq=freq)
+        first_time, last_time = pd.Timestamp(_calendar[0]), pd.Timestamp(_calendar[-1])
 
         _, _, start_index, end_index = Cal.locate_index(start_time, end_time, freq, future=False)
 
@@ -543,7 +787,7 @@ class DiskExpressionCache(ExpressionCache):
                 # When the expression is not a raw feature
                 # generate expression cache if the feature is not a Feature
                 # instance
-                series = self.provider.expression(instrument, field, _calendar[0], _calendar[-1], freq)
+                series = self.provider.expression(instrument, field, first_time, last_time, freq)
                 if not series.empty:
                     # This expression is empty, we don't generate any cache for it.
                     with CacheUtils.writer_lock(self.r, f"{str(C.dpm.get_data_uri(freq))}:expression-{_cache_uri}"):
@@ -553,7 +797,7 @@ class DiskExpressionCache(ExpressionCache):
                             instrument=instrument,
                             field=field,
                             freq=freq,
-                            last_update=str(_calendar[-1]),
+                            last_update=str(last_time),
                         )
                     return series.loc[start_index:end_index]
                 else:
@@ -647,6 +891,11 @@ class DiskExpressionCache(ExpressionCache):
 class DiskDatasetCache(DatasetCache):
     """Prepared cache mechanism for server."""
 
+    # the number of rows of each row group of the parquet cache
+    PARQUET_ROW_GROUP_SIZE = 64 * 1024
+    # the max number of the part files appended to the parquet cache by `update`
+    PARQUET_MAX_PARTS = 32
+
     def __init__(self, provider, **kwargs):
         super(DiskDatasetCache, self).__init__(provider)
         self.r = get_redis_connection()
@@ -674,6 +923,8 @@ class DiskDatasetCache(DatasetCache):
 
         im = DiskDatasetCache.IndexManager(cache_path)
         index_data = im.get_index(start_time, end_time)
+        if cls.is_parquet_cache(cache_path):
+            return cls._read_parquet_cache(cache_path, index_data, fields)
         if index_data.shape[0] > 0:
             start, stop = (
                 index_data["start"].iloc[0].item(),
@@ -693,6 +944,35 @@ class DiskDatasetCache(DatasetCache):
                 df = pd.DataFrame(columns=fields)
         return df
 
+    @staticmethod
+    def is_parquet_cache(cache_path: Union[str, Path]) -> bool:
+        """whether the data of the cache is stored in the parquet format (see `gen_dataset_cache`)"""
+        with Path(cache_path).open("rb") as f:
+            return f.read(4) == PARQUET_MAGIC
+
+    @classmethod
+    def _read_parquet_cache(cls, cache_path: Union[str, Path], index_data: pd.DataFrame, fields):
+        """read the parquet cache data in the range of `index_data`
+
+        Only the columns of `fields` are read, and the row groups out of the range are skipped according to their
+        statistics of datetime. The files are memory-mapped instead of being read into memory at once.
+        """
+        pa, pq = _import_parquet()
+
+        columns = ["datetime", "instrument"] + list(dict.fromkeys(remove_fields_space(fields)))
+        if index_data.shape[0] > 0:
+            filters = [("datetime", ">=", index_data.index[0]), ("datetime", "<=", index_data.index[-1])]
+            table = pa.concat_tables(
+                [
+                    pq.read_table(path, columns=columns, filters=filters, memory_map=True)
+                    for path in cls._parquet_paths(cache_path)
+                ]
+            )
+        else:
+            table = pq.read_table(cache_path, columns=columns, memory_map=True).slice(0, 0)
+        df = table.to_pandas().set_index(["instrument", "datetime"]).sort_index()
+        return cls.cache_to_origin_data(df, fields)
+
     def _dataset(
         self, instruments, fields, start_time=None, end_time=None, freq="day", disk_cache=0, inst_processors=[]
     ):
@@ -886,6 +1166,8 @@ class DiskDatasetCache(DatasetCache):
         - data     : cache/d41366901e25de3ec47297f12e2ba11d
 
             - This is a hdf file sorted by datetime
+            - If `dataset_cache_format` is "parquet", it is a parquet file sorted by datetime, whose columns are
+              datetime, instrument and the fields. Each row group covers a continuous range of datetime.
 
         :param cache_path:  The path to store the cache.
         :param instruments:  The instruments to store the cache.
@@ -899,14 +1181,15 @@ class DiskDatasetCache(DatasetCache):
         from .data import Cal  # pylint: disable=C0415
 
         cache_path = Path(cache_path)
-        _calendar = Cal.calendar(freq=freq)
+        _calendar = Cal.calendar_array(freq=freq)
+        first_time, last_time = pd.Timestamp(_calendar[0]), pd.Timestamp(_calendar[-1])
         self.logger.debug(f"Generating dataset cache {cache_path}")
         # Make sure the cache runs right when the directory is deleted
         # while running
         self.clear_cache(cache_path)
 
         features = self.provider.dataset(
-            instruments, fields, _calendar[0], _calendar[-1], freq, inst_processors=inst_processors
+            instruments, fields, first_time, last_time, freq, inst_processors=inst_processors
         )
 
         if features.empty:
@@ -916,22 +1199,30 @@ class DiskDatasetCache(DatasetCache):
         features = features.swaplevel("instrument", "datetime").sort_index()
 
         # write cache data
-        with pd.HDFStore(str(cache_path.with_suffix(".data"))) as store:
-            cache_to_orig_map = dict(zip(remove_fields_space(features.columns), features.columns))
-            orig_to_cache_map = dict(zip(features.columns, remove_fields_space(features.columns)))
-            cache_features = features[list(cache_to_orig_map.values())].rename(columns=orig_to_cache_map)
-            # cache columns
-            cache_columns = sorted(cache_features.columns)
-            cache_features = cache_features.loc[:, cache_columns]
-            cache_features = cache_features.loc[:, ~cache_features.columns.duplicated()]
-            store.append(DatasetCache.HDF_KEY, cache_features, append=False)
+        cache_to_orig_map = dict(zip(remove_fields_space(features.columns), features.columns))
+        orig_to_cache_map = dict(zip(features.columns, remove_fields_space(features.columns)))
+        cache_features = features[list(cache_to_orig_map.values())].rename(columns=orig_to_cache_map)
+        # cache columns
+        cache_columns = sorted(cache_features.columns)
+        cache_features = cache_features.loc[:, cache_columns]
+        cache_features = cache_features.loc[:, ~cache_features.columns.duplicated()]
+        cache_format = C.get("dataset_cache_format", "hdf")
+        if cache_format == "parquet":
+            self._write_parquet_cache(cache_path.with_suffix(".data"), cache_features)
+        elif cache_format == "hdf":
+            with pd.HDFStore(str(cache_path.with_suffix(".data"))) as store:
+                store.append(DatasetCache.HDF_KEY, cache_features, append=False)
+        else:
+            raise ValueError(
+                f"dataset_cache_format must be hdf or parquet, your dataset_cache_format is {cache_format}"
+            )
         # write meta file
         meta = {
             "info": {
                 "instruments": instruments,
                 "fields": list(cache_features.columns),
                 "freq": freq,
-                "last_update": str(_calendar[-1]),  # The last_update to store the cache
+                "last_update": str(last_time),  # The last_update to store the cache
                 "inst_processors": inst_processors,  # The last_update to store the cache
             },
             "meta": {"last_visit": time.time(), "visits": 1},
@@ -951,7 +1242,67 @@ class DiskDatasetCache(DatasetCache):
         # the fields of the cached features are converted to the original fields
         return features.swaplevel("datetime", "instrument")
 
+    @classmethod
+    def _write_parquet_cache(cls, data_path: Union[str, Path], data: pd.DataFrame):
+        pa, pq = _import_parquet()
+        cls._write_parquet_table(data_path, pa.Table.from_pandas(data.reset_index(), preserve_index=False))
+
+    @classmethod
+    def _write_parquet_table(cls, data_path: Union[str, Path], table):
+        _, pq = _import_parquet()
+        # the statistics of each row group are used to skip the row groups out of the range when reading
+        pq.write_table(table, str(data_path), row_group_size=cls.PARQUET_ROW_GROUP_SIZE, write_statistics=True)
+
+    @staticmethod
+    def _parquet_paths(cache_path: Union[str, Path]) -> List[Path]:
+        """the data files of the parquet cache in order: the cache file and the parts appended by `update`"""
+        cache_path = Path(cache_path)
+        parts = cache_path.parent.glob(f"{cache_path.name}.part-*")
+        return [cache_path] + sorted(parts, key=lambda p: int(p.name.rsplit("-", 1)[1]))
+
+    @classmethod
+    def _update_parquet_cache(cls, cache_path: Path, data: pd.DataFrame, rm_lines: int):
+        """replace the last `rm_lines` rows of the parquet cache with `data`
+
+        Parquet files can't be appended, so `data` is written into a new part file, and only the parts containing the
+        removed rows are rewritten. The parts are merged into the cache file once there are more than
+        `PARQUET_MAX_PARTS` of them.
+        """
+        pa, pq = _import_parquet()
+
+        paths = cls._parquet_paths(cache_path)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+        while rm_lines > 0:
+            table = pq.read_table(paths[-1], memory_map=True)
+            if table.num_rows > rm_lines or len(paths) == 1:
+                cls._write_parquet_table(tmp_path, table.slice(0, max(table.num_rows - rm_lines, 0)))
+                tmp_path.rename(paths[-1])
+                break
+            rm_lines -= table.num_rows
+            paths.pop().unlink()
+
+        schema = pq.read_schema(cache_path)
+        # the new data is cast to the types of the existing data (e.g. float64 to float32)
+        table = pa.Table.from_pandas(data.reset_index(), preserve_index=False).select(schema.names).cast(schema)
+        if len(paths) > cls.PARQUET_MAX_PARTS:
+            tables = [pq.read_table(path, memory_map=True) for path in paths]
+            cls._write_parquet_table(tmp_path, pa.concat_tables(tables + [table]))
+            for path in paths[1:]:
+                path.unlink()
+            tmp_path.rename(cache_path)
+        else:
+            part = int(paths[-1].name.rsplit("-", 1)[1]) + 1 if len(paths) > 1 else 1
+            cls._write_parquet_table(tmp_path, table)
+            tmp_path.rename(cache_path.with_name(f"{cache_path.name}.part-{part}"))
+
     def update(self, cache_uri, freq: str = "day"):
+        """Append the data of the new calendar to the cache
+
+        Only the new part of the calendar is calculated, and the expressions load the history in their extended
+        windows by themselves. The last periods whose values referred to the future data (i.e. `rght_etd`) are
+        removed and calculated again. The new rows are appended to the hdf data or written into a new part file of
+        the parquet data, so the existing data is not rewritten.
+        """
         cp_cache_uri = self.get_cache_dir(freq).joinpath(cache_uri)
         meta_path = cp_cache_uri.with_suffix(".meta")
         if not self.check_cache_exists(cp_cache_uri):
@@ -973,8 +1324,9 @@ class DiskDatasetCache(DatasetCache):
             self.logger.debug("Updating dataset: {}".format(d))
             from .data import Inst  # pylint: disable=C0415
 
-            if Inst.get_inst_type(instruments) == Inst.DICT:
-                self.logger.info(f"The file {cache_uri} has dict cache. Skip updating")
+            if Inst.get_inst_type(instruments) == Inst.DICT and instruments.get("filter_pipe"):
+                # the filters may depend on the whole time range
+                self.logger.info(f"The file {cache_uri} has dict cache with filters. Skip updating")
                 return 1
 
             # get newest calendar
@@ -1033,28 +1385,31 @@ class DiskDatasetCache(DatasetCache):
                 else:
                     return 0  # No data to update cache
 
-                store = pd.HDFStore(cp_cache_uri)
-                # FIXME:
-                # Because the feature cache are stored as .bin file.
-                # So the series read from features are all float32.
-                # However, the first dataset cache is calculated based on the
-                # raw data. So the data type may be float64.
-                # Different data type will result in failure of appending data
-                if "/{}".format(DatasetCache.HDF_KEY) in store.keys():
-                    schema = store.select(DatasetCache.HDF_KEY, start=0, stop=0)
-                    for col, dtype in schema.dtypes.items():
-                        data[col] = data[col].astype(dtype)
-                if rm_lines > 0:
-                    store.remove(key=im.KEY, start=-rm_lines)
-                store.append(DatasetCache.HDF_KEY, data)
-                store.close()
-
-                # update index file
+                if self.is_parquet_cache(cp_cache_uri):
+                    self._update_parquet_cache(cp_cache_uri, data, rm_lines)
+                else:
+                    store = pd.HDFStore(cp_cache_uri)
+                    # FIXME:
+                    # Because the feature cache are stored as .bin file.
+                    # So the series read from features are all float32.
+                    # However, the first dataset cache is calculated based on the
+                    # raw data. So the data type may be float64.
+                    # Different data type will result in failure of appending data
+                    if "/{}".format(DatasetCache.HDF_KEY) in store.keys():
+                        schema = store.select(DatasetCache.HDF_KEY, start=0, stop=0)
+                        for col, dtype in schema.dtypes.items():
+                            data[col] = data[col].astype(dtype)
+                    if rm_lines > 0:
+                        store.remove(key=im.KEY, start=-rm_lines)
+                    store.append(DatasetCache.HDF_KEY, data)
+                    store.close()
+
+                # update index file, the index of the removed period is rebuilt with the new data
+                kept_index = index_data.loc[index_data.index < whole_calendar[current_index - rm_n_period]]
                 new_index_data = im.build_index_from_data(
-                    data.loc(axis=0)[whole_calendar[current_index] :, :],
-                    start_index=0 if index_data.empty else index_data["end"].iloc[-1],
+                    data, start_index=0 if kept_index.empty else kept_index["end"].iloc[-1]
                 )
-                im.append_index(new_index_data)
+                im.update(pd.concat([kept_index, new_index_data]))
 
                 # update meta file
                 d["info"]["last_update"] = str(new_calendar[-1])
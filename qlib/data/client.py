@@ -5,12 +5,19 @@
 from __future__ import division
 from __future__ import print_function
 
+import os
+import pickle
+import queue
+import socket
+from contextlib import contextmanager
+from typing import List, Tuple
+
 import socketio
 
 import qlib
 from ..config import C
 from ..log import get_module_logger
-import pickle
+from .protocol import SharedFrame, recv_message, send_message
 
 
 class Client:
@@ -101,3 +108,196 @@ class Client:
         self.logger.debug("try sending")
         self.sio.emit(request_type + "_request", request_content)
         self.sio.wait()
+
+
+class ArrowClient:
+    """A client of the binary protocol
+
+    Compared with `Client`, the features are responded in Arrow record batches (optionally compressed) instead of the
+    uri of the cache on the shared disk, the requests are pipelined on one connection, and the connections are kept in
+    a pool to be reused by the following requests (and by the concurrent threads).
+
+    It provides the same `send_request` as `Client`, so it can be used by the client providers directly.
+    """
+
+    def __init__(self, host, port, compression=None, pool_size=4, timeout=None):
+        """
+        Parameters
+        ----------
+        host : str
+            the host of the server.
+        port : int
+            the port of the server.
+        compression : str
+            the compression of the features, None/"zstd"/"lz4".
+        pool_size : int
+            the max number of the idle connections kept in the pool.
+        timeout : float
+            the timeout of the socket in seconds, `C["timeout"]` by default.
+        """
+        self.server_host = host
+        self.server_port = port
+        self.compression = compression
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.logger = get_module_logger(self.__class__.__name__)
+        self._pid = os.getpid()
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection((self.server_host, self.server_port), timeout=self._get_timeout())
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _get_timeout(self):
+        return C["timeout"] if self.timeout is None else self.timeout
+
+    @contextmanager
+    def _connection(self):
+        """get an idle connection from the pool, or create a new one"""
+        if os.getpid() != self._pid:
+            # the connections of the parent process can not be shared with the forked process
+            self._pid = os.getpid()
+            self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        try:
+            sock, rfile, wfile = self._pool.get_nowait()
+        except queue.Empty:
+            sock = self._connect()
+            rfile, wfile = sock.makefile("rb"), sock.makefile("wb")
+        try:
+            yield rfile, wfile
+        except BaseException:
+            # the state of the connection is unknown
+            self._close(sock, rfile, wfile)
+            raise
+        try:
+            self._pool.put_nowait((sock, rfile, wfile))
+        except queue.Full:
+            self._close(sock, rfile, wfile)
+
+    @staticmethod
+    def _close(sock, rfile, wfile):
+        for f in (rfile, wfile, sock):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+    def disconnect(self):
+        """Close the idle connections in the pool."""
+        while True:
+            try:
+                self._close(*self._pool.get_nowait())
+            except queue.Empty:
+                break
+
+    def request_batch(self, requests: List[Tuple[str, dict]]) -> list:
+        """Send a batch of requests on one connection and get the results in order.
+
+        All the requests are sent before receiving the responses, so the server works on the following requests
+        while the results of the previous ones are transferred.
+
+        Parameters
+        ----------
+        requests : List[Tuple[str, dict]]
+            the list of (request_type, request_content), request_type is 'calendar'/'instrument'/'feature'.
+
+        Returns
+        -------
+        list
+            the results of the requests; the result of 'feature' is a `pd.DataFrame`.
+        """
+        head_info = {"version": qlib.__version__, "compression": self.compression}
+        results = []
+        with self._connection() as (rfile, wfile):
+            for i, (request_type, request_content) in enumerate(requests):
+                send_message(wfile, {"head": head_info, "id": i, "type": request_type, "body": request_content})
+            for i in range(len(requests)):
+                msg = recv_message(rfile)
+                if msg is None:
+                    raise ConnectionError("The connection is closed by the server")
+                res, data = msg
+                if res["id"] != i:
+                    raise ValueError(f"Unexpected response {res['id']}, the response of request {i} is expected")
+                if res["status"] != 0:
+                    results.append(
+                        ValueError(f"Bad response(status=={res['status']}), detailed info: {res['detailed_info']}")
+                    )
+                elif isinstance(res["result"], SharedFrame):
+                    results.append(res["result"].load())
+                else:
+                    results.append(res["result"] if data is None else data)
+        for res in results:
+            if isinstance(res, Exception):
+                raise res
+        return results
+
+    def request(self, request_type, request_content):
+        """Send a request and get the result."""
+        return self.request_batch([(request_type, request_content)])[0]
+
+    def send_request(self, request_type, request_content, msg_queue, msg_proc_func=None):
+        """Send a certain request to server, the same as `Client.send_request`."""
+        try:
+            ret = self.request(request_type, request_content)
+            if msg_proc_func is not None:
+                ret = msg_proc_func(ret)
+        except Exception as e:
+            self.logger.exception("Error when requesting the server.")
+            ret = e
+        msg_queue.put(ret)
+
+    def features_batch(self, requests: List[dict]) -> list:
+        """Get the features of a batch of requests on one connection.
+
+        Parameters
+        ----------
+        requests : List[dict]
+            each request is the dict of `instruments`, `fields`, `start_time`, `end_time`, `freq` and
+            `inst_processors` (the same as the arguments of `D.features`).
+
+        Returns
+        -------
+        List[pd.DataFrame]
+            the features of each request.
+        """
+        return self.request_batch([("feature", dict(req, disk_cache=0)) for req in requests])
+
+
+class LocalFeatureClient(ArrowClient):
+    """A client of `LocalFeatureServer` on the same machine
+
+    The requests are sent to the Unix socket of the server, and the features are mapped from the shared memory.
+    """
+
+    def __init__(self, socket_path, pool_size=4, timeout=None):
+        """
+        Parameters
+        ----------
+        socket_path : str
+            the path of the Unix socket of the server.
+        pool_size : int
+            the max number of the idle connections kept in the pool.
+        timeout : float
+            the timeout of the socket in seconds, `C["timeout"]` by default.
+        """
+        super().__init__(None, None, pool_size=pool_size, timeout=timeout)
+        self.socket_path = socket_path
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._get_timeout())
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def request_batch(self, requests: List[Tuple[str, dict]]) -> list:
+        try:
+            return super().request_batch(requests)
+        except FileNotFoundError:
+            # the features are evicted from the cache of the server before being mapped
+            self.logger.warning("The shared features are evicted, request again")
+            return super().request_batch(requests)
@@ -5,21 +5,28 @@
 from __future__ import division
 from __future__ import print_function
 
+import os
 import re
 import abc
 import copy
 import queue
-import bisect
+import uuid
+import hashlib
+import tempfile
 import numpy as np
 import pandas as pd
+from pathlib import Path
 from typing import List, Union, Optional
 
 # For supporting multiprocessing in outer code, joblib is used
 from joblib import delayed
 
 from .cache import H
+from .base import PanelContext
+from .plan import ExpressionPlan
 from ..config import C
 from .inst_processor import InstProcessor
+from .inst_index import InstrumentSpanIndex
 
 from ..log import get_module_logger
 from .cache import DiskDatasetCache
@@ -31,12 +38,14 @@ from ..utils import (
     parse_field,
     hash_args,
     normalize_cache_fields,
+    remove_fields_space,
     code_to_fname,
     time_to_slc_point,
-    read_period_data,
-    get_period_list,
+    PITTimeline,
+    get_compute_dtype,
 )
 from ..utils.paral import ParallelExt
+from ..utils.file import get_shm_dir
 from .ops import Operators  # pylint: disable=W0611  # noqa: F401
 
 
@@ -87,7 +96,7 @@ class CalendarProvider(abc.ABC):
         list
             calendar list
         """
-        _calendar, _calendar_index = self._get_calendar(freq, future)
+        _calendar = self._get_calendar(freq, future)
         if start_time == "None":
             start_time = None
         if end_time == "None":
@@ -106,7 +115,28 @@ class CalendarProvider(abc.ABC):
         else:
             end_time = _calendar[-1]
         _, _, si, ei = self.locate_index(start_time, end_time, freq, future)
-        return _calendar[si : ei + 1]
+        # only the returned part is converted to `pd.Timestamp`
+        return pd.DatetimeIndex(_calendar[si : ei + 1]).to_numpy(dtype=object)
+
+    def calendar_array(self, freq="day", future=False) -> np.ndarray:
+        """Get the whole calendar as a `datetime64[ns]` array.
+
+        It is cheaper than `calendar` for the large calendars (e.g. 1min), because the timestamps are not converted
+        to `pd.Timestamp`. The array is read-only and may be memory-mapped.
+
+        Parameters
+        ----------
+        freq : str
+            time frequency, available: year/quarter/month/week/day.
+        future : bool
+            whether including future trading day.
+
+        Returns
+        ----------
+        np.ndarray
+            the sorted timestamps of the calendar
+        """
+        return self._get_calendar(freq, future)
 
     def locate_index(
         self, start_time: Union[pd.Timestamp, str], end_time: Union[pd.Timestamp, str], freq: str, future: bool = False
@@ -135,21 +165,16 @@ class CalendarProvider(abc.ABC):
         int
             the index of end time.
         """
-        start_time = pd.Timestamp(start_time)
-        end_time = pd.Timestamp(end_time)
-        calendar, calendar_index = self._get_calendar(freq=freq, future=future)
-        if start_time not in calendar_index:
-            try:
-                start_time = calendar[bisect.bisect_left(calendar, start_time)]
-            except IndexError as index_e:
-                raise IndexError(
-                    "`start_time` uses a future date, if you want to get future trading days, you can use: `future=True`"
-                ) from index_e
-        start_index = calendar_index[start_time]
-        if end_time not in calendar_index:
-            end_time = calendar[bisect.bisect_right(calendar, end_time) - 1]
-        end_index = calendar_index[end_time]
-        return start_time, end_time, start_index, end_index
+        calendar = self._get_calendar(freq=freq, future=future)
+        start_index = int(np.searchsorted(calendar, pd.Timestamp(start_time).to_datetime64(), side="left"))
+        if start_index >= len(calendar):
+            raise IndexError(
+                "`start_time` uses a future date, if you want to get future trading days, you can use: `future=True`"
+            )
+        end_index = int(np.searchsorted(calendar, pd.Timestamp(end_time).to_datetime64(), side="right")) - 1
+        # NOTE: the last time is used if `end_time` is earlier than the calendar
+        end_index %= len(calendar)
+        return pd.Timestamp(calendar[start_index]), pd.Timestamp(calendar[end_index]), start_index, end_index
 
     def _get_calendar(self, freq, future):
         """Load calendar using memcache.
@@ -163,17 +188,15 @@ class CalendarProvider(abc.ABC):
 
         Returns
         -------
-        list
-            list of timestamps.
-        dict
-            dict composed by timestamp as key and index as value for fast search.
+        np.ndarray
+            the timestamps with dtype `datetime64[ns]`, which are searched by `np.searchsorted`.
         """
         flag = f"{freq}_future_{future}"
-        if flag not in H["c"]:
-            _calendar = np.array(self.load_calendar(freq, future))
-            _calendar_index = {x: i for i, x in enumerate(_calendar)}  # for fast search
-            H["c"][flag] = _calendar, _calendar_index
-        return H["c"][flag]
+        _calendar = H["c"].get(flag)
+        if _calendar is None:
+            _calendar = self.load_calendar_array(freq, future)
+            H["c"][flag] = _calendar
+        return _calendar
 
     def _uri(self, start_time, end_time, freq, future=False):
         """Get the uri of calendar generation task."""
@@ -195,6 +218,24 @@ class CalendarProvider(abc.ABC):
         """
         raise NotImplementedError("Subclass of CalendarProvider must implement `load_calendar` method")
 
+    def load_calendar_array(self, freq, future) -> np.ndarray:
+        """Load original calendar timestamp from file as a `datetime64[ns]` array.
+
+        Subclasses can override it to avoid creating the `pd.Timestamp` objects of `load_calendar`.
+
+        Parameters
+        ----------
+        freq : str
+            frequency of read calendar file.
+        future: bool
+
+        Returns
+        ----------
+        np.ndarray
+            the timestamps with dtype `datetime64[ns]`
+        """
+        return pd.DatetimeIndex(self.load_calendar(freq, future)).values
+
 
 class InstrumentProvider(abc.ABC):
     """Instrument provider base class
@@ -379,6 +420,26 @@ class PITProvider(abc.ABC):
         """
         raise NotImplementedError(f"Please implement the `period_feature` method")
 
+    def period_timeline(self, instrument, field) -> "PITTimeline":
+        """
+        get the revision timeline of the period data of `field`
+
+        It is used to answer the queries of a range of observe times at once (e.g. by the `P` operator).
+
+        Returns
+        -------
+        PITTimeline
+            all the revisions of `field` of `instrument`
+
+        Raises
+        ------
+        FileNotFoundError
+            This exception will be raised if the queried data do not exist.
+        NotImplementedError
+            This exception will be raised if the provider does not support it.
+        """
+        raise NotImplementedError(f"`period_timeline` is not supported by {type(self).__name__}")
+
 
 class ExpressionProvider(abc.ABC):
     """Expression provider class
@@ -443,6 +504,166 @@ class ExpressionProvider(abc.ABC):
         raise NotImplementedError("Subclass of ExpressionProvider must implement `Expression` method")
 
 
+class MmapDatasetPanel:
+    """The panel of the dataset in a memory-mapped temporary file
+
+    The panel is a (field, instrument, calendar) array. The workers of `DatasetProvider.dataset_processor` write the
+    data of each instrument into it directly instead of returning the pickled DataFrames, and the parent process
+    builds the dataset on the mapped panel. The file is in the shared memory (see `get_shm_dir`) and only the pages
+    of the written data are allocated.
+    """
+
+    def __init__(self, path, fields, instruments, freq, cal_start, cal_length, dtype):
+        """
+        Parameters
+        ----------
+        path : str
+            the path of the file.
+        fields : list
+            the fields of the panel, i.e. the columns of the dataset in the cache format (without spaces).
+        instruments : list
+            the instruments of the panel.
+        freq : str
+            the frequency of the calendar.
+        cal_start : int
+            the calendar index of the first date of the panel.
+        cal_length : int
+            the number of the dates of the panel.
+        dtype :
+            the dtype of the panel.
+        """
+        self.path = str(path)
+        self.fields = fields
+        self.instruments = instruments
+        self.freq = freq
+        self.cal_start = cal_start
+        self.cal_length = cal_length
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def shape(self):
+        return len(self.fields), len(self.instruments), self.cal_length
+
+    @classmethod
+    def create(cls, fields, instruments, start_time, end_time, freq, dtype):
+        """
+        create the empty panel for the calendar in [start_time, end_time]
+
+        None if the calendar is empty or the free space of the shared memory is less than the size of the panel.
+        Writing to the sparse file beyond the free space would crash the workers with SIGBUS instead of raising
+        an error.
+        """
+        _calendar = Cal.calendar_array(freq=freq)
+        cal_start = (
+            0 if start_time is None else int(np.searchsorted(_calendar, pd.Timestamp(start_time).to_datetime64()))
+        )
+        cal_end = len(_calendar) - 1
+        if end_time is not None:
+            cal_end = int(np.searchsorted(_calendar, pd.Timestamp(end_time).to_datetime64(), side="right")) - 1
+        if cal_end < cal_start:
+            return None
+        shm_dir = get_shm_dir()
+        panel = cls(
+            shm_dir.joinpath(f"qlib_dataset_{os.getpid()}_{uuid.uuid4().hex}"),
+            fields,
+            instruments,
+            freq,
+            cal_start,
+            cal_end - cal_start + 1,
+            dtype,
+        )
+        size = int(np.prod(panel.shape)) * panel.dtype.itemsize
+        stat = os.statvfs(shm_dir)
+        if size > stat.f_bavail * stat.f_frsize:
+            get_module_logger("data").warning(
+                f"The free space of {shm_dir} ({stat.f_bavail * stat.f_frsize} bytes) is less than the size of the "
+                f"dataset panel ({size} bytes), the dataset is transferred by pickle"
+            )
+            return None
+        with open(panel.path, "wb") as f:
+            # the file is sparse until the data is written
+            f.truncate(size)
+        return panel
+
+    def write(self, i, data: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        write the data of the i-th instrument into the panel
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            the positions of the rows of the data in the calendar of the panel; None if the data can't be written
+            (e.g. the dates are not in the calendar), and the data should be returned directly.
+        """
+        if len(data) == 0:
+            return np.empty(0, dtype=np.int32)
+        if not all(dtype.kind in "biuf" for dtype in data.dtypes):
+            return None
+        _calendar = Cal.calendar_array(freq=self.freq)
+        pos = np.searchsorted(_calendar, data.index.values) - self.cal_start
+        if (
+            pos[0] < 0
+            or pos[-1] >= self.cal_length
+            or not np.array_equal(_calendar[pos + self.cal_start], data.index.values)
+        ):
+            return None
+        pos = pos.astype(np.int32)
+        panel = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=self.shape)
+        values = data.loc[:, self.fields].to_numpy(dtype=self.dtype).T
+        if pos[-1] - pos[0] + 1 == len(pos):
+            panel[:, i, pos[0] : pos[-1] + 1] = values
+        else:
+            panel[:, i, pos] = values
+        panel.flush()
+        del panel
+        return pos
+
+    def read(self, i, pos: np.ndarray) -> pd.DataFrame:
+        """read the data of the i-th instrument written by `write`, which is the same as the data written"""
+        panel = np.memmap(self.path, dtype=self.dtype, mode="r", shape=self.shape)
+        _calendar = Cal.calendar_array(freq=self.freq)
+        index = pd.DatetimeIndex(_calendar[pos + self.cal_start], name="datetime")
+        return pd.DataFrame(dict(zip(self.fields, np.array(panel[:, i, pos]))), index=index)
+
+    def to_dataframe(self, rows: List[np.ndarray], columns: List[str]) -> pd.DataFrame:
+        """
+        build the dataset on the panel
+
+        The dataset is built on the mapped panel without copying if the rows of all the instruments cover the whole
+        calendar; otherwise the rows are gathered from the panel.
+
+        Parameters
+        ----------
+        rows : List[np.ndarray]
+            the positions of the rows of each instrument returned by `write`.
+        columns : List[str]
+            the names of the columns of the fields.
+        """
+        n_fields, n_inst, n_cal = self.shape
+        used = [i for i, pos in enumerate(rows) if len(pos) > 0]
+        sel = np.concatenate([i * n_cal + rows[i].astype(np.int64) for i in used])
+        panel = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(n_fields, n_inst * n_cal))
+        if len(sel) == n_inst * n_cal and os.name != "nt":
+            # the file can be removed while it is mapped
+            values = panel.view(np.ndarray)
+        else:
+            values = np.take(panel, sel, axis=1)
+        del panel
+        _calendar = Cal.calendar_array(freq=self.freq)[self.cal_start : self.cal_start + n_cal]
+        index = pd.MultiIndex(
+            levels=[pd.Index([self.instruments[i] for i in used], dtype=object), pd.DatetimeIndex(_calendar)],
+            codes=[np.repeat(np.arange(len(used)), [len(rows[i]) for i in used]), sel % n_cal],
+            names=["instrument", "datetime"],
+            verify_integrity=False,
+        )
+        return pd.DataFrame(values.T, index=index, columns=columns, copy=False)
+
+    def close(self):
+        """remove the file; the mapped data is still available until it is released"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
 class DatasetProvider(abc.ABC):
     """Dataset provider class
 
@@ -475,6 +696,100 @@ class DatasetProvider(abc.ABC):
         """
         raise NotImplementedError("Subclass of DatasetProvider must implement `Dataset` method")
 
+    def iter_dataset(
+        self,
+        instruments,
+        fields,
+        start_time=None,
+        end_time=None,
+        freq="day",
+        inst_processors=[],
+        chunk_by="instrument",
+        chunk_size=100,
+    ):
+        """Get dataset data chunk by chunk.
+
+        Each chunk is calculated by `dataset` on a part of the instruments or the calendar, so only one chunk is kept
+        in the memory at a time.
+
+        The fields whose values depend on the range they are calculated with (see `Expression.is_range_invariant`,
+        e.g. `Mean($close, 0)`, `EMA($close, 10)` and `FFillNan($close)`) are calculated from `start_time` to the end
+        of each date chunk and sliced to the chunk, so the chunks are the same as the whole dataset. It costs more for
+        the later chunks.
+
+        Parameters
+        ----------
+        instruments : list or dict
+            list/dict of instruments or dict of stockpool config.
+        fields : list
+            list of feature instances.
+        start_time : str
+            start of the time range.
+        end_time : str
+            end of the time range.
+        freq : str
+            time frequency.
+        inst_processors:  Iterable[Union[dict, InstProcessor]]
+            the operations performed on each instrument
+        chunk_by : str
+            "instrument" or "date", split the dataset by the instruments or by the dates.
+        chunk_size : int
+            the number of the instruments or the dates in each chunk.
+
+        Yields
+        ----------
+        pd.DataFrame
+            a pandas dataframe with <instrument, datetime> index; the empty chunks are skipped.
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size should be positive, but got {chunk_size}")
+        # the instruments are listed once, so the filters are applied on the whole time range
+        instruments_d = self.get_instruments_d(instruments, freq)
+        if chunk_by == "instrument":
+            inst_l = sorted(instruments_d)
+            for i in range(0, len(inst_l), chunk_size):
+                chunk = inst_l[i : i + chunk_size]
+                if isinstance(instruments_d, dict):
+                    chunk = {inst: instruments_d[inst] for inst in chunk}
+                data = self.dataset(chunk, fields, start_time, end_time, freq, inst_processors=inst_processors)
+                if len(data) > 0:
+                    yield data
+        elif chunk_by == "date":
+            cal = Cal.calendar(start_time, end_time, freq)
+            fields = list(fields)
+            variant = [not ExpressionD.get_expression_instance(str(f)).is_range_invariant() for f in fields]
+            inv_fields = [f for f, v in zip(fields, variant) if not v]
+            var_fields = [f for f, v in zip(fields, variant) if v]
+            # the positions of the columns of [*inv_fields, *var_fields] in `fields`
+            order = np.argsort(
+                [i for i, v in enumerate(variant) if not v] + [i for i, v in enumerate(variant) if v], kind="stable"
+            )
+            for i in range(0, len(cal), chunk_size):
+                chunk_end = cal[min(i + chunk_size, len(cal)) - 1]
+                frames = []
+                if len(inv_fields) > 0:
+                    frames.append(
+                        self.dataset(
+                            instruments_d, inv_fields, cal[i], chunk_end, freq, inst_processors=inst_processors
+                        )
+                    )
+                if len(var_fields) > 0:
+                    data = self.dataset(
+                        instruments_d, var_fields, start_time, chunk_end, freq, inst_processors=inst_processors
+                    )
+                    frames.append(data[data.index.get_level_values("datetime") >= cal[i]])
+                if len(frames) == 1:
+                    data = frames[0]
+                else:
+                    aligned = frames[0].index.equals(frames[1].index)
+                    data = pd.concat(frames, axis=1).iloc[:, order]
+                    if not aligned:
+                        data = data.sort_index()
+                if len(data) > 0:
+                    yield data
+        else:
+            raise ValueError(f"Unsupported chunk_by {chunk_by}, it should be `instrument` or `date`")
+
     def _uri(
         self,
         instruments,
@@ -545,6 +860,36 @@ class DatasetProvider(abc.ABC):
         # parse and check the input fields
         return [ExpressionD.get_expression_instance(f) for f in fields]
 
+    @staticmethod
+    def local_index_expression():
+        """
+        Whether the expressions are calculated by a `LocalExpressionProvider` based on calendar index,
+        i.e. they are not loaded from an expression cache or by a server.
+
+        """
+        return isinstance(ExpressionD._provider, LocalExpressionProvider) and ExpressionD.time2idx
+
+    @staticmethod
+    def get_expression_plan(column_names, start_time, end_time, freq):
+        """
+        Get the plan to calculate the fields with their common sub-expressions calculated only once.
+        The ranges of the fields are extended in the same way as `LocalExpressionProvider.expression`.
+
+        return value: An `ExpressionPlan`, or None if the expressions are not calculated locally.
+
+        """
+        if not DatasetProvider.local_index_expression():
+            return None
+        _, _, start_index, end_index = Cal.locate_index(
+            time_to_slc_point(start_time), time_to_slc_point(end_time), freq=freq, future=False
+        )
+        expressions = dict()
+        for field in column_names:
+            expression = ExpressionD.get_expression_instance(field)
+            lft_etd, rght_etd = expression.get_extended_window_size()
+            expressions[field] = expression, max(0, start_index - lft_etd), end_index + rght_etd
+        return ExpressionPlan(expressions, freq)
+
     @staticmethod
     def dataset_processor(instruments_d, column_names, start_time, end_time, freq, inst_processors=[]):
         """
@@ -556,28 +901,38 @@ class DatasetProvider(abc.ABC):
         # One process for one task, so that the memory will be freed quicker.
         workers = max(min(C.get_kernels(freq), len(instruments_d)), 1)
 
-        # create iterator
-        if isinstance(instruments_d, dict):
-            it = instruments_d.items()
-        else:
-            it = zip(instruments_d, [None] * len(instruments_d))
-
-        inst_l = []
-        task_l = []
-        for inst, spans in it:
-            inst_l.append(inst)
-            task_l.append(
-                delayed(DatasetProvider.inst_calculator)(
-                    inst, start_time, end_time, freq, normalize_column_names, spans, C, inst_processors
-                )
-            )
+        plan = DatasetProvider.get_expression_plan(normalize_column_names, start_time, end_time, freq)
+        if plan is not None:
+            get_module_logger("data").debug(f"expression plan: {plan.stats}")
+
+        inst_l = sorted(set(instruments_d))
+        spans_l = [instruments_d[inst] for inst in inst_l] if isinstance(instruments_d, dict) else [None] * len(inst_l)
 
-        data = dict(
-            zip(
-                inst_l,
-                ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(task_l),
+        panel = None
+        if len(inst_processors) == 0 and C.get("dataset_transfer", "pickle") == "mmap" and len(inst_l) > 0:
+            # the instrument processors may change the index and the columns of the data
+            panel = MmapDatasetPanel.create(
+                remove_fields_space(column_names), inst_l, start_time, end_time, freq, get_compute_dtype(np.float32)
             )
-        )
+        task_l = [
+            delayed(DatasetProvider.inst_calculator)(
+                inst, start_time, end_time, freq, normalize_column_names, spans, C, inst_processors, plan, panel, i
+            )
+            for i, (inst, spans) in enumerate(zip(inst_l, spans_l))
+        ]
+        try:
+            res = ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(task_l)
+            if panel is not None and all(isinstance(r, np.ndarray) for r in res):
+                if any(len(r) > 0 for r in res):
+                    return panel.to_dataframe(res, [str(f) for f in column_names])
+                res = [pd.DataFrame() for _ in res]
+            elif panel is not None:
+                # some data can't be written into the panel, so the written data is read back
+                res = [panel.read(i, r) if isinstance(r, np.ndarray) else r for i, r in enumerate(res)]
+        finally:
+            if panel is not None:
+                panel.close()
+        data = dict(zip(inst_l, res))
 
         new_data = dict()
         for inst in sorted(data.keys()):
@@ -592,24 +947,41 @@ class DatasetProvider(abc.ABC):
             data = pd.DataFrame(
                 index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
                 columns=column_names,
-                dtype=np.float32,
+                dtype=get_compute_dtype(np.float32),
             )
 
         return data
 
     @staticmethod
-    def inst_calculator(inst, start_time, end_time, freq, column_names, spans=None, g_config=None, inst_processors=[]):
+    def inst_calculator(
+        inst,
+        start_time,
+        end_time,
+        freq,
+        column_names,
+        spans=None,
+        g_config=None,
+        inst_processors=[],
+        plan=None,
+        panel=None,
+        panel_index=None,
+    ):
         """
         Calculate the expressions for **one** instrument, return a df result.
         If the expression has been calculated before, load from cache.
+        If `plan` (see `get_expression_plan`) is given, the common sub-expressions of the fields are calculated once.
+        If `panel` (a `MmapDatasetPanel`) is given, the data is written into the `panel_index`-th instrument of it.
 
-        return value: A data frame with index 'datetime' and other data columns.
+        return value: A data frame with index 'datetime' and other data columns; or the positions of the rows in the
+        panel if the data is written into the panel.
 
         """
         # FIXME: Windows OS or MacOS using spawn: https://docs.python.org/3.8/library/multiprocessing.html?highlight=spawn#contexts-and-start-methods
         # NOTE: This place is compatible with windows, windows multi-process is spawn
         C.register_from_C(g_config)
 
+        if plan is not None:
+            plan.execute(inst)
         obj = dict()
         for field in column_names:
             #  The client does not have expression provider, the data will be loaded from cache using static method.
@@ -618,8 +990,8 @@ class DatasetProvider(abc.ABC):
         data = pd.DataFrame(obj)
         if not data.empty and not np.issubdtype(data.index.dtype, np.dtype("M")):
             # If the underlaying provides the data not in datatime formmat, we'll convert it into datetime format
-            _calendar = Cal.calendar(freq=freq)
-            data.index = _calendar[data.index.values.astype(int)]
+            _calendar = Cal.calendar_array(freq=freq)
+            data.index = pd.DatetimeIndex(_calendar[data.index.values.astype(int)])
         data.index.names = ["datetime"]
 
         if not data.empty and spans is not None:
@@ -632,6 +1004,10 @@ class DatasetProvider(abc.ABC):
             if _processor:
                 _processor_obj = init_instance_by_config(_processor, accept_types=InstProcessor)
                 data = _processor_obj(data, instrument=inst)
+        if panel is not None:
+            rows = panel.write(panel_index, data)
+            if rows is not None:
+                return rows
         return data
 
 
@@ -646,6 +1022,24 @@ class LocalCalendarProvider(CalendarProvider, ProviderBackendMixin):
         self.remote = remote
         self.backend = backend
 
+    def _load_backend(self, freq, future):
+        """get the calendar storage and its data; the current calendar is used if the future one does not exist"""
+        try:
+            backend_obj = self.backend_obj(freq=freq, future=future)
+            return backend_obj, backend_obj.data
+        except ValueError:
+            if future:
+                get_module_logger("data").warning(
+                    f"load calendar error: freq={freq}, future={future}; return current calendar!"
+                )
+                get_module_logger("data").warning(
+                    "You can get future calendar by referring to the following document: https://github.com/microsoft/qlib/blob/main/scripts/data_collector/contrib/README.md"
+                )
+                backend_obj = self.backend_obj(freq=freq, future=False)
+                return backend_obj, backend_obj.data
+            else:
+                raise
+
     def load_calendar(self, freq, future):
         """Load original calendar timestamp from file.
 
@@ -659,21 +1053,47 @@ class LocalCalendarProvider(CalendarProvider, ProviderBackendMixin):
         list
             list of timestamps
         """
-        try:
-            backend_obj = self.backend_obj(freq=freq, future=future).data
-        except ValueError:
-            if future:
-                get_module_logger("data").warning(
-                    f"load calendar error: freq={freq}, future={future}; return current calendar!"
-                )
-                get_module_logger("data").warning(
-                    "You can get future calendar by referring to the following document: https://github.com/microsoft/qlib/blob/main/scripts/data_collector/contrib/README.md"
-                )
-                backend_obj = self.backend_obj(freq=freq, future=False).data
-            else:
-                raise
+        _, data = self._load_backend(freq, future)
+        return [pd.Timestamp(x) for x in data]
 
-        return [pd.Timestamp(x) for x in backend_obj]
+    @staticmethod
+    def get_calendar_cache_dir() -> Path:
+        cache_dir = C.get("calendar_cache_dir", None)
+        cache_dir = Path(tempfile.gettempdir()).joinpath("qlib_calendars") if cache_dir is None else Path(cache_dir)
+        cache_dir = cache_dir.expanduser()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir
+
+    def load_calendar_array(self, freq, future):
+        """Load original calendar timestamp from file as a `datetime64[ns]` array.
+
+        The calendar of a file is dumped once to a `.npy` file in `C.calendar_cache_dir` and then memory-mapped, so
+        all the processes (e.g. the joblib workers) share the same physical memory and skip parsing the file.
+        The dumped calendar is renewed when the file or the region is changed.
+        """
+        backend_obj = self.backend_obj(freq=freq, future=future)
+        uri = getattr(backend_obj, "uri", None)
+        cache_path = None
+        if isinstance(uri, Path) and uri.exists():
+            stat = uri.stat()
+            key = f"{uri}|{freq}|{C['region']}|{stat.st_mtime_ns}|{stat.st_size}"
+            cache_path = self.get_calendar_cache_dir().joinpath(f"{hashlib.md5(key.encode()).hexdigest()}.npy")
+            if cache_path.exists():
+                return np.load(cache_path, mmap_mode="r")
+
+        _, data = self._load_backend(freq, future)
+        calendar = pd.DatetimeIndex(pd.to_datetime(data)).values
+        if cache_path is None or len(calendar) == 0:
+            return calendar
+        try:
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with tmp_path.open("wb") as f:
+                np.save(f, calendar)
+            tmp_path.replace(cache_path)
+        except OSError as e:
+            get_module_logger("data").warning(f"failed to dump the calendar to {cache_path}: {e}")
+            return calendar
+        return np.load(cache_path, mmap_mode="r")
 
 
 class LocalInstrumentProvider(InstrumentProvider, ProviderBackendMixin):
@@ -689,28 +1109,38 @@ class LocalInstrumentProvider(InstrumentProvider, ProviderBackendMixin):
     def _load_instruments(self, market, freq):
         return self.backend_obj(market=market, freq=freq).data
 
+    def span_index(self, market, freq="day") -> InstrumentSpanIndex:
+        """Get the index of the time spans of the instruments in `market`.
+
+        The index is cached in `H["i"]` for each `(market, freq)`.
+
+        Parameters
+        ----------
+        market : str
+            market/industry/index shortname, e.g. all/sse/szse/sse50/csi300/csi500.
+        freq : str
+            time frequency.
+
+        Returns
+        -------
+        InstrumentSpanIndex
+            it answers the members during a time range and the daily membership masks
+        """
+        key = market, freq
+        index = H["i"].get(key)
+        if index is None:
+            index = InstrumentSpanIndex.from_dict(self._load_instruments(market, freq=freq))
+            H["i"][key] = index
+        return index
+
     def list_instruments(self, instruments, start_time=None, end_time=None, freq="day", as_list=False):
         market = instruments["market"]
-        if market in H["i"]:
-            _instruments = H["i"][market]
-        else:
-            _instruments = self._load_instruments(market, freq=freq)
-            H["i"][market] = _instruments
         # strip
         # use calendar boundary
-        cal = Cal.calendar(freq=freq)
+        cal = Cal.calendar_array(freq=freq)
         start_time = pd.Timestamp(start_time or cal[0])
         end_time = pd.Timestamp(end_time or cal[-1])
-        _instruments_filtered = {
-            inst: list(
-                filter(
-                    lambda x: x[0] <= x[1],
-                    [(max(start_time, pd.Timestamp(x[0])), min(end_time, pd.Timestamp(x[1]))) for x in spans],
-                )
-            )
-            for inst, spans in _instruments.items()
-        }
-        _instruments_filtered = {key: value for key, value in _instruments_filtered.items() if value}
+        _instruments_filtered = self.span_index(market, freq=freq).members(start_time, end_time).to_dict()
         # filter
         filter_pipe = instruments["filter_pipe"]
         for filter_config in filter_pipe:
@@ -746,61 +1176,42 @@ class LocalPITProvider(PITProvider):
     # TODO: Add PIT backend file storage
     # NOTE: This class is not multi-threading-safe!!!!
 
-    def period_feature(self, instrument, field, start_index, end_index, cur_time, period=None):
-        if not isinstance(cur_time, pd.Timestamp):
-            raise ValueError(
-                f"Expected pd.Timestamp for `cur_time`, got '{cur_time}'. Advices: you can't query PIT data directly(e.g. '$$roewa_q'), you must use `P` operator to convert data to each day (e.g. 'P($$roewa_q)')"
-            )
-
-        assert end_index <= 0  # PIT don't support querying future data
-
-        DATA_RECORDS = [
-            ("date", C.pit_record_type["date"]),
-            ("period", C.pit_record_type["period"]),
-            ("value", C.pit_record_type["value"]),
-            ("_next", C.pit_record_type["index"]),
-        ]
-        VALUE_DTYPE = C.pit_record_type["value"]
+    def __init__(self):
+        # data path -> (the modified time of the files, timeline)
+        self._timelines = {}
 
+    def period_timeline(self, instrument, field):
         field = str(field).lower()[2:]
         instrument = code_to_fname(instrument)
-
-        # {For acceleration
-        # start_index, end_index, cur_index = kwargs["info"]
-        # if cur_index == start_index:
-        #     if not hasattr(self, "all_fields"):
-        #         self.all_fields = []
-        #     self.all_fields.append(field)
-        #     if not hasattr(self, "period_index"):
-        #         self.period_index = {}
-        #     if field not in self.period_index:
-        #         self.period_index[field] = {}
-        # For acceleration}
-
         if not field.endswith("_q") and not field.endswith("_a"):
             raise ValueError("period field must ends with '_q' or '_a'")
-        quarterly = field.endswith("_q")
         index_path = C.dpm.get_data_uri() / "financial" / instrument.lower() / f"{field}.index"
         data_path = C.dpm.get_data_uri() / "financial" / instrument.lower() / f"{field}.data"
         if not (index_path.exists() and data_path.exists()):
             raise FileNotFoundError("No file is found. Raise exception and  ")
-        # NOTE: The most significant performance loss is here.
-        # Does the acceleration that makes the program complicated really matters?
-        # - It makes parameters of the interface complicate
-        # - It does not performance in the optimal way (places all the pieces together, we may achieve higher performance)
-        #    - If we design it carefully, we can go through for only once to get the historical evolution of the data.
-        # So I decide to deprecated previous implementation and keep the logic of the program simple
-        # Instead, I'll add a cache for the index file.
-        data = np.fromfile(data_path, dtype=DATA_RECORDS)
+        # the files are loaded again only if they are updated (e.g. by `dump_pit`)
+        mtime = index_path.stat().st_mtime_ns, data_path.stat().st_mtime_ns
+        cached = self._timelines.get(data_path)
+        if cached is None or cached[0] != mtime:
+            cached = mtime, PITTimeline(index_path, data_path, field.endswith("_q"))
+            self._timelines[data_path] = cached
+        return cached[1]
+
+    def period_feature(self, instrument, field, start_index, end_index, cur_time, period=None):
+        if not isinstance(cur_time, pd.Timestamp):
+            raise ValueError(
+                f"Expected pd.Timestamp for `cur_time`, got '{cur_time}'. Advices: you can't query PIT data directly(e.g. '$$roewa_q'), you must use `P` operator to convert data to each day (e.g. 'P($$roewa_q)')"
+            )
+
+        assert end_index <= 0  # PIT don't support querying future data
+
+        timeline = self.period_timeline(instrument, field)
 
         # find all revision periods before `cur_time`
-        cur_time_int = int(cur_time.year) * 10000 + int(cur_time.month) * 100 + int(cur_time.day)
-        loc = np.searchsorted(data["date"], cur_time_int, side="right")
-        if loc <= 0:
+        cur_time_int = PITTimeline.date_to_int(cur_time)
+        period_list = timeline.period_list(cur_time_int)
+        if len(period_list) == 0:
             return pd.Series()
-        last_period = data["period"][:loc].max()  # return the latest quarter
-        first_period = data["period"][:loc].min()
-        period_list = get_period_list(first_period, last_period, quarterly)
         if period is not None:
             # NOTE: `period` has higher priority than `start_index` & `end_index`
             if period not in period_list:
@@ -809,25 +1220,10 @@ class LocalPITProvider(PITProvider):
                 period_list = [period]
         else:
             period_list = period_list[max(0, len(period_list) + start_index - 1) : len(period_list) + end_index]
-        value = np.full((len(period_list),), np.nan, dtype=VALUE_DTYPE)
-        for i, p in enumerate(period_list):
-            # last_period_index = self.period_index[field].get(period)  # For acceleration
-            value[i], now_period_index = read_period_data(
-                index_path, data_path, p, cur_time_int, quarterly  # , last_period_index  # For acceleration
-            )
-            # self.period_index[field].update({period: now_period_index})  # For acceleration
+        value = timeline.values(np.array(period_list, dtype=np.int64), cur_time_int)
         # NOTE: the index is period_list; So it may result in unexpected values(e.g. nan)
         # when calculation between different features and only part of its financial indicator is published
-        series = pd.Series(value, index=period_list, dtype=VALUE_DTYPE)
-
-        # {For acceleration
-        # if cur_index == end_index:
-        #     self.all_fields.remove(field)
-        #     if not len(self.all_fields):
-        #         del self.all_fields
-        #         del self.period_index
-        # For acceleration}
-
+        series = pd.Series(value, index=period_list, dtype=C.pit_record_type["value"])
         return series
 
 
@@ -857,7 +1253,8 @@ class LocalExpressionProvider(ExpressionProvider):
             start_index, end_index = query_start, query_end = start_time, end_time
 
         try:
-            series = expression.load(instrument, query_start, query_end, freq)
+            # the ranges overlapping the cached ones are sliced or merged from the cache
+            series = expression.load_range(instrument, query_start, query_end, freq)
         except Exception as e:
             get_module_logger("data").debug(
                 f"Loading expression error: "
@@ -868,9 +1265,9 @@ class LocalExpressionProvider(ExpressionProvider):
         # Ensure that each column type is consistent
         # FIXME:
         # 1) The stock data is currently float. If there is other types of data, this part needs to be re-implemented.
-        # 2) The the precision should be configurable
+        # 2) The precision is `C.compute_dtype` (float32 by default)
         try:
-            series = series.astype(np.float32)
+            series = series.astype(get_compute_dtype(np.float32), copy=False)
         except ValueError:
             pass
         except TypeError:
@@ -959,6 +1356,136 @@ class LocalDatasetProvider(DatasetProvider):
             ExpressionD.expression(inst, field, start_time, end_time, freq)
 
 
+class PanelDatasetProvider(LocalDatasetProvider):
+    """Panel dataset data provider class
+
+    Provide dataset data from local data source like `LocalDatasetProvider`, but the expressions are calculated on
+    panels (the calendar index by a chunk of instruments) instead of instrument by instrument, so each operator
+    runs once for the whole chunk.
+
+    The fields with operators which can't be calculated on a panel (e.g. `ChangeInstrument`, `IdxMax`, the PIT
+    operators or the custom operators without `_load_panel_internal`) are still calculated instrument by instrument.
+    The whole query falls back to `LocalDatasetProvider` when `inst_processors` are given or the expressions are not
+    provided by a `LocalExpressionProvider` with `time2idx` enabled (e.g. an expression cache is used).
+    """
+
+    def __init__(self, align_time: bool = True, chunk_size: int = 500):
+        """
+        Parameters
+        ----------
+        align_time : bool
+            Will we align the time to calendar, see `LocalDatasetProvider`
+        chunk_size : int
+            the number of instruments in one panel; the panels of different chunks are calculated in parallel.
+        """
+        super().__init__(align_time=align_time)
+        self.chunk_size = chunk_size
+
+    def dataset_processor(self, instruments_d, column_names, start_time, end_time, freq, inst_processors=[]):
+        if len(inst_processors) > 0 or not self.local_index_expression():
+            return DatasetProvider.dataset_processor(
+                instruments_d, column_names, start_time, end_time, freq, inst_processors=inst_processors
+            )
+        normalize_column_names = normalize_cache_fields(column_names)
+
+        if isinstance(instruments_d, dict):
+            inst_l = sorted(instruments_d.keys())
+            spans_l = [instruments_d[inst] for inst in inst_l]
+        else:
+            inst_l = sorted(instruments_d)
+            spans_l = [None] * len(inst_l)
+        chunks = [
+            (inst_l[i : i + self.chunk_size], spans_l[i : i + self.chunk_size])
+            for i in range(0, len(inst_l), self.chunk_size)
+        ]
+        workers = max(min(C.get_kernels(freq), len(chunks)), 1)
+        data = ParallelExt(n_jobs=workers, backend=C.joblib_backend, maxtasksperchild=C.maxtasksperchild)(
+            delayed(PanelDatasetProvider.panel_calculator)(
+                insts, spans, start_time, end_time, freq, normalize_column_names, C
+            )
+            for insts, spans in chunks
+        )
+
+        data = [df for df in data if len(df) > 0]
+        if len(data) > 0:
+            data = pd.concat(data, sort=False)
+            data = DiskDatasetCache.cache_to_origin_data(data, column_names)
+        else:
+            data = pd.DataFrame(
+                index=pd.MultiIndex.from_arrays([[], []], names=("instrument", "datetime")),
+                columns=column_names,
+                dtype=get_compute_dtype(np.float32),
+            )
+        return data
+
+    @staticmethod
+    def panel_calculator(instruments, spans_l, start_time, end_time, freq, column_names, g_config=None):
+        """
+        Calculate the expressions for a chunk of instruments on panels.
+
+        return value: A data frame with index <instrument, datetime> and other data columns, which is the same as
+        concatenating the results of `DatasetProvider.inst_calculator` of the instruments.
+
+        """
+        C.register_from_C(g_config)
+
+        start_time = time_to_slc_point(start_time)
+        end_time = time_to_slc_point(end_time)
+        _, _, start_index, end_index = Cal.locate_index(start_time, end_time, freq=freq, future=False)
+        _calendar = pd.DatetimeIndex(Cal.calendar_array(freq=freq)[start_index : end_index + 1])
+
+        # the range of each field is extended in the same way as `LocalExpressionProvider.expression`
+        query_range = {}
+        for field in column_names:
+            lft_etd, rght_etd = ExpressionD.get_expression_instance(field).get_extended_window_size()
+            if np.isfinite(lft_etd) and np.isfinite(rght_etd):
+                query_range[field] = int(max(0, start_index - lft_etd)), int(end_index + rght_etd)
+        ctx = PanelContext(
+            instruments,
+            min((_start for _start, _ in query_range.values()), default=None),
+            max((_end for _, _end in query_range.values()), default=None),
+        )
+
+        shape = (len(_calendar), len(instruments))
+        dtype = get_compute_dtype(np.float32)
+        values = dict()
+        rows = np.zeros(shape, dtype=bool)
+        for field in column_names:
+            ctx.reset()
+            try:
+                if field not in query_range:
+                    raise NotImplementedError(f"the range of {field} is not finite")
+                panel = ExpressionD.get_expression_instance(field).load_panel(ctx, *query_range[field], freq)
+                _values = panel.reindex(pd.RangeIndex(start_index, end_index + 1)).to_numpy(dtype=dtype)
+                _rows = ctx.mask(start_index, end_index)
+                _values[~_rows] = np.nan
+            except NotImplementedError:
+                _values, _rows = np.full(shape, np.nan, dtype=dtype), np.zeros(shape, dtype=bool)
+                for i, inst in enumerate(instruments):
+                    series = ExpressionD.expression(inst, field, start_time, end_time, freq)
+                    if not series.empty:
+                        _index = series.index.values.astype(int) - start_index
+                        _values[_index, i] = series.values
+                        _rows[_index, i] = True
+            values[field] = _values
+            rows |= _rows
+
+        for i, spans in enumerate(spans_l):
+            if spans is not None:
+                mask = np.zeros(len(_calendar), dtype=bool)
+                for begin, end in spans:
+                    mask |= (_calendar >= begin) & (_calendar <= end)
+                rows[:, i] &= mask
+
+        # the data is ordered by <instrument, datetime>
+        rows = rows.T
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(np.array(instruments, dtype=object), rows.sum(axis=1)), _calendar[np.nonzero(rows)[1]]],
+            names=["instrument", "datetime"],
+        )
+        return pd.DataFrame({field: values[field].T[rows] for field in column_names}, index=index)
+
+
 class ClientCalendarProvider(CalendarProvider):
     """Client calendar data provider class
 
@@ -982,6 +1509,9 @@ class ClientCalendarProvider(CalendarProvider):
         result = self.queue.get(timeout=C["timeout"])
         return result
 
+    def calendar_array(self, freq="day", future=False):
+        return pd.DatetimeIndex(self.calendar(freq=freq, future=future)).values
+
 
 class ClientInstrumentProvider(InstrumentProvider):
     """Client instrument data provider class
@@ -1056,6 +1586,26 @@ class ClientDatasetProvider(DatasetProvider):
                 "The dict of instruments will be cleaned every day."
             )
 
+        if hasattr(self.conn, "features_batch"):
+            """
+            The features are streamed from the server directly.
+            """
+            df = self.conn.features_batch(
+                [
+                    {
+                        "instruments": instruments,
+                        "fields": fields,
+                        "start_time": start_time,
+                        "end_time": end_time,
+                        "freq": freq,
+                        "inst_processors": inst_processors,
+                    }
+                ]
+            )[0]
+            if return_uri:
+                return df, self._uri(instruments, fields, start_time, end_time, freq, disk_cache, inst_processors)
+            return df
+
         if disk_cache == 0:
             """
             Call the server to generate the expression cache.
@@ -1181,6 +1731,9 @@ class BaseProvider:
         This function will try to use cache method which has a keyword `disk_cache`,
         and will use provider method if a type error is raised because the DatasetD instance
         is a provider class.
+
+        With `client_transport="local"`, the features are mapped copy-on-write from the shared memory of
+        `LocalFeatureServer`, so the modified pages are copied into the memory of the process.
         """
         disk_cache = C.default_disk_cache if disk_cache is None else disk_cache
         fields = list(fields)  # In case of tuple.
@@ -1191,6 +1744,51 @@ class BaseProvider:
         except TypeError:
             return DatasetD.dataset(instruments, fields, start_time, end_time, freq, inst_processors=inst_processors)
 
+    def iter_features(
+        self,
+        instruments,
+        fields,
+        start_time=None,
+        end_time=None,
+        freq="day",
+        inst_processors=[],
+        chunk_by="instrument",
+        chunk_size=100,
+    ):
+        """
+        Get the features chunk by chunk, the generator version of `features`.
+
+        The concatenation of the chunks is the same as the result of `features` (the chunks by date are ordered by
+        date first; the fields depending on the range, e.g. `Mean($close, 0)`, are calculated from `start_time` for
+        each date chunk), but only one chunk is kept in the memory at a time. So the features which are too large to be
+        loaded at once can be downcast or filtered chunk by chunk. The dataset cache is not used.
+
+        Parameters
+        ----------
+        chunk_by : str
+            "instrument" or "date", split the features by the instruments or by the dates.
+        chunk_size : int
+            the number of the instruments or the dates in each chunk.
+
+        Yields
+        ----------
+        pd.DataFrame
+            a pandas dataframe with <instrument, datetime> index.
+        """
+        fields = list(fields)  # In case of tuple.
+        # skip the dataset cache
+        provider = DatasetD.provider if hasattr(DatasetD, "provider") else DatasetD
+        yield from provider.iter_dataset(
+            instruments,
+            fields,
+            start_time,
+            end_time,
+            freq,
+            inst_processors=inst_processors,
+            chunk_by=chunk_by,
+            chunk_size=chunk_size,
+        )
+
 
 class LocalProvider(BaseProvider):
     def _uri(self, type, **kwargs):
@@ -1247,9 +1845,19 @@ class ClientProvider(BaseProvider):
 
             return isinstance(instance, cls)
 
-        from .client import Client  # pylint: disable=C0415
+        from .client import ArrowClient, Client, LocalFeatureClient  # pylint: disable=C0415
 
-        self.client = Client(C.flask_server, C.flask_port)
+        if C.get("client_transport", "socketio") == "local":
+            self.client = LocalFeatureClient(C.client_socket_path, pool_size=C.get("client_pool_size", 4))
+        elif C.get("client_transport", "socketio") == "arrow":
+            self.client = ArrowClient(
+                C.flask_server,
+                C.flask_port,
+                compression=C.get("client_compression"),
+                pool_size=C.get("client_pool_size", 4),
+            )
+        else:
+            self.client = Client(C.flask_server, C.flask_port)
         self.logger = get_module_logger(self.__class__.__name__)
         if is_instance_of_provider(Cal, ClientCalendarProvider):
             Cal.set_conn(self.client)
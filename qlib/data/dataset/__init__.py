@@ -1,6 +1,11 @@
+import os
+import pickle
+import shutil
+from pathlib import Path
 from ...utils.serial import Serializable
 from typing import Callable, Union, List, Tuple, Dict, Text, Optional
-from ...utils import init_instance_by_config, np_ffill, time_to_slc_point
+from ...utils import hash_args, init_instance_by_config, np_ffill, time_to_slc_point
+from ...config import C
 from ...log import get_module_logger
 from .handler import DataHandler, DataHandlerLP
 from copy import copy, deepcopy
@@ -335,6 +340,18 @@ class TSDataSampler:
             (1) Get the i-th indexable sample(time-series):   (indexable sample index) -> [idx_map] -> (row col) -> [idx_df] -> (index in data_arr)
             (2) Get the specific sample by <datetime, instrument>:  (<datetime, instrument>, i.e. <row, col>) -> [idx_df] -> (index in data_arr)
             (3) Get the index of a time-series data:   (get the <row, col>, refer to (1), (2)) -> [idx_df] -> (all indices in data_arr for time-series)
+
+            sample_indices: np.ndarray
+                The result of (3) for all the indexable samples; it is a int32 matrix with shape (len(idx_map), step_len)
+                whose missing steps are filled by `fillna_type` in advance. So a batch of int indices is fetched by one
+                `np.take` on data_arr.
+
+    On-disk mode:
+        When `cache_path` is given, data_arr is materialized in a `.npy` file in the directory `cache_path` instead of
+        the memory, and the indices are saved beside it. The sampler is backed by the read-only memory-mapped files,
+        so it is loaded by `TSDataSampler.load` without the data handler, and it is pickled by the path of the files
+        (e.g. to the workers of `torch.utils.data.DataLoader`), so the processes share the page cache of the files
+        instead of copying the data.
     """
 
     # Please refer to the docstring of TSDataSampler for the definition of following attributes
@@ -342,6 +359,11 @@ class TSDataSampler:
     data_index: pd.MultiIndex
     idx_map: np.ndarray
     idx_df: pd.DataFrame
+    sample_indices: np.ndarray
+
+    # the arrays saved in the directory of the cache; they are memory-mapped instead of pickled
+    CACHE_ARRAYS = ("data_arr", "idx_map", "idx_arr", "sample_indices")
+    CACHE_META = "meta.pkl"
 
     def __init__(
         self,
@@ -352,6 +374,7 @@ class TSDataSampler:
         fillna_type: str = "none",
         dtype=None,
         flt_data=None,
+        cache_path: Union[str, Path] = None,
     ):
         """
         Build a dataset which looks like torch.data.utils.Dataset.
@@ -378,6 +401,9 @@ class TSDataSampler:
             a column of data(True or False) to filter data. Its index order is <"datetime", "instrument">
             None:
                 kepp all data
+        cache_path : Union[str, Path]
+            the directory to save the arrays of the sampler in; the sampler is backed by the memory-mapped files.
+            None: the arrays are kept in the memory
 
         """
         self.start = start
@@ -390,19 +416,24 @@ class TSDataSampler:
             data.columns, axis=1, inplace=True
         )  # data is useless since it's passed to a transposed one, hard code to free the memory of this dataframe to avoid three big dataframe in the memory(including: data, self.data, self.data_arr)
 
-        kwargs = {"object": self.data}
-        if dtype is not None:
-            kwargs["dtype"] = dtype
-
-        self.data_arr = np.array(**kwargs)  # Get index from numpy.array will much faster than DataFrame.values!
+        values = self.data.values
+        # Get index from numpy.array will much faster than DataFrame.values!
         # NOTE:
         # - append last line with full NaN for better performance in `__getitem__`
         # - Keep the same dtype will result in a better performance
-        self.data_arr = np.append(
-            self.data_arr,
-            np.full((1, self.data_arr.shape[1]), np.nan, dtype=self.data_arr.dtype),
-            axis=0,
-        )
+        # - The array is in C order, so the rows of a time-series are gathered from continuous memory (the values of
+        #   the DataFrame are usually in Fortran order)
+        shape, dtype = (values.shape[0] + 1, values.shape[1]), values.dtype if dtype is None else dtype
+        if cache_path is None:
+            self.data_arr = np.empty(shape, dtype=dtype)
+        else:
+            # the data is written into the file directly, so it is not held in the memory twice
+            tmp_path = Path(f"{cache_path}.{os.getpid()}.tmp")
+            tmp_path.mkdir(parents=True)
+            self.data_arr = np.lib.format.open_memmap(tmp_path / "data_arr.npy", mode="w+", dtype=dtype, shape=shape)
+        self.data_arr[:-1] = values
+        self.data_arr[-1] = np.nan
+        del values
         self.nan_idx = -1  # The last line is all NaN
 
         # the data type will be changed
@@ -428,6 +459,82 @@ class TSDataSampler:
 
         self.idx_arr = np.array(self.idx_df.values, dtype=np.float64)  # for better performance
         del self.data  # save memory
+        self.build_sample_indices()
+        self.cache_path = None
+        if cache_path is not None:
+            self._dump(tmp_path, Path(cache_path))
+
+    def _dump(self, tmp_path: Path, cache_path: Path):
+        """save the arrays into `tmp_path` and move it to `cache_path`, then map the files of `cache_path`"""
+        self.data_arr.flush()
+        for name in self.CACHE_ARRAYS[1:]:
+            np.save(tmp_path / f"{name}.npy", getattr(self, name))
+        meta = {
+            "data_index": self.data_index,
+            "idx_index": self.idx_df.index,
+            "idx_columns": self.idx_df.columns,
+            "sample_indices_conf": (self.step_len, self.fillna_type),
+        }
+        with (tmp_path / self.CACHE_META).open("wb") as f:
+            pickle.dump(meta, f, protocol=C.dump_protocol_version)
+        try:
+            tmp_path.rename(cache_path)
+        except OSError:
+            # the same cache has been saved by another process
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.cache_path = str(cache_path)
+        self._map_cache()
+
+    def _map_cache(self):
+        """map the arrays in `cache_path` as read-only arrays"""
+        cache_path = Path(self.cache_path)
+        with (cache_path / self.CACHE_META).open("rb") as f:
+            meta = pickle.load(f)
+        for name in self.CACHE_ARRAYS:
+            setattr(self, name, np.load(cache_path / f"{name}.npy", mmap_mode="r"))
+        if meta["sample_indices_conf"] != (self.step_len, self.fillna_type):
+            # the step_len or the fillna_type is changed by `config`
+            self.sample_indices = None
+        self.data_index = meta["data_index"]
+        # the rows and the columns of idx_df are kept, the positions are the same as idx_arr
+        self.idx_df = pd.DataFrame(self.idx_arr, index=meta["idx_index"], columns=meta["idx_columns"], copy=False)
+
+    @classmethod
+    def load(cls, cache_path: Union[str, Path], start=None, end=None, step_len: int = None, fillna_type: str = None):
+        """
+        Load the sampler saved in `cache_path` by the `cache_path` argument of `__init__`.
+
+        The arguments except `cache_path` are the same as the ones to create the sampler. `step_len` and `fillna_type`
+        are read from the cache if they are None.
+        """
+        self = cls.__new__(cls)
+        with (Path(cache_path) / cls.CACHE_META).open("rb") as f:
+            cached_step_len, cached_fillna_type = pickle.load(f)["sample_indices_conf"]
+        self.start, self.end = start, end
+        self.step_len = cached_step_len if step_len is None else step_len
+        self.fillna_type = cached_fillna_type if fillna_type is None else fillna_type
+        self.nan_idx = -1
+        self.cache_path = str(cache_path)
+        self._map_cache()
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if state.get("cache_path") is not None:
+            # the mapped arrays are mapped from the files again after unpickling
+            for name in self.CACHE_ARRAYS:
+                if isinstance(state.get(name), np.memmap):
+                    state.pop(name)
+            state.pop("data_index", None)
+            state.pop("idx_df", None)
+        return state
+
+    def __setstate__(self, state):
+        if state.get("cache_path") is not None:
+            self.__dict__.update(state)
+            self._map_cache()
+        # the arrays rebuilt after the cache is saved (e.g. `sample_indices` after `config`) are kept
+        self.__dict__.update(state)
 
     @staticmethod
     def slice_idx_map_and_data_index(
@@ -486,6 +593,51 @@ class TSDataSampler:
         # Config the attributes
         for k, v in kwargs.items():
             setattr(self, k, v)
+        if "step_len" in kwargs or "fillna_type" in kwargs:
+            # rebuilt before the sampler is passed to the workers of DataLoader, so they don't build it separately
+            self.build_sample_indices()
+
+    # the number of samples whose indices are built at a time, so the float64 intermediate arrays are kept small
+    BUILD_CHUNK_SIZE = 1 << 16
+
+    def build_sample_indices(self) -> np.ndarray:
+        """
+        Build the indices in data_arr of the time-series of all the indexable samples.
+
+        The result is the same as calling `_get_indices` on each sample, so a batch of samples is fetched by one
+        `np.take` on data_arr.
+
+        Returns
+        -------
+        np.ndarray:
+            the int32 matrix with shape (len(self), step_len); the missing steps (after filling) point to the last
+            line of data_arr, which is all NaN
+        """
+        steps = np.arange(-self.step_len + 1, 1, dtype=np.int64)
+        sample_indices = np.empty((len(self.idx_map), self.step_len), dtype=np.int32)
+        for start in range(0, len(self.idx_map), self.BUILD_CHUNK_SIZE):
+            idx_map = self.idx_map[start : start + self.BUILD_CHUNK_SIZE]
+            rows = idx_map[:, 0:1].astype(np.int64) + steps
+            indices = self.idx_arr[np.maximum(rows, 0), idx_map[:, 1:2]]
+            # the steps before the first row of idx_df
+            indices[rows < 0] = np.nan
+            if self.fillna_type == "ffill":
+                indices = np_ffill(indices)
+            elif self.fillna_type == "ffill+bfill":
+                indices = np_ffill(np_ffill(indices)[:, ::-1])[:, ::-1]
+            else:
+                assert self.fillna_type == "none"
+            sample_indices[start : start + len(idx_map)] = np.nan_to_num(indices, nan=self.nan_idx)
+        self.sample_indices = sample_indices
+        return sample_indices
+
+    def _get_sample_indices(self, idx: np.ndarray) -> np.ndarray:
+        """get the rows of `sample_indices` of the int indices of the samples"""
+        if getattr(self, "sample_indices", None) is None:
+            self.build_sample_indices()
+        if idx.size > 0 and (idx.min() < 0 or idx.max() >= len(self.idx_map)):
+            raise KeyError(f"{idx[(idx < 0) | (idx >= len(self.idx_map))][0]} is out of [0, {len(self.idx_map)})")
+        return self.sample_indices[idx]
 
     @staticmethod
     def build_index(data: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
@@ -615,6 +767,13 @@ class TSDataSampler:
         """
         # Multi-index type
         mtit = (list, np.ndarray)
+        if isinstance(idx, (int, np.integer)) or (isinstance(idx, mtit) and np.asarray(idx).dtype.kind in "iu"):
+            # the indices of the time-series of the samples are prebuilt, so the whole batch is taken at once
+            indices = self._get_sample_indices(np.asarray(idx))
+            if indices.ndim == 1 and (np.diff(indices) == 1).all():  # slicing instead of indexing for speeding up.
+                return self.data_arr[indices[0] : indices[-1] + 1]
+            # <sample_idx, step_idx, feature_idx> for multiple indexes
+            return np.take(self.data_arr, indices, axis=0)
         if isinstance(idx, mtit):
             indices = [self._get_indices(*self._get_row_col(i)) for i in idx]
             indices = np.concatenate(indices)
@@ -661,21 +820,105 @@ class TSDatasetH(DatasetH):
 
     DEFAULT_STEP_LEN = 30
 
-    def __init__(self, step_len=DEFAULT_STEP_LEN, **kwargs):
+    def __init__(self, step_len=DEFAULT_STEP_LEN, cache_dir: Union[str, Path] = None, **kwargs):
+        """
+        Parameters
+        ----------
+        step_len : int
+            the length of the time-series of each sample
+        cache_dir : Union[str, Path]
+            the directory to cache the `TSDataSampler` of the segments in the on-disk mode. The caches are keyed by the
+            config of the handler, the segment, the arguments of `prepare` and the fingerprint of the data (see
+            `get_data_fingerprint`), so the prepared segments are loaded from the memory-mapped files next time. If the
+            handler is given by its config, it is set up only when a segment misses the cache.
+            None: the segments are not cached
+        """
         self.step_len = step_len
+        self.cache_dir = cache_dir
+        handler = kwargs.get("handler")
+        # the handler is identified by its config; the instance of handler can not be identified
+        self.handler_hash = hash_args(handler) if cache_dir is not None and isinstance(handler, dict) else None
+        self.data_fingerprint = None
+        if self.handler_hash is not None:
+            loader = handler.get("kwargs", {}).get("data_loader", {})
+            loader_kwargs = loader.get("kwargs", {}) if isinstance(loader, dict) else {}
+            self.data_fingerprint = self.get_data_fingerprint(
+                handler.get("kwargs", {}).get("freq", loader_kwargs.get("freq", "day"))
+            )
+        self._lazy_handler = self.handler_hash is not None
+        if self._lazy_handler:
+            kwargs["handler"] = {**handler, "kwargs": {**handler.get("kwargs", {}), "init_data": False}}
+        elif cache_dir is not None:
+            get_module_logger("TSDatasetH").warning("The segments are not cached because the handler is not a config")
         super().__init__(**kwargs)
 
     def config(self, **kwargs):
         if "step_len" in kwargs:
             self.step_len = kwargs.pop("step_len")
+        if getattr(self, "handler_hash", None) is not None and kwargs.get("handler_kwargs") is not None:
+            self.handler_hash = hash_args(self.handler_hash, kwargs["handler_kwargs"])
         super().config(**kwargs)
 
     def setup_data(self, **kwargs):
         super().setup_data(**kwargs)
+        if kwargs.get("handler_kwargs") is not None:
+            self._lazy_handler = False
+            if getattr(self, "handler_hash", None) is not None:
+                self.handler_hash = hash_args(self.handler_hash, kwargs["handler_kwargs"])
+        if not getattr(self, "_lazy_handler", False):
+            self._setup_cal()
+
+    def _setup_cal(self):
         # make sure the calendar is updated to latest when loading data from new config
         cal = self.handler.fetch(col_set=self.handler.CS_RAW).index.get_level_values("datetime").unique()
         self.cal = sorted(cal)
 
+    @staticmethod
+    def get_data_fingerprint(freq: str = "day") -> str:
+        """
+        a cheap fingerprint of the data of the provider
+
+        It is the last date of the calendar and the latest modified time of the files and the directories of the
+        calendars, the instruments and the features of the local provider. So it changes when the data is updated
+        or corrected (e.g. by `scripts/dump_bin.py`) and the cached segments are not reused.
+
+        The data of a remote provider (e.g. the client mode without a mounted `provider_uri`) is only identified by
+        the calendar, please clear `cache_dir` after the data is corrected in this case.
+        """
+        from ..data import D  # pylint: disable=C0415
+
+        calendar = D.calendar(freq=freq)
+        mtime = 0
+        uri = C.dpm.get_data_uri(freq)
+        stack = [str(uri.joinpath(name)) for name in ["calendars", "instruments", "features"]]
+        while stack:
+            path = stack.pop()
+            if not os.path.isdir(path):
+                continue
+            mtime = max(mtime, os.stat(path).st_mtime_ns)
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        mtime = max(mtime, entry.stat().st_mtime_ns)
+        return hash_args(str(calendar[-1]) if len(calendar) > 0 else None, mtime)
+
+    def _get_cache_path(self, slc: slice, **kwargs) -> Optional[Path]:
+        """the directory of the cache of the segment; None if the segments are not cached"""
+        if getattr(self, "cache_dir", None) is None or getattr(self, "handler_hash", None) is None:
+            return None
+        key = hash_args(
+            self.handler_hash,
+            getattr(self, "data_fingerprint", None),
+            self.step_len,
+            slc.start,
+            slc.stop,
+            getattr(self, "fetch_kwargs", {}),
+            kwargs,
+        )
+        return Path(self.cache_dir).expanduser().joinpath(key)
+
     @staticmethod
     def _extend_slice(slc: slice, cal: list, step_len: int) -> slice:
         # Dataset decide how to slice data(Get more data for timeseries).
@@ -690,11 +933,18 @@ class TSDatasetH(DatasetH):
         split the _prepare_raw_seg is to leave a hook for data preprocessing before creating processing data
         NOTE: TSDatasetH only support slc segment on datetime !!!
         """
-        dtype = kwargs.pop("dtype", None)
         if not isinstance(slc, slice):
             slc = slice(*slc)
+        cache_path = self._get_cache_path(slc, **kwargs)
+        dtype = kwargs.pop("dtype", None)
         start, end = slc.start, slc.stop
         flt_col = kwargs.pop("flt_col", None)
+        if cache_path is not None and cache_path.exists():
+            return TSDataSampler.load(cache_path, start=start, end=end, step_len=self.step_len)
+        if getattr(self, "_lazy_handler", False):
+            self.handler.setup_data()
+            self._lazy_handler = False
+            self._setup_cal()
         # TSDatasetH will retrieve more data for complete time-series
 
         ext_slice = self._extend_slice(slc, self.cal, self.step_len)
@@ -715,6 +965,7 @@ class TSDatasetH(DatasetH):
             step_len=self.step_len,
             dtype=dtype,
             flt_data=flt_data,
+            cache_path=cache_path,
         )
         return tsds
 
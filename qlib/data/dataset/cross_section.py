@@ -0,0 +1,184 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The cross-sectional operations on the blocks of rows of the same datetime.
+
+The data of the handlers is sorted by <datetime, instrument>, so the rows of each datetime are a continuous block of
+the values array. The operations are calculated by the reductions on the segments of the array (e.g.
+`np.add.reduceat`) or block by block on the whole rows of a block, instead of `groupby("datetime").apply`, which
+creates a DataFrame for each datetime and concatenates them.
+"""
+import warnings
+from typing import Callable, Union
+
+import numpy as np
+import pandas as pd
+
+from .utils import get_level_index
+
+
+class CSBlocks:
+    """The blocks of rows of the same datetime of an index
+
+    The methods process the 2D values array (rows aligned with the index, columns as the features) in place and return
+    it. The array is processed in chunks of whole blocks, so the temporary arrays are limited by `CHUNK_SIZE`. If the
+    rows of the same datetime are not continuous in the index, the rows are sorted by datetime before the calculation
+    and put back after it.
+    """
+
+    # the max number of the elements of a chunk (unless a block is larger than it)
+    CHUNK_SIZE = 1 << 24
+
+    def __init__(self, index: pd.Index, level: Union[str, int] = "datetime"):
+        if isinstance(index, pd.MultiIndex):
+            codes = np.asarray(index.codes[get_level_index(pd.DataFrame(index=index), level)])
+        else:
+            codes = pd.factorize(index)[0]
+        changed = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        self.order = None
+        if len(codes) > 0 and len(changed) + 1 != len(np.unique(codes)):
+            # the rows of the same datetime are not continuous
+            self.order = np.argsort(codes, kind="stable")
+            codes = codes[self.order]
+            changed = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        self.starts = np.concatenate([[0], changed]).astype(np.intp) if len(codes) > 0 else np.zeros(0, dtype=np.intp)
+        self.lengths = np.diff(np.append(self.starts, len(codes)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def apply(self, values: np.ndarray, func: Callable[[np.ndarray, np.ndarray, np.ndarray], None]) -> np.ndarray:
+        """call `func(chunk, starts, lengths)` on each chunk of the blocks, the starts are relative to the chunk"""
+        if len(values) == 0:
+            return values
+        data = values if self.order is None else values[self.order]
+        chunk_rows = max(self.CHUNK_SIZE // max(values.shape[1], 1), 1)
+        ends = self.starts + self.lengths
+        i = 0
+        while i < len(self):
+            # the blocks ending in the chunk; at least one block
+            j = max(np.searchsorted(ends, self.starts[i] + chunk_rows, side="right"), i + 1)
+            row_start, row_end = self.starts[i], ends[j - 1]
+            func(data[row_start:row_end], self.starts[i:j] - row_start, self.lengths[i:j])
+            i = j
+        if self.order is not None:
+            values[self.order] = data
+        return values
+
+    def zscore(self, values: np.ndarray) -> np.ndarray:
+        """(x - mean) / std in each block, the same as `qlib.utils.data.zscore` (std is the sample std)"""
+        return self.apply(values, _zscore)
+
+    def robust_zscore(self, values: np.ndarray) -> np.ndarray:
+        """clip((x - median) / MAD / 1.4826, -3, 3) in each block, the same as `qlib.utils.data.robust_zscore`"""
+        return self.apply(values, _robust_zscore)
+
+    def rank_pct(self, values: np.ndarray) -> np.ndarray:
+        """the percentage ranks in each block, the same as `rank(pct=True)`; the ties get the average rank"""
+        return self.apply(values, _rank_pct)
+
+    def replace_inf(self, values: np.ndarray) -> np.ndarray:
+        """replace the infinities with the mean of the finite values of the column in each block"""
+        return self.apply(values, _replace_inf)
+
+    def fillna_mean(self, values: np.ndarray) -> np.ndarray:
+        """fill the NaNs with the mean of the column in each block"""
+        return self.apply(values, _fillna_mean)
+
+    def in_top_k(self, values: np.ndarray, k: int) -> np.ndarray:
+        """
+        set the rows to 1 if the value of the last column is in the largest k values of the block, otherwise 0
+
+        The NaNs are not in the top k; the ties are broken by the order of the rows.
+        """
+        return self.apply(values, lambda chunk, starts, lengths: _in_top_k(chunk, starts, lengths, k))
+
+
+def _mean(filled: np.ndarray, count: np.ndarray, starts: np.ndarray, dtype) -> np.ndarray:
+    """the mean of each block of the values whose NaNs are filled by 0, summed in `dtype` like `DataFrame.mean`"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.add.reduceat(filled, starts, axis=0, dtype=dtype) / count.astype(dtype)
+
+
+def _zscore(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    mask = np.isnan(values)
+    filled = np.where(mask, 0, values)
+    count = np.add.reduceat(~mask, starts, axis=0, dtype=np.float64)
+    mean = _mean(filled, count, starts, values.dtype)
+    # the variance is calculated in float64 like `DataFrame.std`
+    sqr = np.repeat(_mean(filled, count, starts, np.float64), lengths, axis=0)
+    del filled
+    sqr -= values
+    sqr *= sqr
+    sqr[mask] = 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        std = np.sqrt((np.add.reduceat(sqr, starts, axis=0) / (count - 1)).astype(values.dtype))
+        del sqr
+        values -= np.repeat(mean, lengths, axis=0)
+        values /= np.repeat(std, lengths, axis=0)
+
+
+def _robust_zscore(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        # the columns without any value in a block
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for start, length in zip(starts, lengths):
+            block = values[start : start + length]
+            block -= np.nanmedian(block, axis=0)
+            block /= np.nanmedian(np.abs(block), axis=0)
+        values /= 1.4826
+        np.clip(values, -3, 3, out=values)
+
+
+def _rank_pct(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    for start, length in zip(starts, lengths):
+        block = values[start : start + length]
+        mask = np.isnan(block)
+        # NaNs are sorted to the end
+        order = np.argsort(block, axis=0, kind="stable")
+        sorted_block = np.take_along_axis(block, order, axis=0)
+        pos = np.arange(length)[:, None]
+        tie = np.zeros(block.shape, dtype=bool)
+        tie[1:] = sorted_block[1:] == sorted_block[:-1]
+        # the first and the last positions of the run of ties of each value
+        first = np.maximum.accumulate(np.where(tie, 0, pos), axis=0)
+        run_end = np.ones(block.shape, dtype=bool)
+        run_end[:-1] = ~tie[1:]
+        last = np.minimum.accumulate(np.where(run_end, pos, length)[::-1], axis=0)[::-1]
+        ranks = np.empty(block.shape, dtype=np.float64)
+        np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ranks /= length - mask.sum(axis=0)
+        ranks[mask] = np.nan
+        block[:] = ranks
+
+
+def _replace_inf(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    mask = np.isinf(values)
+    if mask.any():
+        # the mean skips the NaNs as well as the infinities
+        finite = np.isfinite(values)
+        count = np.add.reduceat(finite, starts, axis=0, dtype=np.float64)
+        mean = _mean(np.where(finite, values, 0), count, starts, values.dtype)
+        values[mask] = np.repeat(mean, lengths, axis=0)[mask]
+
+
+def _fillna_mean(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+    mask = np.isnan(values)
+    if mask.any():
+        count = np.add.reduceat(~mask, starts, axis=0, dtype=np.float64)
+        mean = _mean(np.where(mask, 0, values), count, starts, values.dtype)
+        values[mask] = np.repeat(mean, lengths, axis=0)[mask]
+
+
+def _in_top_k(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray, k: int):
+    key = values[:, -1].astype(np.float64)
+    nan = np.isnan(key)
+    key[nan] = -np.inf
+    block_ids = np.repeat(np.arange(len(starts)), lengths)
+    # sorted by block, and by the value in descending order in each block
+    order = np.lexsort((-key, block_ids))
+    in_top_k = np.empty(len(values), dtype=bool)
+    in_top_k[order] = (np.arange(len(values)) - np.repeat(starts, lengths)) < k
+    in_top_k &= ~nan
+    values[:] = in_top_k[:, None]
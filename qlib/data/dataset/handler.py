@@ -16,6 +16,7 @@ from ...utils import lazy_sort_index
 from .loader import DataLoader
 
 from . import processor as processor_module
+from .pipeline import ProcessorPipeline, fit_processor
 from . import loader as data_loader_module
 
 
@@ -473,10 +474,13 @@ class DataHandlerLP(DataHandler):
     def fit(self):
         """
         fit data without processing the data
+
+        The fitted processors are loaded from the cache if `C.processor_fit_cache_dir` is set and they have been fitted
+        on the same data (please refer to `qlib.data.dataset.pipeline.fit_processor`).
         """
         for proc in self.get_all_processors():
             with TimeInspector.logt(f"{proc.__class__.__name__}"):
-                proc.fit(self._data)
+                fit_processor(proc, self._data)
 
     def fit_process_data(self):
         """
@@ -486,29 +490,6 @@ class DataHandlerLP(DataHandler):
         """
         self.process_data(with_fit=True)
 
-    @staticmethod
-    def _run_proc_l(
-        df: pd.DataFrame, proc_l: List[processor_module.Processor], with_fit: bool, check_for_infer: bool
-    ) -> pd.DataFrame:
-        for proc in proc_l:
-            if check_for_infer and not proc.is_for_infer():
-                raise TypeError("Only processors usable for inference can be used in `infer_processors` ")
-            with TimeInspector.logt(f"{proc.__class__.__name__}"):
-                if with_fit:
-                    proc.fit(df)
-                df = proc(df)
-        return df
-
-    @staticmethod
-    def _is_proc_readonly(proc_l: List[processor_module.Processor]):
-        """
-        NOTE: it will return True if `len(proc_l) == 0`
-        """
-        for p in proc_l:
-            if not p.readonly():
-                return False
-        return True
-
     def process_data(self, with_fit: bool = False):
         """
         process_data data. Fun `processor.fit` if necessary
@@ -534,39 +515,42 @@ class DataHandlerLP(DataHandler):
         with_fit : bool
             The input of the `fit` will be the output of the previous processor
         """
+        # The processors of each stage are run by `ProcessorPipeline`, which fuses the in-place processors and copies
+        # the data only before it is written if it is shared with the data to be kept.
+        stats = []
+
+        def _run(df, proc_l, name, check_for_infer, keep):
+            pipeline = ProcessorPipeline(proc_l, name)
+            df = pipeline.run(df, with_fit=with_fit, check_for_infer=check_for_infer, keep=keep)
+            stats.extend(pipeline.stats)
+            return df
+
         # shared data processors
-        # 1) assign
-        _shared_df = self._data
-        if not self._is_proc_readonly(self.shared_processors):  # avoid modifying the original data
-            _shared_df = _shared_df.copy()
-        # 2) process
-        _shared_df = self._run_proc_l(_shared_df, self.shared_processors, with_fit=with_fit, check_for_infer=True)
+        _shared_df = _run(self._data, self.shared_processors, "shared", True, [self._data])
 
         # data for inference
-        # 1) assign
-        _infer_df = _shared_df
-        if not self._is_proc_readonly(self.infer_processors):  # avoid modifying the original data
-            _infer_df = _infer_df.copy()
-        # 2) process
-        _infer_df = self._run_proc_l(_infer_df, self.infer_processors, with_fit=with_fit, check_for_infer=True)
+        if self.process_type == DataHandlerLP.PTYPE_I:
+            # `_shared_df` is the input of the learn processors, too
+            keep = [self._data, _shared_df]
+        elif self.process_type == DataHandlerLP.PTYPE_A:
+            keep = [self._data]
+        else:
+            raise NotImplementedError(f"This type of input is not supported")
+        _infer_df = _run(_shared_df, self.infer_processors, "infer", True, keep)
 
         self._infer = _infer_df
 
         # data for learning
-        # 1) assign
         if self.process_type == DataHandlerLP.PTYPE_I:
             _learn_df = _shared_df
-        elif self.process_type == DataHandlerLP.PTYPE_A:
+        else:
             # based on `infer_df` and append the processor
             _learn_df = _infer_df
-        else:
-            raise NotImplementedError(f"This type of input is not supported")
-        if not self._is_proc_readonly(self.learn_processors):  # avoid modifying the original  data
-            _learn_df = _learn_df.copy()
-        # 2) process
-        _learn_df = self._run_proc_l(_learn_df, self.learn_processors, with_fit=with_fit, check_for_infer=False)
+        _learn_df = _run(_learn_df, self.learn_processors, "learn", False, [self._data, self._infer])
 
         self._learn = _learn_df
+        # the time, the copies and the peak memory of the steps of processing
+        self.process_stats = pd.DataFrame(stats)
 
         if self.drop_raw:
             del self._data
@@ -0,0 +1,289 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The executor of the processors of `DataHandlerLP`.
+
+`ProcessorPipeline` runs a list of processors with less copies and passes over the data than calling them one by one:
+
+- The consecutive processors supporting `Processor.get_inplace_func` (e.g. `ProcessInf`, `Fillna`, `ZScoreNorm`,
+  `RobustZScoreNorm` and the cross sectional processors) are fused into one step, which processes the values array
+  in place chunk by chunk, so each chunk is processed by all of them while it is in the cache.
+- The data is copied only before it is written and only if it shares the memory with the data to be kept (e.g. the
+  raw data of the handler). So no copy is needed after a processor which creates new data (e.g. the rows filtered by
+  `DropnaLabel`), and the data for learning is the data for inference if the learn processors do not modify it.
+- The time and the peak memory allocated by each step are recorded.
+
+The fitted processors are cached on disk by `fit_processor` if `C.processor_fit_cache_dir` is set, so the handlers
+fitting the same processors on the same data (e.g. the rolling tasks sharing the fit window) load them instead.
+"""
+import hashlib
+import os
+import pickle
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from ...config import C
+from ...log import TimeInspector, get_module_logger
+from ...utils import hash_args
+from .cross_section import CSBlocks
+from .processor import Processor, _process_cs
+from .utils import fetch_df_by_index
+
+logger = get_module_logger("pipeline")
+
+
+def _arrays(df: pd.DataFrame) -> List[np.ndarray]:
+    return [arr for arr in df._mgr.arrays if isinstance(arr, np.ndarray)]
+
+
+def shares_memory(df: pd.DataFrame, others: Sequence[pd.DataFrame]) -> bool:
+    """
+    whether the arrays of `df` may share the memory with the arrays of any of `others`
+
+    It is True if `df` is not a DataFrame (e.g. the storage created by `HashStockFormat`), and the others which are
+    not DataFrames are skipped.
+    """
+    if not isinstance(df, pd.DataFrame):
+        return True
+    arrays = _arrays(df)
+    for other in others:
+        if isinstance(other, pd.DataFrame):
+            for arr in _arrays(other):
+                if any(np.may_share_memory(arr, a) for a in arrays):
+                    return True
+    return False
+
+
+def _to_slice(pos: np.ndarray):
+    """use a slice (a view of the array) instead of the positions if the positions are continuous"""
+    if len(pos) > 0 and (np.diff(pos) == 1).all():
+        return slice(pos[0], pos[-1] + 1)
+    return pos
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """the hash of the index, the columns and the values of `df`"""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df.index).values.tobytes())
+    h.update(hash_args(df.columns.tolist(), df.dtypes.astype(str).tolist()).encode())
+    values = df.values
+    # column by column, so the hash does not depend on the memory layout of the values
+    for i in range(values.shape[1]):
+        h.update(np.ascontiguousarray(values[:, i]).data)
+    return h.hexdigest()
+
+
+def fit_processor(proc: Processor, df: pd.DataFrame, cache_dir: Union[str, Path] = None) -> Optional[bool]:
+    """
+    Fit the processor on `df`, or load the fitted attributes (`proc.FIT_ATTRS`) from the cache.
+
+    The cache is keyed by the class and the other attributes of the processor (e.g. `fit_start_time`, `fit_end_time`
+    and `fields_group`) and the fingerprint of the data in the fit range.
+
+    Parameters
+    ----------
+    proc : Processor
+        the processor.
+    df : pd.DataFrame
+        the data to fit.
+    cache_dir : Union[str, Path]
+        the directory of the cache, `C.processor_fit_cache_dir` by default. The processor is fitted without the cache
+        if it is None.
+
+    Returns
+    -------
+    Optional[bool]:
+        whether the fitted processor is loaded from the cache, None if the cache is not used.
+    """
+    cache_dir = C.get("processor_fit_cache_dir", None) if cache_dir is None else cache_dir
+    if cache_dir is None or len(proc.FIT_ATTRS) == 0 or not isinstance(df, pd.DataFrame):
+        proc.fit(df)
+        return None
+    config = {k: v for k, v in vars(proc).items() if k not in proc.FIT_ATTRS and not k.startswith("_")}
+    fit_df = df
+    if hasattr(proc, "fit_start_time") and hasattr(proc, "fit_end_time"):
+        fit_df = fetch_df_by_index(df, slice(proc.fit_start_time, proc.fit_end_time), level="datetime")
+    path = (
+        Path(cache_dir)
+        .expanduser()
+        .joinpath(f"{proc.__class__.__name__}_{hash_args(type(proc).__module__, config, fingerprint(fit_df))}.pkl")
+    )
+    if path.exists():
+        try:
+            with path.open("rb") as f:
+                state = pickle.load(f)
+            vars(proc).update(state)
+            logger.info(f"load the fitted {proc.__class__.__name__} from {path}")
+            return True
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            logger.warning(f"failed to load the fitted {proc.__class__.__name__} from {path}: {e}")
+    proc.fit(df)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # dump into a temporary file and rename it, so the concurrent tasks do not read a partial file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump({attr: getattr(proc, attr) for attr in proc.FIT_ATTRS}, f, protocol=C.dump_protocol_version)
+    os.replace(tmp_path, path)
+    return False
+
+
+class ProcessorPipeline:
+    """
+    Run a list of processors on a DataFrame.
+
+    The steps (a processor or the fused processors) are recorded in `stats`, including the time, the copy of the data
+    before the step ("full" or "") and the peak memory allocated by the step if `trace_memory` is enabled.
+    """
+
+    # the max number of the elements of a chunk of the fused processors (unless a datetime has more elements)
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, proc_l: List[Processor], name: str = "", trace_memory: bool = None):
+        """
+        Parameters
+        ----------
+        proc_l : List[Processor]
+            the processors.
+        name : str
+            the name of the pipeline in the stats, e.g. "shared", "infer" or "learn".
+        trace_memory : bool
+            trace the peak memory of the steps by `tracemalloc`, `C.trace_processor_memory` by default.
+        """
+        self.proc_l = proc_l
+        self.name = name
+        self.trace_memory = C.get("trace_processor_memory", False) if trace_memory is None else trace_memory
+        self.stats = []
+
+    def run(
+        self,
+        df: pd.DataFrame,
+        with_fit: bool = False,
+        check_for_infer: bool = False,
+        keep: Sequence[pd.DataFrame] = (),
+    ) -> pd.DataFrame:
+        """
+        Parameters
+        ----------
+        df : pd.DataFrame
+            the data to be processed.
+        with_fit : bool
+            fit each processor on the output of the previous processors before processing.
+        check_for_infer : bool
+            raise an error if any processor is not usable for inference.
+        keep : Sequence[pd.DataFrame]
+            the data which must not be modified, e.g. the raw data. `df` is copied before it is written if they share
+            the memory.
+
+        Returns
+        -------
+        pd.DataFrame:
+            the processed data.
+        """
+        self.stats = []
+        self._keep = keep
+        self._owned = not shares_memory(df, keep)
+        fused = []
+        for proc in self.proc_l:
+            if check_for_infer and not proc.is_for_infer():
+                raise TypeError("Only processors usable for inference can be used in `infer_processors` ")
+            if with_fit and type(proc).fit is not Processor.fit:
+                # the processor is fitted on the output of the previous processors
+                df = self._run_fused(df, fused)
+                fused = []
+                with self._step(f"{proc.__class__.__name__}.fit") as step:
+                    step["fit_cache"] = {None: "", True: "hit", False: "miss"}[fit_processor(proc, df)]
+            func = self._get_inplace_func(proc, df)
+            if func is None:
+                df = self._run_fused(df, fused)
+                fused = []
+                df = self._run_proc(df, proc)
+            else:
+                fused.append((proc, *func))
+        return self._run_fused(df, fused)
+
+    @staticmethod
+    def _get_inplace_func(proc: Processor, df: pd.DataFrame):
+        # the inherited `get_inplace_func` may not get the same result as the `__call__` overridden by the subclass
+        mro = type(proc).__mro__
+        if next(c for c in mro if "__call__" in vars(c)) is not next(c for c in mro if "get_inplace_func" in vars(c)):
+            return None
+        return proc.get_inplace_func(df)
+
+    @contextmanager
+    def _step(self, name: str):
+        step = {"stage": self.name, "step": name, "copy": ""}
+        # the memory is not traced if `tracemalloc` has been started outside
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        start = time.time()
+        try:
+            with TimeInspector.logt(name):
+                yield step
+            step["time"] = time.time() - start
+            if tracing:
+                step["peak_memory"] = tracemalloc.get_traced_memory()[1]
+                logger.info(f"{self.name} {name}: peak memory {step['peak_memory'] / (1 << 20):.1f}MB")
+        finally:
+            if tracing:
+                tracemalloc.stop()
+        self.stats.append(step)
+
+    def _run_proc(self, df: pd.DataFrame, proc: Processor) -> pd.DataFrame:
+        with self._step(proc.__class__.__name__) as step:
+            if proc.readonly():
+                res = proc(df)
+                if res is not df:
+                    # e.g. the rows are filtered into a new DataFrame, which does not need to be copied
+                    self._owned = not shares_memory(res, self._keep)
+                return res
+            if not self._owned:
+                df = df.copy()
+                self._owned = True
+                step["copy"] = "full"
+            return proc(df)
+
+    def _run_fused(self, df: pd.DataFrame, fused: list) -> pd.DataFrame:
+        if len(fused) == 0:
+            return df
+        if isinstance(df.index, pd.MultiIndex) and "datetime" not in df.index.names:
+            # the rows can't be split into the blocks of datetime
+            for proc, _, _ in fused:
+                df = self._run_proc(df, proc)
+            return df
+        with self._step("+".join(proc.__class__.__name__ for proc, _, _ in fused)) as step:
+            # the union of the columns of the processors and the positions of the columns of each processor in it
+            mask = np.zeros(df.shape[1], dtype=bool)
+            positions = []
+            for _, cols, func in fused:
+                pos = df.columns.get_indexer(cols)
+                if (pos < 0).any():
+                    raise KeyError(f"{cols[pos < 0].tolist()} not in the columns")
+                mask[pos] = True
+                positions.append((pos, func))
+            cols = df.columns[mask]
+            union_pos = np.cumsum(mask) - 1
+            funcs = [(_to_slice(union_pos[pos]), func) for pos, func in positions]
+
+            def fused_func(values, starts, lengths):
+                for sel, func in funcs:
+                    if isinstance(sel, slice):
+                        func(values[:, sel], starts, lengths)
+                    else:
+                        sub = values[:, sel]
+                        func(sub, starts, lengths)
+                        values[:, sel] = sub
+
+            blocks = CSBlocks(df.index)
+            blocks.CHUNK_SIZE = self.CHUNK_SIZE
+            if not self._owned:
+                df = df.copy()
+                self._owned = True
+                step["copy"] = "full"
+            return _process_cs(df, cols, lambda values: blocks.apply(values, fused_func))
@@ -2,15 +2,15 @@
 # Licensed under the MIT License.
 
 import abc
-from typing import Union, Text, Optional
+from typing import Callable, Optional, Text, Tuple, Union
 import numpy as np
 import pandas as pd
 
 from qlib.utils.data import robust_zscore, zscore
 from ...constant import EPS
 from .utils import fetch_df_by_index
+from .cross_section import CSBlocks, _fillna_mean, _rank_pct, _replace_inf, _robust_zscore, _zscore
 from ...utils.serial import Serializable
-from ...utils.paral import datetime_groupby_apply
 from qlib.data.inst_processor import InstProcessor
 from qlib.data import D
 
@@ -32,7 +32,31 @@ def get_group_columns(df: pd.DataFrame, group: Union[Text, None]):
         return df.columns[df.columns.get_loc(group)]
 
 
+def _process_cs(df: pd.DataFrame, cols: pd.Index, func) -> pd.DataFrame:
+    """
+    process the values of `cols` of `df` by `func` (e.g. the methods of `CSBlocks`), which processes the array in place
+
+    If all the columns of `df` are stored in one array, the array is processed in place; otherwise the values are
+    copied and set back.
+    """
+    values = df.values
+    # `values` is a view of the array (instead of a copy) if the two arrays share the memory
+    if values.flags.writeable and df.dtypes.nunique() == 1 and np.shares_memory(values, df.values):
+        if len(cols) == df.shape[1] and df.columns.equals(cols):
+            func(values)
+        else:
+            pos = df.columns.get_indexer(cols)
+            values[:, pos] = func(values[:, pos])
+    else:
+        df[cols] = func(df[cols].values)
+    return df
+
+
 class Processor(Serializable):
+    # the attributes learned by `fit`. If they are listed, the fitted processor could be cached on disk and loaded
+    # when the processor is fitted on the same data again (please refer to `qlib.data.dataset.pipeline.fit_processor`)
+    FIT_ATTRS: Tuple[str, ...] = ()
+
     def fit(self, df: pd.DataFrame = None):
         """
         learn data processing parameters
@@ -79,6 +103,26 @@ class Processor(Serializable):
         """
         return False
 
+    def get_inplace_func(self, df: pd.DataFrame) -> Optional[Tuple[pd.Index, Callable]]:
+        """
+        Get the function which processes the values of `df` in place, so `ProcessorPipeline` could fuse the
+        consecutive processors into one pass over the values array instead of calling them one by one.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            the data to be processed (the processor has been fitted).
+
+        Returns
+        -------
+        Optional[Tuple[pd.Index, Callable]]:
+            None if the processor does not support it (by default). Otherwise, the columns to be processed and the
+            function `func(values, starts, lengths)`, which processes the values of the columns in place and gets the
+            same result as `__call__`. `values` is a chunk of the rows consisting of the whole blocks of the rows of
+            the same datetime, and `starts`/`lengths` are the blocks in the chunk (please refer to `CSBlocks.apply`).
+        """
+        return None
+
     def config(self, **kwargs):
         attr_list = {"fit_start_time", "fit_end_time"}
         for k, v in kwargs.items():
@@ -163,18 +207,17 @@ class ProcessInf(Processor):
     """Process infinity"""
 
     def __call__(self, df):
-        def replace_inf(data):
-            def process_inf(df):
-                for col in df.columns:
-                    # FIXME: Such behavior is very weird
-                    df[col] = df[col].replace([np.inf, -np.inf], df[col][~np.isinf(df[col])].mean())
-                return df
-
-            data = datetime_groupby_apply(data, process_inf)
-            data.sort_index(inplace=True)
-            return data
+        # FIXME: Such behavior is very weird
+        # the infinities are replaced by the mean of the other values of the column of the same datetime
+        df = _process_cs(df, df.columns, CSBlocks(df.index).replace_inf)
+        if not df.index.is_monotonic_increasing:
+            df.sort_index(inplace=True)
+        return df
 
-        return replace_inf(df)
+    def get_inplace_func(self, df):
+        if not df.index.is_monotonic_increasing:
+            return None
+        return df.columns, _replace_inf
 
 
 class Fillna(Processor):
@@ -193,13 +236,23 @@ class Fillna(Processor):
             # df.fillna({col: self.fill_value for col in cols}, inplace=True)
 
             # So we use numpy to accelerate filling values
-            nan_select = np.isnan(df.values)
-            nan_select[:, ~df.columns.isin(cols)] = False
-            df.values[nan_select] = self.fill_value
+            # NOTE: `df.values` is a copy if the columns are not stored in one array, so the values are set back then
+            _process_cs(df, cols, lambda values: self._fillna(values, None, None))
         return df
 
+    def _fillna(self, values, starts, lengths):
+        values[np.isnan(values)] = self.fill_value
+        return values
+
+    def get_inplace_func(self, df):
+        if not np.isscalar(self.fill_value):
+            return None
+        return (df.columns if self.fields_group is None else get_group_columns(df, self.fields_group)), self._fillna
+
 
 class MinMaxNorm(Processor):
+    FIT_ATTRS = ("min_val", "max_val", "ignore", "cols")
+
     def __init__(self, fit_start_time, fit_end_time, fields_group=None):
         # NOTE: correctly set the `fit_start_time` and `fit_end_time` is very important !!!
         # `fit_end_time` **must not** include any information from the test data!!!
@@ -230,10 +283,19 @@ class MinMaxNorm(Processor):
         df.loc(axis=1)[self.cols] = normalize(df[self.cols].values)
         return df
 
+    def get_inplace_func(self, df):
+        def normalize(values, starts, lengths, min_val=self.min_val, max_val=self.max_val):
+            values -= min_val
+            values /= max_val - min_val
+
+        return self.cols, normalize
+
 
 class ZScoreNorm(Processor):
     """ZScore Normalization"""
 
+    FIT_ATTRS = ("mean_train", "std_train", "ignore", "cols")
+
     def __init__(self, fit_start_time, fit_end_time, fields_group=None):
         # NOTE: correctly set the `fit_start_time` and `fit_end_time` is very important !!!
         # `fit_end_time` **must not** include any information from the test data!!!
@@ -264,6 +326,13 @@ class ZScoreNorm(Processor):
         df.loc(axis=1)[self.cols] = normalize(df[self.cols].values)
         return df
 
+    def get_inplace_func(self, df):
+        def normalize(values, starts, lengths, mean_train=self.mean_train, std_train=self.std_train):
+            values -= mean_train
+            values /= std_train
+
+        return self.cols, normalize
+
 
 class RobustZScoreNorm(Processor):
     """Robust ZScore Normalization
@@ -276,6 +345,8 @@ class RobustZScoreNorm(Processor):
         https://en.wikipedia.org/wiki/Median_absolute_deviation.
     """
 
+    FIT_ATTRS = ("cols", "mean_train", "std_train")
+
     def __init__(self, fit_start_time, fit_end_time, fields_group=None, clip_outlier=True):
         # NOTE: correctly set the `fit_start_time` and `fit_end_time` is very important !!!
         # `fit_end_time` **must not** include any information from the test data!!!
@@ -302,6 +373,15 @@ class RobustZScoreNorm(Processor):
         df[self.cols] = X
         return df
 
+    def get_inplace_func(self, df):
+        def normalize(values, starts, lengths):
+            values -= self.mean_train
+            values /= self.std_train
+            if self.clip_outlier:
+                np.clip(values, -3, 3, out=values)
+
+        return self.cols, normalize
+
 
 class CSZScoreNorm(Processor):
     """Cross Sectional ZScore Normalization"""
@@ -319,11 +399,31 @@ class CSZScoreNorm(Processor):
         # try not modify original dataframe
         if not isinstance(self.fields_group, list):
             self.fields_group = [self.fields_group]
+        blocks = CSBlocks(df.index)
         for g in self.fields_group:
             cols = get_group_columns(df, g)
-            df[cols] = df[cols].groupby("datetime", group_keys=False).apply(self.zscore_func)
+            if self.zscore_func is zscore:
+                _process_cs(df, cols, blocks.zscore)
+            elif self.zscore_func is robust_zscore:
+                _process_cs(df, cols, blocks.robust_zscore)
+            else:
+                df[cols] = df[cols].groupby("datetime", group_keys=False).apply(self.zscore_func)
         return df
 
+    def get_inplace_func(self, df):
+        if self.zscore_func is zscore:
+            func = _zscore
+        elif self.zscore_func is robust_zscore:
+            func = _robust_zscore
+        else:
+            return None
+        groups = self.fields_group if isinstance(self.fields_group, list) else [self.fields_group]
+        # the columns are normalized one by one, so the groups could be normalized together
+        cols = get_group_columns(df, groups[0]).append([get_group_columns(df, g) for g in groups[1:]])
+        if cols.has_duplicates:
+            return None
+        return cols, func
+
 
 class CSRankNorm(Processor):
     """
@@ -354,18 +454,24 @@ class CSRankNorm(Processor):
     def __call__(self, df):
         # try not modify original dataframe
         cols = get_group_columns(df, self.fields_group)
-        t = df[cols].groupby("datetime").rank(pct=True)
-        t -= 0.5
-        t *= 3.46  # NOTE: towards unit std
-        df[cols] = t
-        return df
+        blocks = CSBlocks(df.index)
+        return _process_cs(df, cols, lambda values: blocks.apply(values, self._rank_norm))
+
+    @staticmethod
+    def _rank_norm(values, starts, lengths):
+        _rank_pct(values, starts, lengths)
+        values -= 0.5
+        values *= 3.46  # NOTE: towards unit std
+
+    def get_inplace_func(self, df):
+        return get_group_columns(df, self.fields_group), self._rank_norm
 
 
 class CSInTopK(Processor):
     """
     Cross Sectional ranking indicator.
-    Shows if the stock is in TopK stocks or not
-    
+    Shows if the stock is in TopK stocks or not, according to the last column of the group.
+    The stocks whose value is NaN are not in the TopK.
     """
 
     def __init__(self, fields_group=None, topk=50):
@@ -373,18 +479,10 @@ class CSInTopK(Processor):
         self.topk = topk
 
     def __call__(self, df: pd.DataFrame):
-
-        def _process_group(x, cols, topk):
-            sort_idx = x[cols[-1]].argsort()
-            x.iloc[sort_idx[-topk:]] = 1
-            x.iloc[sort_idx[:-topk]] = 0
-            
-            return x
-            
         cols = get_group_columns(df, self.fields_group)
-        t = df[cols].groupby("datetime").apply(lambda x: _process_group(x, cols, self.topk))
-        df[cols] = t
-        return df
+        blocks = CSBlocks(df.index)
+        return _process_cs(df, cols, lambda values: blocks.in_top_k(values, self.topk))
+
 
 class CSZFillna(Processor):
     """Cross Sectional Fill Nan"""
@@ -394,8 +492,10 @@ class CSZFillna(Processor):
 
     def __call__(self, df):
         cols = get_group_columns(df, self.fields_group)
-        df[cols] = df[cols].groupby("datetime", group_keys=False).apply(lambda x: x.fillna(x.mean()))
-        return df
+        return _process_cs(df, cols, CSBlocks(df.index).fillna_mean)
+
+    def get_inplace_func(self, df):
+        return get_group_columns(df, self.fields_group), _fillna_mean
 
 
 class HashStockFormat(Processor):
@@ -10,6 +10,7 @@ import numpy as np
 import abc
 
 from .data import Cal, DatasetD
+from .inst_index import InstrumentSpanIndex
 
 
 class BaseDFilter(abc.ABC):
@@ -93,97 +94,41 @@ class SeriesDFilter(BaseDFilter):
         pd.Timestamp, pd.Timestamp
             the lower time bound and upper time bound of all the instruments.
         """
-        trange = Cal.calendar(freq=self.filter_freq)
-        ubound, lbound = trange[0], trange[-1]
+        trange = Cal.calendar_array(freq=self.filter_freq)
+        ubound, lbound = pd.Timestamp(trange[0]), pd.Timestamp(trange[-1])
         for _, timestamp in instruments.items():
             if timestamp:
                 lbound = timestamp[0][0] if timestamp[0][0] < lbound else lbound
                 ubound = timestamp[-1][-1] if timestamp[-1][-1] > ubound else ubound
         return lbound, ubound
 
-    def _toSeries(self, time_range, target_timestamp):
-        """Convert the target timestamp to a pandas series of bool value within a time range.
-            Make the time inside the target_timestamp range TRUE, others FALSE.
+    def _getCalendars(self, instruments, start_time=None, end_time=None):
+        """Get the calendar of the instruments and the calendar of the filter.
 
         Parameters
         ----------
-        time_range : D.calendar
-            the time range of the instruments.
-        target_timestamp : list
-            the list of tuple (timestamp, timestamp).
-
-        Returns
-        ----------
-        pd.Series
-            the series of bool value for an instrument.
-        """
-        # Construct a whole dict of {date => bool}
-        timestamp_series = {timestamp: False for timestamp in time_range}
-        # Convert to pd.Series
-        timestamp_series = pd.Series(timestamp_series)
-        # Fill the date within target_timestamp with TRUE
-        for start, end in target_timestamp:
-            timestamp_series[Cal.calendar(start_time=start, end_time=end, freq=self.filter_freq)] = True
-        return timestamp_series
-
-    def _filterSeries(self, timestamp_series, filter_series):
-        """Filter the timestamp series with filter series by using element-wise AND operation of the two series.
-
-        Parameters
-        ----------
-        timestamp_series : pd.Series
-            the series of bool value indicating existing time.
-        filter_series : pd.Series
-            the series of bool value indicating filter feature.
-
-        Returns
-        ----------
-        pd.Series
-            the series of bool value indicating whether the date satisfies the filter condition and exists in target timestamp.
-        """
-        fstart, fend = list(filter_series.keys())[0], list(filter_series.keys())[-1]
-        filter_series = filter_series.astype("bool")  # Make sure the filter_series is boolean
-        timestamp_series[fstart:fend] = timestamp_series[fstart:fend] & filter_series
-        return timestamp_series
-
-    def _toTimestamp(self, timestamp_series):
-        """Convert the timestamp series to a list of tuple (timestamp, timestamp) indicating a continuous range of TRUE.
-
-        Parameters
-        ----------
-        timestamp_series: pd.Series
-            the series of bool value after being filtered.
+        instruments: dict
+            the dict of instruments in the form {instrument_name => list of timestamp tuple}.
+        start_time: str
+            start of the time range.
+        end_time: str
+            end of the time range.
 
         Returns
         ----------
-        list
-            the list of tuple (timestamp, timestamp).
+        list, list
+            the calendar within the time range and the part of it within the filter time range.
         """
-        # sort the timestamp_series according to the timestamps
-        timestamp_series.sort_index()
-        timestamp = []
-        _lbool = None
-        _ltime = None
-        for _ts, _bool in timestamp_series.items():
-            # there is likely to be NAN when the filter series don't have the
-            # bool value, so we just change the NAN into False
-            if _bool == np.nan:
-                _bool = False
-            if _lbool is None:
-                _cur_start = _ts
-                _lbool = _bool
-                _ltime = _ts
-                continue
-            if (_lbool, _bool) == (True, False):
-                if _cur_start:
-                    timestamp.append((_cur_start, _ltime))
-            elif (_lbool, _bool) == (False, True):
-                _cur_start = _ts
-            _lbool = _bool
-            _ltime = _ts
-        if _lbool:
-            timestamp.append((_cur_start, _ltime))
-        return timestamp
+        lbound, ubound = self._getTimeBound(instruments)
+        start_time = pd.Timestamp(start_time or lbound)
+        end_time = pd.Timestamp(end_time or ubound)
+        _all_calendar = Cal.calendar(start_time=start_time, end_time=end_time, freq=self.filter_freq)
+        _filter_calendar = Cal.calendar(
+            start_time=self.filter_start_time and max(self.filter_start_time, _all_calendar[0]) or _all_calendar[0],
+            end_time=self.filter_end_time and min(self.filter_end_time, _all_calendar[-1]) or _all_calendar[-1],
+            freq=self.filter_freq,
+        )
+        return _all_calendar, _filter_calendar
 
     def __call__(self, instruments, start_time=None, end_time=None, freq="day"):
         """Call this filter to get filtered instruments list"""
@@ -229,36 +174,26 @@ class SeriesDFilter(BaseDFilter):
         dict
             filtered instruments, same structure as input instruments.
         """
-        lbound, ubound = self._getTimeBound(instruments)
-        start_time = pd.Timestamp(start_time or lbound)
-        end_time = pd.Timestamp(end_time or ubound)
-        _instruments_filtered = {}
-        _all_calendar = Cal.calendar(start_time=start_time, end_time=end_time, freq=self.filter_freq)
-        _filter_calendar = Cal.calendar(
-            start_time=self.filter_start_time and max(self.filter_start_time, _all_calendar[0]) or _all_calendar[0],
-            end_time=self.filter_end_time and min(self.filter_end_time, _all_calendar[-1]) or _all_calendar[-1],
-            freq=self.filter_freq,
-        )
+        _all_calendar, _filter_calendar = self._getCalendars(instruments, start_time, end_time)
         _all_filter_series = self._getFilterSeries(instruments, _filter_calendar[0], _filter_calendar[-1])
-        for inst, timestamp in instruments.items():
-            # Construct a whole map of date
-            _timestamp_series = self._toSeries(_all_calendar, timestamp)
-            # Get filter series
+        # Construct the membership of all the instruments on each date
+        span_index = InstrumentSpanIndex.from_dict(instruments)
+        mask = span_index.mask(_all_calendar)
+        _all_calendar = pd.DatetimeIndex(_all_calendar)
+        for i, inst in enumerate(span_index.instruments):
+            # Calculate bool value within the range of filter
             if inst in _all_filter_series:
                 _filter_series = _all_filter_series[inst]
-            else:
-                if self.keep:
-                    _filter_series = pd.Series({timestamp: True for timestamp in _filter_calendar})
-                else:
-                    _filter_series = pd.Series({timestamp: False for timestamp in _filter_calendar})
-            # Calculate bool value within the range of filter
-            _timestamp_series = self._filterSeries(_timestamp_series, _filter_series)
-            # Reform the map to (start_timestamp, end_timestamp) format
-            _timestamp = self._toTimestamp(_timestamp_series)
-            # Remove empty timestamp
-            if _timestamp:
-                _instruments_filtered[inst] = _timestamp
-        return _instruments_filtered
+                if len(_filter_series) == 0:
+                    continue
+                slc = _all_calendar.slice_indexer(_filter_series.index[0], _filter_series.index[-1])
+                # the dates missing in the filter series are filtered out
+                _filter_series = _filter_series.astype("bool").reindex(_all_calendar[slc], fill_value=False)
+                mask[slc, i] &= _filter_series.values
+            elif not self.keep:
+                mask[_all_calendar.slice_indexer(_filter_calendar[0], _filter_calendar[-1]), i] = False
+        # Reform the mask to (start_timestamp, end_timestamp) format and remove empty timestamp
+        return InstrumentSpanIndex.from_mask(span_index.instruments, _all_calendar, mask).to_dict()
 
 
 class NameDFilter(SeriesDFilter):
@@ -284,11 +219,9 @@ class NameDFilter(SeriesDFilter):
         all_filter_series = {}
         filter_calendar = Cal.calendar(start_time=fstart, end_time=fend, freq=self.filter_freq)
         for inst, timestamp in instruments.items():
-            if re.match(self.name_rule_re, inst):
-                _filter_series = pd.Series({timestamp: True for timestamp in filter_calendar})
-            else:
-                _filter_series = pd.Series({timestamp: False for timestamp in filter_calendar})
-            all_filter_series[inst] = _filter_series
+            all_filter_series[inst] = pd.Series(
+                bool(re.match(self.name_rule_re, inst)), index=pd.DatetimeIndex(filter_calendar)
+            )
         return all_filter_series
 
     @staticmethod
@@ -320,9 +253,26 @@ class ExpressionDFilter(SeriesDFilter):
     - *basic features filter* : rule_expression = '$close/$open>5'
     - *cross-sectional features filter* : rule_expression = '$rank($close)<10'
     - *time-sequence features filter* : rule_expression = '$Ref($close, 3)>100'
+
+    In the panel mode, the rule is evaluated once on the (datetime, instrument) panel of all the instruments, and the
+    filtered spans are encoded from the bool panel directly. The cross-sectional rules are applied on each day to the
+    instruments which are members on that day:
+
+    - *top-k filter* : rule_expression = '$close * $volume', top_k=100
+    - *cross-sectional rank filter* : rule_expression = '$close', pct_range=(0.8, 1.0)
     """
 
-    def __init__(self, rule_expression, fstart_time=None, fend_time=None, keep=False):
+    def __init__(
+        self,
+        rule_expression,
+        fstart_time=None,
+        fend_time=None,
+        keep=False,
+        panel=False,
+        top_k=None,
+        pct_range=None,
+        ascending=False,
+    ):
         """Init function for expression filter class
 
         Parameters
@@ -333,11 +283,26 @@ class ExpressionDFilter(SeriesDFilter):
             filter the feature ending by this time.
         rule_expression: str
             an input expression for the rule.
+        keep: bool
+            whether to keep the instruments of which features don't exist in the filter time span.
+        panel: bool
+            whether to evaluate the rule on the panel of all the instruments. It is enabled by `top_k` and `pct_range`.
+        top_k: int
+            keep the first `top_k` instruments ordered by the value of the expression on each day.
+        pct_range: tuple
+            keep the instruments of which the percentile rank (the largest value is ranked 1.0) of the value of the
+            expression on each day is in [pct_range[0], pct_range[1]].
+        ascending: bool
+            the order of `top_k`; the largest value is ranked first by default.
         """
         super(ExpressionDFilter, self).__init__(fstart_time, fend_time, keep=keep)
         self.rule_expression = rule_expression
+        self.top_k = top_k
+        self.pct_range = tuple(pct_range) if pct_range is not None else None
+        self.ascending = ascending
+        self.panel = panel or top_k is not None or pct_range is not None
 
-    def _getFilterSeries(self, instruments, fstart, fend):
+    def _loadFeatures(self, instruments, fstart, fend):
         # do not use dataset cache
         try:
             _features = DatasetD.dataset(
@@ -352,8 +317,68 @@ class ExpressionDFilter(SeriesDFilter):
             # use LocalDatasetProvider
             _features = DatasetD.dataset(instruments, [self.rule_expression], fstart, fend, freq=self.filter_freq)
         rule_expression_field_name = list(_features.keys())[0]
-        all_filter_series = _features[rule_expression_field_name]
-        return all_filter_series
+        return _features[rule_expression_field_name]
+
+    def _getFilterSeries(self, instruments, fstart, fend):
+        return self._loadFeatures(instruments, fstart, fend)
+
+    def _getFilterPanel(self, instruments, filter_calendar, mask):
+        """Get the bool panel of the rule.
+
+        Parameters
+        ----------
+        instruments : list
+            the instruments of the columns of the panel.
+        filter_calendar : list
+            the calendar of the rows of the panel.
+        mask : np.ndarray
+            the membership of the instruments on the filter calendar; the cross-sectional rules only rank the members.
+
+        Returns
+        ----------
+        np.ndarray, np.ndarray
+            the bool panel with the same shape as `mask` and whether each instrument has any feature.
+        """
+        exists = np.zeros(len(instruments), dtype=bool)
+        if not mask.any():
+            return mask.copy(), exists
+        fields = self._loadFeatures(
+            InstrumentSpanIndex.from_mask(instruments, filter_calendar, mask).to_dict(),
+            filter_calendar[0],
+            filter_calendar[-1],
+        )
+        values = (
+            fields.unstack(level="instrument")
+            .reindex(index=pd.DatetimeIndex(filter_calendar), columns=instruments)
+            .to_numpy(dtype=np.float64)
+        )
+        exists = ~np.isnan(values).all(axis=0)
+        # the instruments which are not members on the day are not ranked
+        values[~mask] = np.nan
+        rule = ~np.isnan(values)
+        if self.top_k is None and self.pct_range is None:
+            return rule & (values != 0), exists
+        if self.top_k is not None:
+            ranks = pd.DataFrame(values).rank(axis=1, method="first", ascending=self.ascending).to_numpy()
+            rule &= ranks <= self.top_k
+        if self.pct_range is not None:
+            pct = pd.DataFrame(values).rank(axis=1, pct=True).to_numpy()
+            rule &= (pct >= self.pct_range[0]) & (pct <= self.pct_range[1])
+        return rule, exists
+
+    def filter_main(self, instruments, start_time=None, end_time=None):
+        if not self.panel:
+            return super(ExpressionDFilter, self).filter_main(instruments, start_time, end_time)
+        _all_calendar, _filter_calendar = self._getCalendars(instruments, start_time, end_time)
+        span_index = InstrumentSpanIndex.from_dict(instruments)
+        mask = span_index.mask(_all_calendar)
+        slc = pd.DatetimeIndex(_all_calendar).slice_indexer(_filter_calendar[0], _filter_calendar[-1])
+        rule, exists = self._getFilterPanel(span_index.instruments, _filter_calendar, mask[slc])
+        if self.keep:
+            # the instruments without any feature in the filter time span are not filtered
+            rule[:, ~exists] = mask[slc][:, ~exists]
+        mask[slc] = rule
+        return InstrumentSpanIndex.from_mask(span_index.instruments, _all_calendar, mask).to_dict()
 
     @staticmethod
     def from_config(config):
@@ -362,6 +387,10 @@ class ExpressionDFilter(SeriesDFilter):
             fstart_time=config["filter_start_time"],
             fend_time=config["filter_end_time"],
             keep=config["keep"],
+            panel=config.get("panel", False),
+            top_k=config.get("top_k"),
+            pct_range=config.get("pct_range"),
+            ascending=config.get("ascending", False),
         )
 
     def to_config(self):
@@ -371,4 +400,8 @@ class ExpressionDFilter(SeriesDFilter):
             "filter_start_time": str(self.filter_start_time) if self.filter_start_time else self.filter_start_time,
             "filter_end_time": str(self.filter_end_time) if self.filter_end_time else self.filter_end_time,
             "keep": self.keep,
+            "panel": self.panel,
+            "top_k": self.top_k,
+            "pct_range": self.pct_range,
+            "ascending": self.ascending,
         }
@@ -0,0 +1,133 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The index of the time spans of the instruments in a universe.
+
+The spans are stored in int64 arrays (nanoseconds since epoch) instead of the lists of `pd.Timestamp` tuples. So the
+members of a universe during a time range and the daily membership masks are calculated in vectorized form.
+"""
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class InstrumentSpanIndex:
+    """The time spans of a set of instruments
+
+    The spans are kept in the order of the instruments (and the order of the spans of each instrument). They are also
+    sorted by the start time, so the spans overlapping a time range are found by a binary search on the start times.
+    """
+
+    def __init__(self, instruments: List[str], inst_ids: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+        """
+        Parameters
+        ----------
+        instruments : List[str]
+            the names of the instruments
+        inst_ids : np.ndarray
+            the position in `instruments` of the instrument of each span
+        starts : np.ndarray
+            the start time of each span in nanoseconds
+        ends : np.ndarray
+            the end time (included) of each span in nanoseconds
+        """
+        self.instruments = list(instruments)
+        self.inst_ids = np.asarray(inst_ids, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self._order = np.argsort(self.starts, kind="stable")
+        self._sorted_starts = self.starts[self._order]
+
+    @classmethod
+    def from_dict(cls, instruments: Dict[str, List[Tuple]]) -> "InstrumentSpanIndex":
+        """create the index from the dict in the form {instrument => list of (start time, end time)}"""
+        names = list(instruments)
+        lengths = [len(spans) for spans in instruments.values()]
+        spans = [span for inst_spans in instruments.values() for span in inst_spans]
+        if len(spans) == 0:
+            return cls(names, [], [], [])
+        starts, ends = zip(*spans)
+        return cls(
+            names,
+            np.repeat(np.arange(len(names)), lengths),
+            _to_int64(starts),
+            _to_int64(ends),
+        )
+
+    @classmethod
+    def from_mask(cls, instruments: List[str], calendar, mask: np.ndarray) -> "InstrumentSpanIndex":
+        """
+        create the index from the membership mask by run-length encoding
+
+        Parameters
+        ----------
+        instruments : List[str]
+            the instruments of the columns of `mask`
+        calendar :
+            the time of the rows of `mask`
+        mask : np.ndarray
+            the bool matrix with shape (len(calendar), len(instruments)); the instrument is a member when it is True
+        """
+        calendar = _to_int64(calendar)
+        mask = np.asarray(mask, dtype=bool)
+        # the edges of the continuous True runs of each column; the columns are scanned one by one
+        edges = np.diff(np.pad(mask.T.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+        inst_ids, start_pos = np.nonzero(edges == 1)
+        _, end_pos = np.nonzero(edges == -1)
+        return cls(instruments, inst_ids, calendar[start_pos], calendar[end_pos - 1])
+
+    def members(self, start_time=None, end_time=None) -> "InstrumentSpanIndex":
+        """
+        the members during [`start_time`, `end_time`]
+
+        Returns
+        -------
+        InstrumentSpanIndex
+            the spans are clipped by the time range; the instruments without any span are removed
+        """
+        lo = np.iinfo(np.int64).min if start_time is None else _to_int64([start_time])[0]
+        hi = np.iinfo(np.int64).max if end_time is None else _to_int64([end_time])[0]
+        # the spans starting before `hi`, and then the ones ending after `lo`
+        pos = self._order[: np.searchsorted(self._sorted_starts, hi, side="right")]
+        pos = np.sort(pos[self.ends[pos] >= lo])
+        starts = np.maximum(self.starts[pos], lo)
+        ends = np.minimum(self.ends[pos], hi)
+        keep = starts <= ends
+        inst_ids = self.inst_ids[pos][keep]
+        used, inst_ids = np.unique(inst_ids, return_inverse=True)
+        return InstrumentSpanIndex([self.instruments[i] for i in used], inst_ids, starts[keep], ends[keep])
+
+    def mask(self, calendar) -> np.ndarray:
+        """
+        the membership mask on `calendar`
+
+        Returns
+        -------
+        np.ndarray
+            the bool matrix with shape (len(calendar), len(self.instruments)); it is True if the time is in a span
+        """
+        calendar = _to_int64(calendar)
+        first = np.searchsorted(calendar, self.starts, side="left")
+        last = np.searchsorted(calendar, self.ends, side="right")
+        count = np.zeros((len(calendar) + 1, len(self.instruments)), dtype=np.int32)
+        np.add.at(count, (first, self.inst_ids), 1)
+        np.add.at(count, (last, self.inst_ids), -1)
+        return np.cumsum(count[:-1], axis=0) > 0
+
+    def to_dict(self) -> Dict[str, List[Tuple[pd.Timestamp, pd.Timestamp]]]:
+        """convert the index to the dict in the form {instrument => list of (start time, end time)}"""
+        res = {inst: [] for inst in self.instruments}
+        starts = pd.DatetimeIndex(self.starts).tolist()
+        ends = pd.DatetimeIndex(self.ends).tolist()
+        for i, start, end in zip(self.inst_ids.tolist(), starts, ends):
+            res[self.instruments[i]].append((start, end))
+        return {inst: spans for inst, spans in res.items() if spans}
+
+    def __len__(self):
+        return len(self.instruments)
+
+
+def _to_int64(times: Union[list, tuple, np.ndarray, pd.Index]) -> np.ndarray:
+    """convert the times to nanoseconds since epoch"""
+    return pd.DatetimeIndex(times).asi8
@@ -15,8 +15,25 @@ from ..log import get_module_logger
 from ..utils import get_callable_kwargs
 
 try:
-    from ._libs.rolling import rolling_slope, rolling_rsquare, rolling_resi
-    from ._libs.expanding import expanding_slope, expanding_rsquare, expanding_resi
+    from ._libs.rolling import (
+        rolling_slope,
+        rolling_rsquare,
+        rolling_resi,
+        rolling_idxmax,
+        rolling_idxmin,
+        rolling_mad,
+        rolling_wma,
+    )
+    from ._libs.expanding import (
+        expanding_slope,
+        expanding_rsquare,
+        expanding_resi,
+        expanding_idxmax,
+        expanding_idxmin,
+        expanding_mad,
+        expanding_wma,
+        expanding_ema,
+    )
 except ImportError:
     print(
         "#### Do not import qlib package in the repository directory in case of importing qlib from . without compiling #####"
@@ -33,6 +50,15 @@ except ValueError:
 np.seterr(invalid="ignore")
 
 
+def _apply_panel(func, panel, *args):
+    """apply the 1-D kernel `func` to each column (instrument) of `panel`"""
+    data = panel.values
+    values = np.empty(data.shape, dtype=np.float64)
+    for i in range(data.shape[1]):
+        values[:, i] = func(data[:, i], *args)
+    return pd.DataFrame(values, index=panel.index, columns=panel.columns)
+
+
 #################### Element-Wise Operator ####################
 class ElemOperator(ExpressionOps):
     """Element-wise Operator
@@ -54,6 +80,9 @@ class ElemOperator(ExpressionOps):
     def __str__(self):
         return "{}({})".format(type(self).__name__, self.feature)
 
+    def get_dependencies(self):
+        return [self.feature]
+
     def get_longest_back_rolling(self):
         return self.feature.get_longest_back_rolling()
 
@@ -79,6 +108,8 @@ class ChangeInstrument(ElemOperator):
         feature operation output
     """
 
+    range_invariant = True
+
     def __init__(self, instrument, feature):
         self.instrument = instrument
         self.feature = feature
@@ -93,6 +124,13 @@ class ChangeInstrument(ElemOperator):
     def _load_internal(self, instrument, start_index, end_index, *args):
         return self.feature.load(instrument, start_index, end_index, *args)
 
+    def get_dependencies(self):
+        # the feature is loaded with another instrument
+        return []
+
+    def is_range_invariant(self):
+        return super().is_range_invariant() and self.feature.is_range_invariant()
+
 
 class NpElemOperator(ElemOperator):
     """Numpy Element-wise Operator
@@ -118,6 +156,10 @@ class NpElemOperator(ElemOperator):
         series = self.feature.load(instrument, start_index, end_index, *args)
         return getattr(np, self.func)(series)
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        return getattr(np, self.func)(panel)
+
 
 class Abs(NpElemOperator):
     """Feature Absolute Value
@@ -133,6 +175,8 @@ class Abs(NpElemOperator):
         a feature instance with absolute output
     """
 
+    range_invariant = True
+
     def __init__(self, feature):
         super(Abs, self).__init__(feature, "abs")
 
@@ -151,6 +195,8 @@ class Sign(NpElemOperator):
         a feature instance with sign
     """
 
+    range_invariant = True
+
     def __init__(self, feature):
         super(Sign, self).__init__(feature, "sign")
 
@@ -163,6 +209,11 @@ class Sign(NpElemOperator):
         series = series.astype(np.float32)
         return getattr(np, self.func)(series)
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        panel = panel.astype(np.float32)
+        return getattr(np, self.func)(panel)
+
 
 class Log(NpElemOperator):
     """Feature Log
@@ -178,6 +229,8 @@ class Log(NpElemOperator):
         a feature instance with log
     """
 
+    range_invariant = True
+
     def __init__(self, feature):
         super(Log, self).__init__(feature, "log")
 
@@ -198,6 +251,8 @@ class Mask(NpElemOperator):
         a feature instance with masked instrument
     """
 
+    range_invariant = True
+
     def __init__(self, feature, instrument):
         super(Mask, self).__init__(feature, "mask")
         self.instrument = instrument
@@ -208,6 +263,13 @@ class Mask(NpElemOperator):
     def _load_internal(self, instrument, start_index, end_index, *args):
         return self.feature.load(self.instrument, start_index, end_index, *args)
 
+    def get_dependencies(self):
+        # the feature is loaded with another instrument
+        return []
+
+    def is_range_invariant(self):
+        return super().is_range_invariant() and self.feature.is_range_invariant()
+
 
 class Not(NpElemOperator):
     """Not Operator
@@ -223,6 +285,8 @@ class Not(NpElemOperator):
         feature elementwise not output
     """
 
+    range_invariant = True
+
     def __init__(self, feature):
         super(Not, self).__init__(feature, "bitwise_not")
 
@@ -251,6 +315,9 @@ class PairOperator(ExpressionOps):
     def __str__(self):
         return "{}({},{})".format(type(self).__name__, self.feature_left, self.feature_right)
 
+    def get_dependencies(self):
+        return [f for f in (self.feature_left, self.feature_right) if isinstance(f, (Expression,))]
+
     def get_longest_back_rolling(self):
         if isinstance(self.feature_left, (Expression,)):
             left_br = self.feature_left.get_longest_back_rolling()
@@ -334,6 +401,17 @@ class NpPairOperator(PairOperator):
                 get_module_logger("ops").debug(warning_info)
         return res
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        if isinstance(self.feature_left, (Expression,)):
+            panel_left = self.feature_left.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_left = self.feature_left  # numeric value
+        if isinstance(self.feature_right, (Expression,)):
+            panel_right = self.feature_right.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_right = self.feature_right
+        return getattr(np, self.func)(panel_left, panel_right)
+
 
 class Power(NpPairOperator):
     """Power Operator
@@ -351,6 +429,8 @@ class Power(NpPairOperator):
         The bases in feature_left raised to the exponents in feature_right
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Power, self).__init__(feature_left, feature_right, "power")
 
@@ -371,6 +451,8 @@ class Add(NpPairOperator):
         two features' sum
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Add, self).__init__(feature_left, feature_right, "add")
 
@@ -391,6 +473,8 @@ class Sub(NpPairOperator):
         two features' subtraction
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Sub, self).__init__(feature_left, feature_right, "subtract")
 
@@ -411,6 +495,8 @@ class Mul(NpPairOperator):
         two features' product
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Mul, self).__init__(feature_left, feature_right, "multiply")
 
@@ -431,6 +517,8 @@ class Div(NpPairOperator):
         two features' division
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Div, self).__init__(feature_left, feature_right, "divide")
 
@@ -451,6 +539,8 @@ class Greater(NpPairOperator):
         greater elements taken from the input two features
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Greater, self).__init__(feature_left, feature_right, "maximum")
 
@@ -471,6 +561,8 @@ class Less(NpPairOperator):
         smaller elements taken from the input two features
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Less, self).__init__(feature_left, feature_right, "minimum")
 
@@ -491,6 +583,8 @@ class Gt(NpPairOperator):
         bool series indicate `left > right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Gt, self).__init__(feature_left, feature_right, "greater")
 
@@ -511,6 +605,8 @@ class Ge(NpPairOperator):
         bool series indicate `left >= right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Ge, self).__init__(feature_left, feature_right, "greater_equal")
 
@@ -531,6 +627,8 @@ class Lt(NpPairOperator):
         bool series indicate `left < right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Lt, self).__init__(feature_left, feature_right, "less")
 
@@ -551,6 +649,8 @@ class Le(NpPairOperator):
         bool series indicate `left <= right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Le, self).__init__(feature_left, feature_right, "less_equal")
 
@@ -571,6 +671,8 @@ class Eq(NpPairOperator):
         bool series indicate `left == right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Eq, self).__init__(feature_left, feature_right, "equal")
 
@@ -591,6 +693,8 @@ class Ne(NpPairOperator):
         bool series indicate `left != right`
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Ne, self).__init__(feature_left, feature_right, "not_equal")
 
@@ -611,6 +715,8 @@ class And(NpPairOperator):
         two features' row by row & output
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(And, self).__init__(feature_left, feature_right, "bitwise_and")
 
@@ -631,6 +737,8 @@ class Or(NpPairOperator):
         two features' row by row | outputs
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right):
         super(Or, self).__init__(feature_left, feature_right, "bitwise_or")
 
@@ -649,6 +757,8 @@ class If(ExpressionOps):
         feature instance
     """
 
+    range_invariant = True
+
     def __init__(self, condition, feature_left, feature_right):
         self.condition = condition
         self.feature_left = feature_left
@@ -657,6 +767,9 @@ class If(ExpressionOps):
     def __str__(self):
         return "If({},{},{})".format(self.condition, self.feature_left, self.feature_right)
 
+    def get_dependencies(self):
+        return [f for f in (self.condition, self.feature_left, self.feature_right) if isinstance(f, (Expression,))]
+
     def _load_internal(self, instrument, start_index, end_index, *args):
         series_cond = self.condition.load(instrument, start_index, end_index, *args)
         if isinstance(self.feature_left, (Expression,)):
@@ -670,6 +783,20 @@ class If(ExpressionOps):
         series = pd.Series(np.where(series_cond, series_left, series_right), index=series_cond.index)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel_cond = self.condition.load_panel(ctx, start_index, end_index, *args)
+        if isinstance(self.feature_left, (Expression,)):
+            panel_left = self.feature_left.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_left = self.feature_left
+        if isinstance(self.feature_right, (Expression,)):
+            panel_right = self.feature_right.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_right = self.feature_right
+        return pd.DataFrame(
+            np.where(panel_cond, panel_left, panel_right), index=panel_cond.index, columns=panel_cond.columns
+        )
+
     def get_longest_back_rolling(self):
         if isinstance(self.feature_left, (Expression,)):
             left_br = self.feature_left.get_longest_back_rolling()
@@ -739,6 +866,13 @@ class Rolling(ExpressionOps):
     def __str__(self):
         return "{}({},{})".format(type(self).__name__, self.feature, self.N)
 
+    def get_dependencies(self):
+        return [self.feature]
+
+    def is_range_invariant(self):
+        # the expanding calculation uses all the data in the range
+        return self.N != 0 and super().is_range_invariant()
+
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
         # NOTE: remove all null check,
@@ -754,6 +888,18 @@ class Rolling(ExpressionOps):
         # series[isnull] = np.nan
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        # NOTE: the dates before an instrument is listed are NaN in the panel instead of missing;
+        # the window functions of pandas skip NaN, so the results are the same as the per-instrument ones
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if isinstance(self.N, int) and self.N == 0:
+            panel = getattr(panel.expanding(min_periods=1), self.func)()
+        elif isinstance(self.N, float) and 0 < self.N < 1:
+            panel = panel.ewm(alpha=self.N, min_periods=1).mean()
+        else:
+            panel = getattr(panel.rolling(self.N, min_periods=1), self.func)()
+        return panel
+
     def get_longest_back_rolling(self):
         if self.N == 0:
             return np.inf
@@ -794,6 +940,8 @@ class Ref(Rolling):
         a feature instance with target reference
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Ref, self).__init__(feature, N, "ref")
 
@@ -808,6 +956,12 @@ class Ref(Rolling):
             series = series.shift(self.N)  # copy
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        if self.N == 0:
+            # the first data of each instrument is at a different row of the panel
+            raise NotImplementedError("Ref(ATTR, 0) does not support panel calculation")
+        return self.feature.load_panel(ctx, start_index, end_index, *args).shift(self.N)
+
     def get_longest_back_rolling(self):
         if self.N == 0:
             return np.inf
@@ -840,6 +994,8 @@ class Mean(Rolling):
         a feature instance with rolling average
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Mean, self).__init__(feature, N, "mean")
 
@@ -860,6 +1016,8 @@ class Sum(Rolling):
         a feature instance with rolling sum
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Sum, self).__init__(feature, N, "sum")
 
@@ -880,6 +1038,8 @@ class Std(Rolling):
         a feature instance with rolling std
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Std, self).__init__(feature, N, "std")
 
@@ -900,6 +1060,8 @@ class Var(Rolling):
         a feature instance with rolling variance
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Var, self).__init__(feature, N, "var")
 
@@ -920,6 +1082,8 @@ class Skew(Rolling):
         a feature instance with rolling skewness
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         if N != 0 and N < 3:
             raise ValueError("The rolling window size of Skewness operation should >= 3")
@@ -942,6 +1106,8 @@ class Kurt(Rolling):
         a feature instance with rolling kurtosis
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         if N != 0 and N < 4:
             raise ValueError("The rolling window size of Kurtosis operation should >= 5")
@@ -964,6 +1130,8 @@ class Max(Rolling):
         a feature instance with rolling max
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Max, self).__init__(feature, N, "max")
 
@@ -984,15 +1152,17 @@ class IdxMax(Rolling):
         a feature instance with rolling max index
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(IdxMax, self).__init__(feature, N, "idxmax")
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(lambda x: x.argmax() + 1, raw=True)
+            series = pd.Series(expanding_idxmax(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(lambda x: x.argmax() + 1, raw=True)
+            series = pd.Series(rolling_idxmax(series.values, self.N), index=series.index)
         return series
 
 
@@ -1012,6 +1182,8 @@ class Min(Rolling):
         a feature instance with rolling min
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Min, self).__init__(feature, N, "min")
 
@@ -1032,15 +1204,17 @@ class IdxMin(Rolling):
         a feature instance with rolling min index
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(IdxMin, self).__init__(feature, N, "idxmin")
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(lambda x: x.argmin() + 1, raw=True)
+            series = pd.Series(expanding_idxmin(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(lambda x: x.argmin() + 1, raw=True)
+            series = pd.Series(rolling_idxmin(series.values, self.N), index=series.index)
         return series
 
 
@@ -1060,6 +1234,8 @@ class Quantile(Rolling):
         a feature instance with rolling quantile
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N, qscore):
         super(Quantile, self).__init__(feature, N, "quantile")
         self.qscore = qscore
@@ -1075,6 +1251,14 @@ class Quantile(Rolling):
             series = series.rolling(self.N, min_periods=1).quantile(self.qscore)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if self.N == 0:
+            panel = panel.expanding(min_periods=1).quantile(self.qscore)
+        else:
+            panel = panel.rolling(self.N, min_periods=1).quantile(self.qscore)
+        return panel
+
 
 class Med(Rolling):
     """Rolling Median
@@ -1092,6 +1276,8 @@ class Med(Rolling):
         a feature instance with rolling median
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Med, self).__init__(feature, N, "median")
 
@@ -1112,23 +1298,26 @@ class Mad(Rolling):
         a feature instance with rolling mean absolute deviation
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Mad, self).__init__(feature, N, "mad")
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
-        # TODO: implement in Cython
-
-        def mad(x):
-            x1 = x[~np.isnan(x)]
-            return np.mean(np.abs(x1 - x1.mean()))
-
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(mad, raw=True)
+            series = pd.Series(expanding_mad(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(mad, raw=True)
+            series = pd.Series(rolling_mad(series.values, self.N), index=series.index)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        # NaN is skipped in each window, so the panel is processed in the same way as the series
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if self.N == 0:
+            return _apply_panel(expanding_mad, panel)
+        return _apply_panel(rolling_mad, panel, self.N)
+
 
 class Rank(Rolling):
     """Rolling Rank (Percentile)
@@ -1146,14 +1335,21 @@ class Rank(Rolling):
         a feature instance with rolling rank
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Rank, self).__init__(feature, N, "rank")
 
-    # for compatiblity of python 3.7, which doesn't support pandas 1.4.0+ which implements Rolling.rank
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
+        return self._rank(series)
+
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        return self._rank(self.feature.load_panel(ctx, start_index, end_index, *args))
 
-        rolling_or_expending = series.expanding(min_periods=1) if self.N == 0 else series.rolling(self.N, min_periods=1)
+    # for compatiblity of python 3.7, which doesn't support pandas 1.4.0+ which implements Rolling.rank
+    def _rank(self, data):
+        rolling_or_expending = data.expanding(min_periods=1) if self.N == 0 else data.rolling(self.N, min_periods=1)
         if hasattr(rolling_or_expending, "rank"):
             return rolling_or_expending.rank(pct=True)
 
@@ -1184,6 +1380,8 @@ class Count(Rolling):
         a feature instance with rolling count of number of non-NaN elements
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Count, self).__init__(feature, N, "count")
 
@@ -1204,6 +1402,8 @@ class Delta(Rolling):
         a feature instance with end minus start in rolling window
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Delta, self).__init__(feature, N, "delta")
 
@@ -1215,6 +1415,13 @@ class Delta(Rolling):
             series = series - series.shift(self.N)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        if self.N == 0:
+            # the first data of each instrument is at a different row of the panel
+            raise NotImplementedError("Delta(ATTR, 0) does not support panel calculation")
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        return panel - panel.shift(self.N)
+
 
 # TODO:
 # support pair-wise rolling like `Slope(A, B, N)`
@@ -1242,6 +1449,8 @@ class Slope(Rolling):
         a feature instance with linear regression slope of given window
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Slope, self).__init__(feature, N, "slope")
 
@@ -1253,6 +1462,12 @@ class Slope(Rolling):
             series = pd.Series(rolling_slope(series.values, self.N), index=series.index)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if self.N == 0:
+            return _apply_panel(expanding_slope, panel)
+        return _apply_panel(rolling_slope, panel, self.N)
+
 
 class Rsquare(Rolling):
     """Rolling R-value Square
@@ -1270,6 +1485,8 @@ class Rsquare(Rolling):
         a feature instance with linear regression r-value square of given window
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Rsquare, self).__init__(feature, N, "rsquare")
 
@@ -1282,6 +1499,13 @@ class Rsquare(Rolling):
             series.loc[np.isclose(_series.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)] = np.nan
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        _panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if self.N == 0:
+            return _apply_panel(expanding_rsquare, _panel)
+        panel = _apply_panel(rolling_rsquare, _panel, self.N)
+        return panel.mask(np.isclose(_panel.rolling(self.N, min_periods=1).std(), 0, atol=2e-05))
+
 
 class Resi(Rolling):
     """Rolling Regression Residuals
@@ -1299,6 +1523,8 @@ class Resi(Rolling):
         a feature instance with regression residuals of given window
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(Resi, self).__init__(feature, N, "resi")
 
@@ -1310,6 +1536,12 @@ class Resi(Rolling):
             series = pd.Series(rolling_resi(series.values, self.N), index=series.index)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if self.N == 0:
+            return _apply_panel(expanding_resi, panel)
+        return _apply_panel(rolling_resi, panel, self.N)
+
 
 class WMA(Rolling):
     """Rolling WMA
@@ -1327,22 +1559,17 @@ class WMA(Rolling):
         a feature instance with weighted moving average output
     """
 
+    range_invariant = True
+
     def __init__(self, feature, N):
         super(WMA, self).__init__(feature, N, "wma")
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
-        # TODO: implement in Cython
-
-        def weighted_mean(x):
-            w = np.arange(len(x)) + 1
-            w = w / w.sum()
-            return np.nanmean(w * x)
-
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(weighted_mean, raw=True)
+            series = pd.Series(expanding_wma(series.values), index=series.index)
         else:
-            series = series.rolling(self.N, min_periods=1).apply(weighted_mean, raw=True)
+            series = pd.Series(rolling_wma(series.values, self.N), index=series.index)
         return series
 
 
@@ -1367,21 +1594,23 @@ class EMA(Rolling):
 
     def _load_internal(self, instrument, start_index, end_index, *args):
         series = self.feature.load(instrument, start_index, end_index, *args)
-
-        def exp_weighted_mean(x):
-            a = 1 - 2 / (1 + len(x))
-            w = a ** np.arange(len(x))[::-1]
-            w /= w.sum()
-            return np.nansum(w * x)
-
         if self.N == 0:
-            series = series.expanding(min_periods=1).apply(exp_weighted_mean, raw=True)
+            series = pd.Series(expanding_ema(series.values), index=series.index)
         elif 0 < self.N < 1:
             series = series.ewm(alpha=self.N, min_periods=1).mean()
         else:
             series = series.ewm(span=self.N, min_periods=1).mean()
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        if self.N == 0:
+            # the weights depend on the length of the data of each instrument
+            raise NotImplementedError("EMA(ATTR, 0) does not support panel calculation")
+        panel = self.feature.load_panel(ctx, start_index, end_index, *args)
+        if 0 < self.N < 1:
+            return panel.ewm(alpha=self.N, min_periods=1).mean()
+        return panel.ewm(span=self.N, min_periods=1).mean()
+
 
 #################### Pair-Wise Rolling ####################
 class PairRolling(ExpressionOps):
@@ -1412,6 +1641,12 @@ class PairRolling(ExpressionOps):
     def __str__(self):
         return "{}({},{},{})".format(type(self).__name__, self.feature_left, self.feature_right, self.N)
 
+    def get_dependencies(self):
+        return [f for f in (self.feature_left, self.feature_right) if isinstance(f, Expression)]
+
+    def is_range_invariant(self):
+        return self.N != 0 and super().is_range_invariant()
+
     def _load_internal(self, instrument, start_index, end_index, *args):
         assert any(
             [isinstance(self.feature_left, Expression), self.feature_right, Expression]
@@ -1432,6 +1667,21 @@ class PairRolling(ExpressionOps):
             series = getattr(series_left.rolling(self.N, min_periods=1), self.func)(series_right)
         return series
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        if isinstance(self.feature_left, Expression):
+            panel_left = self.feature_left.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_left = self.feature_left  # numeric value
+        if isinstance(self.feature_right, Expression):
+            panel_right = self.feature_right.load_panel(ctx, start_index, end_index, *args)
+        else:
+            panel_right = self.feature_right
+
+        # pairwise=False: calculate the columns (instruments) of the two panels one by one
+        if self.N == 0:
+            return getattr(panel_left.expanding(min_periods=1), self.func)(panel_right, pairwise=False)
+        return getattr(panel_left.rolling(self.N, min_periods=1), self.func)(panel_right, pairwise=False)
+
     def get_longest_back_rolling(self):
         if self.N == 0:
             return np.inf
@@ -1482,6 +1732,8 @@ class Corr(PairRolling):
         a feature instance with rolling correlation of two input features
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right, N):
         super(Corr, self).__init__(feature_left, feature_right, N, "corr")
 
@@ -1497,6 +1749,16 @@ class Corr(PairRolling):
         ] = np.nan
         return res
 
+    def _load_panel_internal(self, ctx, start_index, end_index, *args):
+        res: pd.DataFrame = super(Corr, self)._load_panel_internal(ctx, start_index, end_index, *args)
+
+        panel_left = self.feature_left.load_panel(ctx, start_index, end_index, *args)
+        panel_right = self.feature_right.load_panel(ctx, start_index, end_index, *args)
+        return res.mask(
+            np.isclose(panel_left.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)
+            | np.isclose(panel_right.rolling(self.N, min_periods=1).std(), 0, atol=2e-05)
+        )
+
 
 class Cov(PairRolling):
     """Rolling Covariance
@@ -1516,6 +1778,8 @@ class Cov(PairRolling):
         a feature instance with rolling max of two input features
     """
 
+    range_invariant = True
+
     def __init__(self, feature_left, feature_right, N):
         super(Cov, self).__init__(feature_left, feature_right, N, "cov")
 
@@ -17,40 +17,89 @@ import numpy as np
 import pandas as pd
 from qlib.data.ops import ElemOperator
 from qlib.log import get_module_logger
-from .data import Cal
+from .base import PFeature
+from .data import Cal, PITD, PITTimeline
 
 
 class P(ElemOperator):
     def _load_internal(self, instrument, start_index, end_index, freq):
 
-        _calendar = Cal.calendar(freq=freq)
+        _calendar = Cal.calendar_array(freq=freq)
         resample_data = np.empty(end_index - start_index + 1, dtype="float32")
 
-        for cur_index in range(start_index, end_index + 1):
-            cur_time = _calendar[cur_index]
-            # To load expression accurately, more historical data are required
-            start_ws, end_ws = self.feature.get_extended_window_size()
-            if end_ws > 0:
-                raise ValueError(
-                    "PIT database does not support referring to future period (e.g. expressions like `Ref('$$roewa_q', -1)` are not supported"
-                )
-
-            # The calculated value will always the last element, so the end_offset is zero.
-            try:
+        # To load expression accurately, more historical data are required
+        start_ws, end_ws = self.feature.get_extended_window_size()
+        if end_ws > 0:
+            raise ValueError(
+                "PIT database does not support referring to future period (e.g. expressions like `Ref('$$roewa_q', -1)` are not supported"
+            )
+
+        try:
+            cur_times = pd.DatetimeIndex(_calendar[start_index : end_index + 1])
+            observed, inverse = self._group_observe_times(instrument, cur_times)
+            values = np.empty(len(observed), dtype="float32")
+            for i, cur_time in enumerate(observed):
+                # The calculated value will always the last element, so the end_offset is zero.
                 s = self._load_feature(instrument, -start_ws, 0, cur_time)
-                resample_data[cur_index - start_index] = s.iloc[-1] if len(s) > 0 else np.nan
-            except FileNotFoundError:
-                get_module_logger("base").warning(f"WARN: period data not found for {str(self)}")
-                return pd.Series(dtype="float32", name=str(self))
+                values[i] = s.iloc[-1] if len(s) > 0 else np.nan
+            resample_data[:] = values[inverse]
+        except FileNotFoundError:
+            get_module_logger("base").warning(f"WARN: period data not found for {str(self)}")
+            return pd.Series(dtype="float32", name=str(self))
 
         resample_series = pd.Series(
             resample_data, index=pd.RangeIndex(start_index, end_index + 1), dtype="float32", name=str(self)
         )
         return resample_series
 
+    def _get_period_fields(self):
+        """the period features which the value at each observe time depends on; None if it is unknown"""
+        fields, stack = set(), [self.feature]
+        while stack:
+            expr = stack.pop()
+            if isinstance(expr, PFeature):
+                fields.add(str(expr))
+                continue
+            deps = expr.get_dependencies()
+            # e.g. the features of other instruments are not tracked
+            if len(deps) == 0:
+                return None
+            stack.extend(deps)
+        return sorted(fields)
+
+    def _group_observe_times(self, instrument, cur_times: pd.DatetimeIndex):
+        """
+        group the observe times by the revisions observed
+
+        The feature is only calculated once for the observe times with the same revisions of the period data.
+
+        Returns
+        -------
+        pd.DatetimeIndex
+            an observe time of each group
+        np.ndarray
+            the group of each observe time
+        """
+        fields = self._get_period_fields()
+        if fields is not None:
+            try:
+                timelines = [PITD.period_timeline(instrument, field) for field in fields]
+            except NotImplementedError:
+                fields = None
+        if fields is None:
+            return cur_times, np.arange(len(cur_times))
+        cur_date_int = PITTimeline.date_to_int(cur_times).values
+        locs = np.stack([timeline.locate(cur_date_int) for timeline in timelines], axis=1)
+        _, first, inverse = np.unique(locs, axis=0, return_index=True, return_inverse=True)
+        return cur_times[first], inverse.reshape(-1)
+
     def _load_feature(self, instrument, start_index, end_index, cur_time):
         return self.feature.load(instrument, start_index, end_index, cur_time)
 
+    def get_dependencies(self):
+        # the feature is loaded with the period data at each observe time
+        return []
+
     def get_longest_back_rolling(self):
         # The period data will collapse as a normal feature. So no extending and looking back
         return 0
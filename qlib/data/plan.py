@@ -0,0 +1,150 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The calculation plan of the fields in a dataset query.
+
+The fields of a dataset share a lot of sub-expressions (e.g. `$close` and `Ref($close, 1)` in Alpha158).
+`ExpressionPlan` parses all the fields into one DAG, whose nodes are the sub-expressions with the index range they
+are loaded with, so that each node is calculated once for each instrument and is released as soon as all the
+expressions depending on it have been calculated.
+"""
+from typing import Dict, Tuple
+
+from .base import Expression, Feature
+from .cache import H
+
+
+class ExpressionPlan:
+    """Expression plan
+
+    The nodes are identified by `(str(expression), start_index, end_index)`, which is the same as the key of the
+    expression in the memory cache `H["f"]` without instrument and freq. So the result of each node is the same as
+    loading the expression directly; the plan only decides the order of the calculation and the release of the
+    intermediate results.
+    """
+
+    def __init__(self, expressions: Dict[str, Tuple[Expression, int, int]], freq: str):
+        """
+        Parameters
+        ----------
+        expressions : dict
+            {field: (expression, start_index, end_index)}, the expressions of the fields and the index ranges
+            [in calendar] they are loaded with.
+        freq : str
+            feature frequency.
+        """
+        self.freq = freq
+        self.nodes = {}  # {node: expression}
+        self.dependencies = {}  # {node: the nodes it depends on}
+        self.consumers = {}  # {node: the number of nodes depending on it}
+        self.order = []  # the topological order of the nodes
+        # the leaf features are not related to the range, each of them is loaded once with the union range
+        self.feature_range = {}
+        self.roots = {}  # {node: the number of fields}
+        self._n_fields = len(expressions)
+        self._n_refs = 0
+        for expression, start_index, end_index in expressions.values():
+            # the fields are the consumers of the roots, so the roots are kept in the cache
+            root = self._add(expression, start_index, end_index)
+            self.consumers[root] += 1
+            self.roots[root] = self.roots.get(root, 0) + 1
+        # the roots which can be sliced from the cached results of other ranges
+        self._range_roots = {root for root in self.roots if self.nodes[root].is_range_invariant()}
+
+    def _add(self, expression, start_index, end_index):
+        node = str(expression), start_index, end_index
+        self._n_refs += 1
+        if node not in self.nodes:
+            dependencies = [self._add(e, start_index, end_index) for e in expression.get_dependencies()]
+            for dep in dependencies:
+                self.consumers[dep] += 1
+            self.nodes[node] = expression
+            self.dependencies[node] = dependencies
+            self.consumers[node] = 0
+            self.order.append(node)
+            if isinstance(expression, Feature):
+                lft, rght = self.feature_range.get(node[0], (start_index, end_index))
+                self.feature_range[node[0]] = min(lft, start_index), max(rght, end_index)
+        return node
+
+    @property
+    def stats(self) -> dict:
+        """The number of the fields, the expression nodes referred by the fields, the unique nodes and the nodes
+        shared by more than one expression"""
+        return {
+            "fields": self._n_fields,
+            "nodes": self._n_refs,
+            "unique": len(self.nodes),
+            "shared": sum(1 for n in self.consumers.values() if n > 1),
+        }
+
+    def execute(self, instrument):
+        """Calculate the fields of `instrument` into the memory cache `H["f"]`
+
+        After executing, the fields can be loaded from the cache. The intermediate results cached by the execution
+        are removed once their consumers have been calculated, while the ones cached before are kept.
+
+        Parameters
+        ----------
+        instrument : str
+            instrument code.
+        """
+        # the roots covered by the cached ranges are sliced from the cache, so their sub-expressions are not needed
+        served = set()
+        for node in self._range_roots:
+            name, start_index, end_index = node
+            cache_key = name, instrument, start_index, end_index, self.freq
+            if cache_key not in H["f"]:
+                series = self.nodes[node].find_range(instrument, start_index, end_index, self.freq)
+                if series is not None:
+                    H["f"][cache_key] = series
+                    served.add(node)
+        if served:
+            needed = set()
+            stack = [node for node in self.roots if node not in served]
+            while stack:
+                node = stack.pop()
+                if node not in needed:
+                    needed.add(node)
+                    stack.extend(self.dependencies[node])
+            remaining = {node: self.roots.get(node, 0) for node in needed}
+            for node in needed:
+                for dep in self.dependencies[node]:
+                    remaining[dep] += 1
+        else:
+            needed = self.nodes
+            remaining = dict(self.consumers)
+
+        created = set()
+        features = {}
+        for node in self.order:
+            if node not in needed:
+                continue
+            name, start_index, end_index = node
+            cache_key = name, instrument, start_index, end_index, self.freq
+            if cache_key not in H["f"]:
+                created.add(cache_key)
+                expression = self.nodes[node]
+                if name in self.feature_range:
+                    if name not in features:
+                        lft, rght = self.feature_range[name]
+                        union_key = name, instrument, lft, rght, self.freq
+                        cached = union_key in H["f"]
+                        features[name] = expression.load(instrument, lft, rght, self.freq)
+                        if not cached:
+                            if (name, lft, rght) in self.nodes:
+                                created.add(union_key)
+                            elif union_key in H["f"]:
+                                H["f"].pop(union_key)
+                    series = features[name]
+                    # the empty series of a missing instrument is not indexed by the calendar positions
+                    H["f"][cache_key] = series.loc[start_index:end_index] if len(series) > 0 else series
+                else:
+                    expression.load(instrument, start_index, end_index, self.freq)
+                if node in self._range_roots:
+                    H["f"].index_range(cache_key)
+            for dep in self.dependencies[node]:
+                remaining[dep] -= 1
+                dep_key = dep[0], instrument, dep[1], dep[2], self.freq
+                if remaining[dep] == 0 and dep_key in created and dep_key in H["f"]:
+                    H["f"].pop(dep_key)
@@ -0,0 +1,241 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+The binary protocol between the data client and the data server.
+
+Each message is a head followed by an optional data frame on a stream connection (TCP or Unix socket):
+
+- head: the length of the head (4 bytes, big-endian unsigned int) and the dict of the head in JSON. The timestamps and
+  the `SharedFrame` are encoded as tagged objects; the head is never unpickled, so a message can't execute code on the
+  receiver.
+- data: the `pandas.DataFrame` in the Arrow IPC stream format. It is written in record batches, and the batches can
+  be compressed by `zstd` or `lz4`. The stream ends with its own end-of-stream marker, so the next message can be
+  sent on the same connection right after it.
+
+So the requests are pipelined on one connection and the features are not pickled as a whole.
+
+The server on the same machine can also respond a `SharedFrame` in the head instead of the data. The arrays of the
+DataFrame are dumped into a file in the shared memory, and the client maps the file and builds the DataFrame on the
+mapped arrays without copying.
+"""
+import datetime
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+HEAD_STRUCT = struct.Struct("!I")
+
+# the compression codecs supported by the Arrow IPC format
+COMPRESSIONS = (None, "zstd", "lz4")
+
+# the max number of rows of each record batch
+BATCH_ROWS = 1 << 16
+
+
+def _import_arrow():
+    try:
+        import pyarrow as pa  # pylint: disable=C0415
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required by the binary protocol, please install it by `pip install pyarrow`"
+        ) from e
+    return pa
+
+
+def _read_exact(rfile, size: int) -> bytes:
+    data = rfile.read(size)
+    if len(data) != size:
+        raise ConnectionError(f"The connection is closed, {len(data)} of {size} bytes are received")
+    return data
+
+
+def _encode(obj):
+    """encode the objects of the head which are not supported by JSON"""
+    if isinstance(obj, SharedFrame):
+        return {"__shared_frame__": [obj.path, obj.size, obj.index, obj.blocks, obj.columns]}
+    if isinstance(obj, (datetime.datetime, datetime.date, np.datetime64)):
+        return {"__timestamp__": pd.Timestamp(obj).isoformat()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} can not be sent in the head of a message")
+
+
+def _decode(obj: dict):
+    if "__timestamp__" in obj:
+        return pd.Timestamp(obj["__timestamp__"])
+    if "__shared_frame__" in obj:
+        return SharedFrame(*obj["__shared_frame__"])
+    return obj
+
+
+def send_message(wfile, head: dict, data: Optional[pd.DataFrame] = None, compression: Optional[str] = None):
+    """
+    Send a message.
+
+    Parameters
+    ----------
+    wfile :
+        the writable binary file of the connection
+    head : dict
+        the head of the message; it is encoded in JSON, so the values can only be the str, numbers, bool, None, lists,
+        tuples (decoded as lists), dicts with str keys, timestamps and `SharedFrame`
+    data : pd.DataFrame
+        the data of the message; it is sent in the Arrow IPC stream format
+    compression : str
+        the compression codec of the data, None/"zstd"/"lz4"
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unsupported compression {compression}, it should be one of {COMPRESSIONS}")
+    payload = json.dumps(dict(head, has_data=data is not None), default=_encode).encode("utf-8")
+    wfile.write(HEAD_STRUCT.pack(len(payload)))
+    wfile.write(payload)
+    if data is not None:
+        pa = _import_arrow()
+        table = pa.Table.from_pandas(data, preserve_index=True)
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_stream(wfile, table.schema, options=options) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    wfile.flush()
+
+
+def recv_message(rfile) -> Optional[Tuple[dict, Optional[pd.DataFrame]]]:
+    """
+    Receive a message.
+
+    Parameters
+    ----------
+    rfile :
+        the readable binary file of the connection
+
+    Returns
+    -------
+    Optional[Tuple[dict, Optional[pd.DataFrame]]]
+        the head and the data of the message; None if the connection is closed before the message
+    """
+    size = rfile.read(HEAD_STRUCT.size)
+    if len(size) == 0:
+        return None
+    if len(size) != HEAD_STRUCT.size:
+        raise ConnectionError("The connection is closed in the head of the message")
+    head = json.loads(_read_exact(rfile, HEAD_STRUCT.unpack(size)[0]).decode("utf-8"), object_hook=_decode)
+    data = None
+    if head.pop("has_data"):
+        pa = _import_arrow()
+        data = pa.ipc.open_stream(rfile).read_all().to_pandas()
+    return head, data
+
+
+class SharedFrame:
+    """The DataFrame of the features in a file in the shared memory
+
+    The DataFrame is indexed by <instrument, datetime>. The file contains the codes of the index and the values of the
+    columns of each dtype as a (columns, rows) matrix, so the DataFrame built on the mapped file shares the memory of
+    all the processes loading it. The file is mapped copy-on-write, so the modified pages are private to the process.
+    """
+
+    ALIGN = 64
+
+    def __init__(self, path: Union[str, Path], size: int, index: dict, blocks: list, columns: list):
+        """
+        Parameters
+        ----------
+        path : Union[str, Path]
+            the path of the file
+        size : int
+            the size of the file in bytes
+        index : dict
+            the names, the instruments and the (dtype, offset, length) of the datetimes and the codes of the index
+        blocks : list
+            the list of (dtype, offset, positions of the columns) of the value matrix of each dtype
+        columns : list
+            the names of the columns
+        """
+        self.path = str(path)
+        self.size = size
+        self.index = index
+        self.blocks = blocks
+        self.columns = columns
+
+    @staticmethod
+    def is_supported(df: pd.DataFrame) -> bool:
+        """whether the DataFrame can be dumped"""
+        return (
+            len(df) > 0
+            and df.shape[1] > 0
+            and isinstance(df.index, pd.MultiIndex)
+            and df.index.nlevels == 2
+            and isinstance(df.index.levels[1], pd.DatetimeIndex)
+            and all(dtype.kind in "biuf" for dtype in df.dtypes)
+        )
+
+    @classmethod
+    def dump(cls, df: pd.DataFrame, path: Union[str, Path]) -> "SharedFrame":
+        """dump the DataFrame to `path`"""
+        arrays = []
+
+        def _add(arr):
+            # the arrays are aligned after the previous one
+            offset = -(-(arrays[-1][0] + arrays[-1][1].nbytes) // cls.ALIGN) * cls.ALIGN if arrays else 0
+            arrays.append((offset, np.ascontiguousarray(arr)))
+            return offset
+
+        idx = df.index
+        index = {
+            "names": list(idx.names),
+            "instruments": idx.levels[0].tolist(),
+            "inst_codes": ("int32", _add(idx.codes[0].astype(np.int32)), len(idx)),
+            "datetimes": ("int64", _add(idx.levels[1].asi8), len(idx.levels[1])),
+            "dt_codes": ("int32", _add(idx.codes[1].astype(np.int32)), len(idx)),
+        }
+        blocks = []
+        for dtype, positions in pd.Series(range(df.shape[1])).groupby(df.dtypes.values.astype(str)).groups.items():
+            positions = list(positions)
+            values = df.iloc[:, positions].to_numpy(dtype=dtype).T
+            blocks.append((dtype, _add(values), positions))
+        size = arrays[-1][0] + arrays[-1][1].nbytes
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+            for offset, arr in arrays:
+                f.seek(offset)
+                f.write(memoryview(arr).cast("B"))
+        os.replace(tmp_path, path)
+        return cls(path, size, index, blocks, df.columns.tolist())
+
+    def load(self) -> pd.DataFrame:
+        """map the file and build the DataFrame on it
+
+        The file is mapped copy-on-write: the pages are shared with the other processes until they are modified,
+        and the modifications are private to the DataFrame (the file is not changed).
+        """
+        with open(self.path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_COPY)
+
+        def _array(dtype, offset, count):
+            return np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+
+        index = pd.MultiIndex(
+            levels=[
+                pd.Index(self.index["instruments"], dtype=object),
+                pd.DatetimeIndex(_array(*self.index["datetimes"])),
+            ],
+            codes=[_array(*self.index["inst_codes"]), _array(*self.index["dt_codes"])],
+            names=self.index["names"],
+            verify_integrity=False,
+        )
+        nrows = self.index["inst_codes"][2]
+        frames = []
+        for dtype, offset, positions in self.blocks:
+            values = _array(dtype, offset, nrows * len(positions)).reshape(len(positions), nrows)
+            frames.append(pd.DataFrame(values.T, index=index, columns=[self.columns[p] for p in positions], copy=False))
+        if len(frames) == 1:
+            return frames[0]
+        # the columns of different dtypes can not share one matrix
+        return pd.concat(frames, axis=1)[self.columns]
@@ -0,0 +1,262 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+A data server of the binary protocol (see `qlib.data.protocol`).
+
+It answers the requests of `ArrowClient` with the local provider of the process, e.g.
+
+.. code-block:: python
+
+    import qlib
+    from qlib.data.server import FeatureServer
+
+    qlib.init(provider_uri="~/.qlib/qlib_data/cn_data")
+    FeatureServer(("127.0.0.1", 9710)).serve_forever()
+
+The server has no authentication and any client reaching it can read all the data of the provider, so please bind it
+to the loopback address (or a trusted network) only.
+
+`LocalFeatureServer` is a daemon for the processes on the same machine. It listens on a Unix socket, keeps the
+features in a shared in-memory cache and responds them as `SharedFrame`. So the concurrent training jobs on one
+machine compute each expression once and map the same memory, e.g.
+
+.. code-block:: bash
+
+    python -m qlib.data.server --socket_path /tmp/qlib.sock --provider_uri ~/.qlib/qlib_data/cn_data
+"""
+import os
+import shutil
+import socketserver
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import fire
+import pandas as pd
+
+from ..log import get_module_logger
+from ..utils import hash_args
+from ..utils.file import get_shm_dir
+from .protocol import SharedFrame, recv_message, send_message
+
+
+class FeatureRequestHandler(socketserver.StreamRequestHandler):
+    """Answer the requests on a connection one by one until the connection is closed by the client"""
+
+    def handle(self):
+        while True:
+            try:
+                msg = recv_message(self.rfile)
+            except (ConnectionError, OSError):
+                break
+            if msg is None:
+                break
+            req, _ = msg
+            res = {"id": req["id"], "status": 0, "detailed_info": None, "result": None}
+            data = None
+            try:
+                result = self.server.process(req["type"], req["body"])
+                if isinstance(result, pd.DataFrame):
+                    data = result
+                else:
+                    res["result"] = result
+            except Exception as e:
+                self.server.logger.exception(f"Error when processing the {req['type']} request")
+                res.update(status=1, detailed_info=f"{e}\n{traceback.format_exc()}")
+            send_message(self.wfile, res, data, compression=req["head"].get("compression"))
+
+
+class FeatureServerMixin:
+    """Process the requests with a provider (`qlib.data.D` by default)"""
+
+    def init_provider(self, provider=None):
+        if provider is None:
+            from . import D  # pylint: disable=C0415
+
+            provider = D
+        self.provider = provider
+        self.logger = get_module_logger(self.__class__.__name__)
+
+    @staticmethod
+    def _parse_time(t):
+        # `ClientCalendarProvider` and `ClientInstrumentProvider` send the time in str
+        return None if t is None or t == "None" else t
+
+    def process(self, request_type, request_content):
+        """
+        Parameters
+        ----------
+        request_type : str
+            'calendar'/'instrument'/'feature'.
+        request_content : dict
+            the arguments of the request.
+
+        Returns
+        -------
+        the calendar list, the instruments or the `pd.DataFrame` of the features.
+        """
+        start_time = self._parse_time(request_content.get("start_time"))
+        end_time = self._parse_time(request_content.get("end_time"))
+        freq = request_content.get("freq", "day")
+        if request_type == "calendar":
+            return list(
+                self.provider.calendar(start_time, end_time, freq=freq, future=request_content.get("future", False))
+            )
+        elif request_type == "instrument":
+            return self.provider.list_instruments(
+                request_content["instruments"], start_time, end_time, freq=freq, as_list=request_content["as_list"]
+            )
+        elif request_type == "feature":
+            return self.provider.features(
+                request_content["instruments"],
+                request_content["fields"],
+                start_time,
+                end_time,
+                freq=freq,
+                disk_cache=request_content.get("disk_cache", 0),
+                inst_processors=request_content.get("inst_processors", []),
+            )
+        raise ValueError(f"Unsupported request type {request_type}")
+
+
+class FeatureServer(FeatureServerMixin, socketserver.ThreadingTCPServer):
+    """A TCP server of the binary protocol; each connection is served by a thread
+
+    The server has no authentication, please bind it to a trusted network only.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # the hosts which are only reachable from the same machine
+    LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+    def __init__(self, server_address, provider=None):
+        self.init_provider(provider)
+        if server_address[0] not in self.LOOPBACK_HOSTS:
+            self.logger.warning(
+                f"The server is bound to {server_address[0]} without authentication, any client which can reach it "
+                "can read the data"
+            )
+        super().__init__(server_address, FeatureRequestHandler)
+
+
+class LocalFeatureServer(FeatureServerMixin, socketserver.ThreadingUnixStreamServer):
+    """A Unix socket server which responds the features in the shared memory
+
+    The features are dumped as `SharedFrame` into the files in the shared memory (`/dev/shm` if it exists) and kept
+    in a LRU cache limited by `cache_size`. The concurrent requests of the same features wait for one computation.
+    """
+
+    daemon_threads = True
+
+    # the number of the locks for the concurrent computations
+    N_LOCKS = 64
+
+    def __init__(self, socket_path, provider=None, cache_size=8 << 30, shm_dir=None):
+        """
+        Parameters
+        ----------
+        socket_path : str
+            the path of the Unix socket.
+        provider :
+            the provider to process the requests, `qlib.data.D` by default.
+        cache_size : int
+            the max size of the cached features in bytes.
+        shm_dir : str
+            the directory to dump the features, `/dev/shm` (or the temporary directory if it does not exist) by
+            default.
+        """
+        self.init_provider(provider)
+        self.cache_size = cache_size
+        self.shm_dir = Path(shm_dir or get_shm_dir()).joinpath(f"qlib_features_{os.getpid()}_{uuid.uuid4().hex[:8]}")
+        self.shm_dir.mkdir(parents=True)
+        self._frames = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(self.N_LOCKS)]
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, FeatureRequestHandler)
+
+    def _get_frame(self, key):
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+    def _set_frame(self, key, frame: SharedFrame):
+        with self._lock:
+            self._frames[key] = frame
+            self._cached_bytes += frame.size
+            while self._cached_bytes > self.cache_size and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self._cached_bytes -= evicted.size
+                # the processes which have mapped the file still hold the memory
+                os.remove(evicted.path)
+
+    def process(self, request_type, request_content):
+        if request_type != "feature":
+            return super().process(request_type, request_content)
+        key = hash_args(
+            *[
+                request_content.get(k)
+                for k in ["instruments", "fields", "start_time", "end_time", "freq", "inst_processors"]
+            ]
+        )
+        with self._key_locks[hash(key) % self.N_LOCKS]:
+            frame = self._get_frame(key)
+            if frame is not None:
+                self.logger.debug(f"features {key} hit the cache")
+                return frame
+            df = super().process(request_type, request_content)
+            if not SharedFrame.is_supported(df):
+                return df
+            frame = SharedFrame.dump(df, self.shm_dir.joinpath(key))
+            self._set_frame(key, frame)
+            return frame
+
+    def server_close(self):
+        super().server_close()
+        shutil.rmtree(self.shm_dir, ignore_errors=True)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def run(socket_path, provider_uri=None, cache_size=8 << 30, shm_dir=None, **kwargs):
+    """
+    Run `LocalFeatureServer` until it is interrupted.
+
+    Parameters
+    ----------
+    socket_path : str
+        the path of the Unix socket.
+    provider_uri : str
+        the provider uri of the data.
+    cache_size : int
+        the max size of the cached features in bytes.
+    shm_dir : str
+        the directory to dump the features.
+    kwargs :
+        the other arguments of `qlib.init`.
+    """
+    import qlib  # pylint: disable=C0415
+
+    if provider_uri is not None:
+        kwargs["provider_uri"] = provider_uri
+    qlib.init(**kwargs)
+    server = LocalFeatureServer(socket_path, cache_size=cache_size, shm_dir=shm_dir)
+    server.logger.info(f"serving on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
@@ -11,7 +11,7 @@ import pandas as pd
 from qlib.utils.time import Freq
 from qlib.utils.resam import resam_calendar
 from qlib.config import C
-from qlib.data.cache import H
+from qlib.data.cache import H, MemCacheLengthUnit
 from qlib.log import get_module_logger
 from qlib.data.storage import CalendarStorage, InstrumentStorage, FeatureStorage, CalVT, InstKT, InstVT
 
@@ -133,9 +133,10 @@ class FileCalendarStorage(FileStorageMixin, CalendarStorage):
         # If cache is enabled, then return cache directly
         if self.enable_read_cache:
             key = "orig_file" + str(self.uri)
-            if key not in H["c"]:
-                H["c"][key] = self._read_calendar()
-            _calendar = H["c"][key]
+            _calendar = H["c"].get(key)
+            if _calendar is None:
+                _calendar = self._read_calendar()
+                H["c"][key] = _calendar
         else:
             _calendar = self._read_calendar()
         if Freq(self._freq_file) != Freq(self.freq):
@@ -380,3 +381,248 @@ class FileFeatureStorage(FileStorageMixin, FeatureStorage):
     def __len__(self) -> int:
         self.check()
         return self.uri.stat().st_size // 4 - 1
+
+
+class MmapFeatureStorage(FileFeatureStorage):
+    """FeatureStorage backed by read-only `np.memmap`
+
+    The layout of the `.bin` file is the same as `FileFeatureStorage`. Instead of opening the file and
+    reading a fresh buffer for every query, each file is mapped once and kept in a bounded LRU cache which is
+    shared by all the storage instances in the process (its size is controlled by `C.mmap_cache_size_limit`).
+
+    - Slicing returns a zero-copy (read-only) view of the mapped file.
+    - The pages of the mapped files are served by the OS page cache, so processes loading the same feature
+      share the same physical memory.
+
+    It can be enabled by the backend config of the feature provider
+
+    .. code-block:: python
+
+        qlib.init(
+            provider_uri=...,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {"class": "MmapFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+                },
+            },
+        )
+
+    .. note:: The mapped handles are dropped when the file is written by this class. But files must not be
+        rewritten by other processes while they are being read, otherwise the views may become invalid.
+    """
+
+    _mmap_cache = None
+
+    @classmethod
+    def _get_mmap_cache(cls) -> MemCacheLengthUnit:
+        if MmapFeatureStorage._mmap_cache is None:
+            MmapFeatureStorage._mmap_cache = MemCacheLengthUnit(C.mmap_cache_size_limit)
+        return MmapFeatureStorage._mmap_cache
+
+    @classmethod
+    def clear_mmap_cache(cls):
+        """release all the mapped files of current process"""
+        cls._get_mmap_cache().clear()
+
+    def _get_data(self) -> Union[Tuple[int, np.ndarray], None]:
+        """get the start index and the (read-only) values of the feature
+
+        Returns
+        -------
+            (start_index, values); None if the data does not exist or is empty
+        """
+        key = str(self.uri)
+        cache = self._get_mmap_cache()
+        if key in cache:
+            data = cache[key]
+        else:
+            if not self.uri.exists():
+                return None
+            size = self.uri.stat().st_size // 4
+            # An empty file can't be mapped
+            data = np.memmap(key, dtype="<f", mode="r", shape=(size,)) if size > 0 else np.empty(0, dtype="<f")
+            cache[key] = data
+        if len(data) == 0:
+            return None
+        # `view(np.ndarray)` drops the memmap subclass without copying the data
+        return int(data[0]), data[1:].view(np.ndarray)
+
+    def _release_mmap(self):
+        cache = self._get_mmap_cache()
+        key = str(self.uri)
+        if key in cache:
+            cache.pop(key)
+
+    def clear(self):
+        self._release_mmap()
+        super(MmapFeatureStorage, self).clear()
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        self._release_mmap()
+        super(MmapFeatureStorage, self).write(data_array, index)
+        # `write` may map the file again to get `end_index` before the data is appended
+        self._release_mmap()
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        data = self._get_data()
+        return None if data is None else data[0]
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        data = self._get_data()
+        if data is None:
+            if isinstance(i, int):
+                return None, None
+            elif isinstance(i, slice):
+                return pd.Series(dtype=np.float32)
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+        storage_start_index, values = data
+        storage_end_index = storage_start_index + len(values) - 1
+        if isinstance(i, int):
+            if storage_start_index > i:
+                raise IndexError(f"{i}: start index is {storage_start_index}")
+            return i, float(values[i - storage_start_index])
+        elif isinstance(i, slice):
+            start_index = storage_start_index if i.start is None else i.start
+            end_index = storage_end_index if i.stop is None else i.stop - 1
+            si = max(start_index, storage_start_index)
+            if si > end_index:
+                return pd.Series(dtype=np.float32)
+            values = values[si - storage_start_index : end_index - storage_start_index + 1]
+            return pd.Series(values, index=pd.RangeIndex(si, si + len(values)))
+        else:
+            raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        data = self._get_data()
+        if data is None:
+            self.check()
+            return 0
+        return len(data[1])
+
+
+class BundleFeatureStorage(MmapFeatureStorage):
+    """FeatureStorage reading the fields of an instrument from a columnar bundle file
+
+    `FileFeatureStorage` stores each `(instrument, field)` pair in a separate file, so loading a handful of
+    fields for thousands of instruments opens thousands of files. This storage reads all the bundled fields of
+    an instrument from one contiguous file, which is mapped once (shared with `MmapFeatureStorage`'s handle cache).
+
+    The bundle is located at `features/<instrument>/<freq>.bundle` and it can be generated from the `.bin` files by
+    `python scripts/dump_bin.py dump_bundle --qlib_dir <qlib_dir>`. Its layout(little-endian) is
+
+    .. code-block:: text
+
+        BUNDLE_MAGIC               8 bytes
+        n_fields                   uint32
+        index                      n_fields records of BUNDLE_INDEX_DTYPE (field, start_index, offset, length)
+        data                       the float32 values of each field, located by `offset`(bytes) and `length`
+
+    Fields that are not in the bundle(or instruments without bundle) fall back to the `.bin` files, so the bundle
+    only needs to contain the frequently used base fields(e.g. OHLCV).
+
+    It can be enabled by the backend config of the feature provider
+
+    .. code-block:: python
+
+        qlib.init(
+            provider_uri=...,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {
+                    "backend": {"class": "BundleFeatureStorage", "module_path": "qlib.data.storage.file_storage"}
+                },
+            },
+        )
+    """
+
+    BUNDLE_MAGIC = b"QLIBBDL1"
+    BUNDLE_SUFFIX = ".bundle"
+    BUNDLE_INDEX_DTYPE = np.dtype([("field", "S32"), ("start_index", "<i4"), ("offset", "<i8"), ("length", "<i8")])
+
+    def __init__(self, instrument: str, field: str, freq: str, provider_uri: dict = None, **kwargs):
+        super(BundleFeatureStorage, self).__init__(instrument, field, freq, provider_uri=provider_uri, **kwargs)
+        self.bundle_file_name = f"{instrument.lower()}/{freq.lower()}{self.BUNDLE_SUFFIX}"
+
+    @property
+    def bundle_uri(self) -> Path:
+        return self.uri.parents[1].joinpath(self.bundle_file_name)
+
+    @classmethod
+    def read_bundle(cls, bundle_path: Union[str, Path]) -> Dict[str, Tuple[int, np.ndarray]]:
+        """map the bundle file and return `{field: (start_index, values)}`; the values are read-only views"""
+        data = np.memmap(str(bundle_path), dtype=np.uint8, mode="r")
+        header_size = len(cls.BUNDLE_MAGIC) + 4
+        if len(data) < header_size or data[: len(cls.BUNDLE_MAGIC)].tobytes() != cls.BUNDLE_MAGIC:
+            raise ValueError(f"{bundle_path} is not a valid feature bundle")
+        n_fields = int(data[len(cls.BUNDLE_MAGIC) : header_size].view("<u4")[0])
+        index = data[header_size : header_size + n_fields * cls.BUNDLE_INDEX_DTYPE.itemsize].view(
+            cls.BUNDLE_INDEX_DTYPE
+        )
+        res = {}
+        for field, start_index, offset, length in index:
+            values = data[offset : offset + length * 4].view("<f").view(np.ndarray)
+            res[field.decode()] = (int(start_index), values)
+        return res
+
+    @classmethod
+    def write_bundle(cls, bundle_path: Union[str, Path], data: Mapping[str, Tuple[int, np.ndarray]]):
+        """write `{field: (start_index, values)}` into a bundle file
+
+        The bundle is written to a temporary file and renamed, so readers never see a partial bundle.
+        """
+        bundle_path = Path(bundle_path)
+        index = np.zeros(len(data), dtype=cls.BUNDLE_INDEX_DTYPE)
+        offset = len(cls.BUNDLE_MAGIC) + 4 + index.nbytes
+        values_l = []
+        for i, (field, (start_index, values)) in enumerate(data.items()):
+            field = field.lower().encode()
+            if len(field) > cls.BUNDLE_INDEX_DTYPE["field"].itemsize:
+                raise ValueError(f"the length of field name {field} exceeds {cls.BUNDLE_INDEX_DTYPE['field']}")
+            values = np.asarray(values).astype("<f")
+            index[i] = (field, start_index, offset, len(values))
+            offset += values.nbytes
+            values_l.append(values)
+        tmp_path = bundle_path.with_suffix(f"{cls.BUNDLE_SUFFIX}.tmp")
+        with tmp_path.open("wb") as fp:
+            fp.write(cls.BUNDLE_MAGIC)
+            np.array([len(data)], dtype="<u4").tofile(fp)
+            index.tofile(fp)
+            for values in values_l:
+                values.tofile(fp)
+        tmp_path.replace(bundle_path)
+
+    def _get_bundle(self) -> Union[Dict[str, Tuple[int, np.ndarray]], None]:
+        key = str(self.bundle_uri)
+        cache = self._get_mmap_cache()
+        if key not in cache:
+            if not self.bundle_uri.exists():
+                return None
+            cache[key] = self.read_bundle(key)
+        return cache[key]
+
+    def _get_data(self) -> Union[Tuple[int, np.ndarray], None]:
+        bundle = self._get_bundle()
+        if bundle is not None and self.field.lower() in bundle:
+            data = bundle[self.field.lower()]
+            return None if len(data[1]) == 0 else data
+        return super(BundleFeatureStorage, self)._get_data()
+
+    def _check_writable(self):
+        bundle = self._get_bundle()
+        if bundle is not None and self.field.lower() in bundle:
+            raise PermissionError(
+                f"{self.field} of {self.instrument} is bundled in {self.bundle_uri}, please rewrite the `.bin` files "
+                f"and regenerate the bundle by `scripts/dump_bin.py dump_bundle`"
+            )
+
+    def clear(self):
+        self._check_writable()
+        super(BundleFeatureStorage, self).clear()
+
+    def write(self, data_array: Union[List, np.ndarray], index: int = None) -> None:
+        self._check_writable()
+        super(BundleFeatureStorage, self).write(data_array, index)
@@ -163,20 +163,138 @@ def read_period_data(index_path, data_path, period, cur_date_int: int, quarterly
     return prev_value, prev_next
 
 
+class PITTimeline:
+    """The revision timeline of the period data of a field of an instrument
+
+    All the records of `<field>.data` are loaded at once and the linked revisions of each period are ordered by
+    following the `<field>.index` file. So the value of any period at any observe time is answered by `searchsorted`
+    instead of walking the linked list on the disk for each query (e.g. `read_period_data`).
+    """
+
+    def __init__(self, index_path, data_path, quarterly: bool):
+        DATA_RECORDS = [
+            ("date", C.pit_record_type["date"]),
+            ("period", C.pit_record_type["period"]),
+            ("value", C.pit_record_type["value"]),
+            ("_next", C.pit_record_type["index"]),
+        ]
+        data = np.fromfile(data_path, dtype=DATA_RECORDS)
+        with open(index_path, "rb") as fi:
+            fi.seek(struct.calcsize(C.pit_record_type["period"]))  # skip `first_year`
+            heads = np.fromfile(fi, dtype=C.pit_record_type["index"])
+
+        self.quarterly = quarterly
+        # the records are appended in the order of the observe time
+        self.dates = data["date"]
+        self.first_periods = np.minimum.accumulate(data["period"])
+        self.last_periods = np.maximum.accumulate(data["period"])
+
+        # collect the revisions period by period in a single sweep of the linked lists
+        nan_index = C.pit_record_nan["index"]
+        links = data["_next"].tolist()
+        order = []
+        for _next in heads.tolist():
+            while _next != nan_index:
+                i = _next // data.itemsize
+                order.append(i)
+                _next = links[i]
+        order = np.array(order, dtype=np.int64)
+        # key: (period, the time when the revision is reached); the periods of the index are ascending, so the
+        # cumulative max of the keys is the max date of the revisions of the same period before
+        keys = (data["period"][order].astype(np.uint64) << np.uint64(32)) | data["date"][order].astype(np.uint64)
+        self._keys = np.maximum.accumulate(keys)
+        self._values = data["value"][order]
+        self._indexes = (order * data.itemsize).astype(C.pit_record_type["index"])
+
+    @staticmethod
+    def date_to_int(cur_time):
+        """convert the observe time(s) to integers like 20190102"""
+        return cur_time.year * 10000 + cur_time.month * 100 + cur_time.day
+
+    def locate(self, cur_date_int):
+        """the number of the records observed at `cur_date_int`; the data are the same for the same number"""
+        return np.searchsorted(self.dates, cur_date_int, side="right")
+
+    def period_list(self, cur_date_int: int) -> List[int]:
+        """the periods observed at `cur_date_int`"""
+        loc = self.locate(cur_date_int)
+        if loc <= 0:
+            return []
+        return get_period_list(self.first_periods[loc - 1], self.last_periods[loc - 1], self.quarterly)
+
+    def query(self, periods, cur_date_int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        the latest revisions of `periods` observed at `cur_date_int`
+
+        All the queries are answered by a single `searchsorted` over the revisions sorted by (period, date).
+
+        Parameters
+        ----------
+        periods : array-like
+            the queried periods
+        cur_date_int : int or array-like
+            the observe time of each period, which is broadcast with `periods`
+
+        Returns
+        -------
+        np.ndarray
+            the value of each query; NaN if no revision is observed
+        np.ndarray
+            the byte index of the revision in `<field>.data`; `C.pit_record_nan["index"]` if no revision is observed
+        """
+        periods, cur_date_int = np.broadcast_arrays(np.asarray(periods), np.asarray(cur_date_int))
+        values = np.full(periods.shape, C.pit_record_nan["value"], dtype=self._values.dtype)
+        indexes = np.full(periods.shape, C.pit_record_nan["index"], dtype=self._indexes.dtype)
+        if len(self._keys) == 0:
+            return values, indexes
+        periods = periods.astype(np.uint64)
+        pos = np.searchsorted(self._keys, (periods << np.uint64(32)) | cur_date_int.astype(np.uint64), side="right")
+        pos -= 1
+        found = pos >= 0
+        found[found] = (self._keys[pos[found]] >> np.uint64(32)) == periods[found]
+        values[found] = self._values[pos[found]]
+        indexes[found] = self._indexes[pos[found]]
+        return values, indexes
+
+    def values(self, periods, cur_date_int) -> np.ndarray:
+        """the values of `periods` observed at `cur_date_int`; please refer to `query`"""
+        return self.query(periods, cur_date_int)[0]
+
+
+def read_period_data_batch(index_path, data_path, periods, cur_date_int, quarterly) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The batched version of `read_period_data`: read the information at many `periods` of the same field at once.
+
+    The files are loaded only once and all the queries are resolved in one vectorized pass.
+
+    Parameters
+    ----------
+    periods : array-like
+        date periods represented by interger, e.g. 201901 corresponds to the first quarter in 2019
+    cur_date_int : int or array-like
+        dates which represented by interger, e.g. 20190102; it is broadcast with `periods`
+
+    Returns
+    -------
+    the query values and byte indexes of the values; please refer to `PITTimeline.query`
+    """
+    return PITTimeline(index_path, data_path, quarterly).query(periods, cur_date_int)
+
+
 def np_ffill(arr: np.array):
     """
-    forward fill a 1D numpy array
+    forward fill a numpy array along the last axis
 
     Parameters
     ----------
     arr : np.array
-        Input numpy 1D array
+        Input numpy array, e.g. a 1D array or a 2D array whose rows are filled separately
     """
     mask = np.isnan(arr.astype(float))  # np.isnan only works on np.float
     # get fill index
-    idx = np.where(~mask, np.arange(mask.shape[0]), 0)
-    np.maximum.accumulate(idx, out=idx)
-    return arr[idx]
+    idx = np.where(~mask, np.arange(mask.shape[-1]), 0)
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    return np.take_along_axis(arr, idx, axis=-1)
 
 
 #################### Search ####################
@@ -518,6 +636,46 @@ def normalize_cache_fields(fields: [list, tuple]):
     return sorted(remove_repeat_field(remove_fields_space(fields)))
 
 
+def get_compute_dtype(default=None) -> Optional[np.dtype]:
+    """get the dtype of the calculated features (`C.compute_dtype`)
+
+    :param default: the dtype returned if `C.compute_dtype` is None
+    :return: np.dtype or None
+    """
+    dtype = C.get("compute_dtype", None)
+    if dtype is None:
+        dtype = default
+    return None if dtype is None else np.dtype(dtype)
+
+
+def astype_compute_dtype(data: Union[pd.Series, pd.DataFrame, np.ndarray]):
+    """convert the numeric data to the compute dtype (`C.compute_dtype`)
+
+    The bool data and the non-numeric data are kept. The data is returned directly if `C.compute_dtype` is None or
+    the data is already of the compute dtype.
+
+    :param data: pd.Series, pd.DataFrame or np.ndarray
+    :return: the data of the same type
+    """
+    dtype = get_compute_dtype()
+    if dtype is None:
+        return data
+    if isinstance(data, pd.DataFrame):
+        dtypes = data.dtypes
+        cols = [i for i, _dtype in enumerate(dtypes) if _dtype.kind in "iuf" and _dtype != dtype]
+        if len(cols) == 0:
+            return data
+        if len(cols) == len(dtypes):
+            return data.astype(dtype, copy=False)
+        data = data.copy(deep=False)
+        for i in cols:
+            data.isetitem(i, data.iloc[:, i].astype(dtype, copy=False))
+        return data
+    if data.dtype.kind in "iuf" and data.dtype != dtype:
+        return data.astype(dtype, copy=False)
+    return data
+
+
 def normalize_cache_instruments(instruments):
     """normalize cache instruments
 
@@ -160,6 +160,14 @@ def get_tmp_file_with_buffer(buffer):
         yield file_path
 
 
+def get_shm_dir() -> Path:
+    """Get the directory in the shared memory (`/dev/shm`), or the temporary directory if it does not exist.
+
+    The files in it are shared by the processes through memory mapping without being written to the disk.
+    """
+    return Path("/dev/shm") if os.path.isdir("/dev/shm") else Path(tempfile.gettempdir())
+
+
 @contextlib.contextmanager
 def get_io_object(file: Union[IO, str, Path], *args, **kwargs) -> IO:
     """
@@ -0,0 +1,109 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Benchmark of the PIT reader: `read_period_data_batch` against the per-query `read_period_data`.
+
+The period data are generated randomly and dumped by `dump_pit`, then the value of every period is queried at every
+observe day (as `P` and `PRef` do).
+
+Usage:
+    python benchmark_pit.py --years 20 --revisions 3 --days 1000
+"""
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from qlib.utils import read_period_data, read_period_data_batch
+from dump_pit import DumpPitData
+
+
+def _timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        res = func()
+    return (time.perf_counter() - start) / repeat, res
+
+
+def _gen_records(years: int, revisions: int, rng) -> pd.DataFrame:
+    records = []
+    for year in range(2000, 2000 + years):
+        for q in range(1, 5):
+            published = pd.Timestamp(year, q * 3, 1) + pd.Timedelta(days=int(rng.integers(20, 120)))
+            for r in range(revisions):
+                date = published + pd.Timedelta(days=90 * r + int(rng.integers(0, 30)))
+                records.append((date.strftime("%Y-%m-%d"), year * 100 + q, rng.normal()))
+    df = pd.DataFrame(records, columns=["date", "period", "value"])
+    df["field"] = "roe"
+    return df.sort_values("date", kind="stable")
+
+
+def benchmark(years: int = 20, revisions: int = 3, days: int = 1000, repeat: int = 3, seed: int = 0):
+    """
+    Parameters
+    ----------
+    years : int
+        the number of years of the quarterly data
+    revisions : int
+        the number of revisions of each period
+    days : int
+        the number of observe days
+    repeat : int
+        the number of runs to average
+    seed : int
+        random seed
+    """
+    rng = np.random.default_rng(seed)
+    work_dir = Path(tempfile.mkdtemp())
+    try:
+        csv_dir = work_dir.joinpath("csv")
+        csv_dir.mkdir()
+        _gen_records(years, revisions, rng).to_csv(csv_dir.joinpath("sh600000.csv"), index=False)
+        DumpPitData(csv_path=csv_dir, qlib_dir=work_dir, max_workers=1).dump(interval="quarterly")
+        index_path = work_dir.joinpath("financial", "sh600000", "roe_q.index")
+        data_path = work_dir.joinpath("financial", "sh600000", "roe_q.data")
+
+        dates = pd.date_range("2000-01-01", periods=years * 365, freq="D")
+        dates = dates[np.sort(rng.choice(len(dates), size=min(days, len(dates)), replace=False))]
+        cur_date_int = (dates.year * 10000 + dates.month * 100 + dates.day).values
+        periods = np.array([year * 100 + q for year in range(2000, 2000 + years) for q in range(1, 5)])
+        # every period at every observe day
+        query_periods = np.repeat(periods, len(cur_date_int))
+        query_dates = np.tile(cur_date_int, len(periods))
+
+        per_query_time, expected = _timeit(
+            lambda: np.array(
+                [
+                    read_period_data(index_path, data_path, p, d, True)[0]
+                    for p, d in zip(query_periods.tolist(), query_dates.tolist())
+                ]
+            ),
+            repeat,
+        )
+        batch_time, res = _timeit(
+            lambda: read_period_data_batch(index_path, data_path, query_periods, query_dates, True)[0], repeat
+        )
+    finally:
+        shutil.rmtree(work_dir)
+
+    result = pd.DataFrame(
+        [
+            {
+                "queries": len(query_periods),
+                "per_query(ms)": per_query_time * 1000,
+                "batch(ms)": batch_time * 1000,
+                "speedup": per_query_time / batch_time,
+                "equal": np.array_equal(res, expected, equal_nan=True),
+            }
+        ]
+    )
+    logger.info(f"years={years}, revisions={revisions}, days={days}, repeat={repeat}\n{result.to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Benchmark of the processing of `DataHandlerLP`: `ProcessorPipeline` against copying the data of each stage and calling
+the processors one by one.
+
+Usage:
+    python benchmark_processor_pipeline.py --n_dates 2000 --n_insts 300 --n_features 158
+"""
+import copy
+import time
+import tracemalloc
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from qlib.data.dataset.handler import DataHandler, DataHandlerLP
+from qlib.data.dataset.processor import CSZScoreNorm, DropnaLabel, Fillna, ProcessInf, RobustZScoreNorm
+
+
+def _copy_and_call(handler: DataHandlerLP):
+    # the processing before `ProcessorPipeline`: each stage copies its input if any processor is not readonly
+    def _run(df, proc_l):
+        if any(not proc.readonly() for proc in proc_l):
+            df = df.copy()
+        for proc in proc_l:
+            proc.fit(df)
+            df = proc(df)
+        return df
+
+    shared_df = _run(handler._data, handler.shared_processors)
+    handler._infer = _run(shared_df, handler.infer_processors)
+    handler._learn = _run(handler._infer, handler.learn_processors)
+
+
+def benchmark(n_dates: int = 2000, n_insts: int = 300, n_features: int = 158, seed: int = 0):
+    """
+    Parameters
+    ----------
+    n_dates : int
+        the number of the dates
+    n_insts : int
+        the number of the instruments
+    n_features : int
+        the number of the features
+    seed : int
+        random seed
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2010-01-01", periods=n_dates, freq="B"), [f"SH{i:06d}" for i in range(n_insts)]],
+        names=["datetime", "instrument"],
+    )
+    columns = pd.MultiIndex.from_tuples([("feature", f"f{i}") for i in range(n_features)] + [("label", "LABEL0")])
+    values = rng.normal(size=(len(index), len(columns))).astype(np.float32)
+    values[rng.random(values.shape) < 0.01] = np.nan
+    values[rng.random(values.shape) < 0.001] = np.inf
+    data = pd.DataFrame(values, index=index, columns=columns)
+    fit_end = index[len(index) // 2][0]
+    # the processors of Alpha158 with `ProcessInf` and the robust normalization of the features
+    handler = DataHandlerLP(
+        data_loader={"class": "StaticDataLoader", "kwargs": {"config": data}},
+        infer_processors=[
+            ProcessInf(),
+            RobustZScoreNorm(index[0][0], fit_end, fields_group="feature", clip_outlier=True),
+            Fillna(fields_group="feature"),
+        ],
+        learn_processors=[DropnaLabel(), CSZScoreNorm(fields_group="label")],
+        process_type=DataHandlerLP.PTYPE_A,
+        init_data=False,
+    )
+    # load the raw data only
+    DataHandler.setup_data(handler)
+    infer_processors, learn_processors = handler.infer_processors, handler.learn_processors
+
+    result = []
+    outputs = []
+    for name, func in [
+        ("copy & call", _copy_and_call),
+        ("pipeline", lambda hd: hd.process_data(with_fit=True)),
+    ]:
+        handler.infer_processors = copy.deepcopy(infer_processors)
+        handler.learn_processors = copy.deepcopy(learn_processors)
+        tracemalloc.start()
+        start = time.perf_counter()
+        func(handler)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result.append({"path": name, "time(s)": elapsed, "peak memory(MB)": peak / (1 << 20)})
+        outputs.append(handler._learn.values)
+        handler._infer = handler._learn = None
+    result = pd.DataFrame(result)
+    np.testing.assert_allclose(outputs[0], outputs[1], rtol=1e-5, atol=1e-5)
+    logger.info(
+        f"data={data.shape}, {data.values.nbytes / (1 << 20):.0f}MB\n{result.to_string(index=False)}\n"
+        f"steps of the pipeline:\n{handler.process_stats.to_string(index=False)}"
+    )
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Benchmark of the batches of `TSDataSampler`: the prebuilt sample indices against the per-sample indices.
+
+Usage:
+    python benchmark_ts_sampler.py --n_dates 1000 --n_insts 300 --n_features 158 --step_len 20 --batch_size 800
+"""
+import time
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from qlib.data.dataset import TSDataSampler
+
+
+def _per_sample(sampler: TSDataSampler, idx):
+    # the batch path before the sample indices are prebuilt
+    indices = np.concatenate([sampler._get_indices(*sampler._get_row_col(i)) for i in idx])
+    indices = np.nan_to_num(indices.astype(np.float64), nan=sampler.nan_idx).astype(int)
+    return sampler.data_arr[indices].reshape(-1, sampler.step_len, sampler.data_arr.shape[1])
+
+
+def benchmark(
+    n_dates: int = 1000,
+    n_insts: int = 300,
+    n_features: int = 158,
+    step_len: int = 20,
+    batch_size: int = 800,
+    fillna_type: str = "ffill+bfill",
+    missing_ratio: float = 0.05,
+    seed: int = 0,
+):
+    """
+    Parameters
+    ----------
+    n_dates : int
+        the number of the dates
+    n_insts : int
+        the number of the instruments
+    n_features : int
+        the number of the features (including the label)
+    step_len : int
+        the length of the time-series of each sample
+    batch_size : int
+        the number of the samples of each batch
+    fillna_type : str
+        "none"/"ffill"/"ffill+bfill"
+    missing_ratio : float
+        the ratio of the missing <datetime, instrument> pairs
+    seed : int
+        random seed
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product(
+        [pd.date_range("2010-01-01", periods=n_dates, freq="B"), [f"SH{i:06d}" for i in range(n_insts)]],
+        names=["datetime", "instrument"],
+    )
+    data = pd.DataFrame(rng.normal(size=(len(index), n_features)).astype(np.float32), index=index)
+    data = data[rng.random(len(data)) >= missing_ratio]
+
+    start = time.perf_counter()
+    sampler = TSDataSampler(data, index[0][0], index[-1][0], step_len=step_len, fillna_type=fillna_type)
+    init_time = time.perf_counter() - start
+    start = time.perf_counter()
+    sampler.build_sample_indices()
+    build_time = time.perf_counter() - start
+
+    batches = np.array_split(rng.permutation(len(sampler)), max(len(sampler) // batch_size, 1))
+    result = []
+    for name, func in [("per sample", lambda idx: _per_sample(sampler, idx)), ("prebuilt", lambda idx: sampler[idx])]:
+        start = time.perf_counter()
+        for idx in batches:
+            func(idx)
+        elapsed = time.perf_counter() - start
+        result.append(
+            {
+                "path": name,
+                "epoch(s)": elapsed,
+                "batch(ms)": elapsed / len(batches) * 1000,
+                "samples/s": len(sampler) / elapsed,
+            }
+        )
+    result = pd.DataFrame(result)
+    result["speedup"] = result["epoch(s)"].iloc[0] / result["epoch(s)"]
+    np.testing.assert_array_equal(_per_sample(sampler, batches[0]), sampler[batches[0]])
+    logger.info(
+        f"samples={len(sampler)}, step_len={step_len}, batch_size={batch_size}, init={init_time:.2f}s, "
+        f"build indices={build_time:.2f}s\n{result.to_string(index=False)}"
+    )
+
+
+if __name__ == "__main__":
+    fire.Fire(benchmark)
@@ -15,6 +15,7 @@ import pandas as pd
 from tqdm import tqdm
 from loguru import logger
 from qlib.utils import fname_to_code, code_to_fname
+from qlib.data.storage.file_storage import BundleFeatureStorage
 
 
 class DumpDataBase:
@@ -235,6 +236,9 @@ class DumpDataBase:
             else:
                 # append; self._mode == self.ALL_MODE or not bin_path.exists()
                 np.hstack([date_index, _df[field]]).astype("<f").tofile(str(bin_path.resolve()))
+        # keep the existing bundle consistent with the `.bin` files
+        if features_dir.joinpath(f"{self.freq}{BundleFeatureStorage.BUNDLE_SUFFIX}").exists():
+            DumpBundle.bundle_instrument(features_dir, self.freq)
 
     def _dump_bin(self, file_or_data: [Path, pd.DataFrame], calendar_list: List[pd.Timestamp]):
         if not calendar_list:
@@ -503,5 +507,94 @@ class DumpDataUpdate(DumpDataBase):
         self.save_instruments(df.reset_index())
 
 
+class DumpBundle:
+    FEATURES_DIR_NAME = "features"
+    DUMP_FILE_SUFFIX = ".bin"
+
+    def __init__(
+        self,
+        qlib_dir: str,
+        freq: str = "day",
+        max_workers: int = 16,
+        exclude_fields: str = "",
+        include_fields: str = "",
+    ):
+        """convert the `<field>.<freq>.bin` files of each instrument into a columnar bundle `<freq>.bundle`,
+        which can be read by `qlib.data.storage.file_storage.BundleFeatureStorage`
+
+        The `.bin` files are kept, `dump_update`/`dump_fix` will regenerate the existing bundles after the `.bin` files are updated.
+
+        Parameters
+        ----------
+        qlib_dir: str
+            qlib(dump) data director
+        freq: str, default "day"
+            transaction frequency
+        max_workers: int, default None
+            number of processes
+        include_fields: tuple
+            bundled fields
+        exclude_fields: tuple
+            fields not bundled
+
+        Examples
+        ---------
+            $ python dump_bin.py dump_bundle --qlib_dir ~/.qlib/qlib_data/cn_data --include_fields open,close,high,low,volume,factor
+        """
+        if isinstance(exclude_fields, str):
+            exclude_fields = exclude_fields.split(",")
+        if isinstance(include_fields, str):
+            include_fields = include_fields.split(",")
+        self._exclude_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, exclude_fields)))
+        self._include_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, include_fields)))
+        self.qlib_dir = Path(qlib_dir).expanduser()
+        self.freq = freq
+        self.works = max_workers
+        self._features_dir = self.qlib_dir.joinpath(self.FEATURES_DIR_NAME)
+
+    @classmethod
+    def bundle_instrument(
+        cls, features_dir: Path, freq: str, include_fields: Iterable[str] = (), exclude_fields: Iterable[str] = ()
+    ):
+        """bundle the `.bin` files in `features_dir` (the directory of one instrument)
+
+        If the bundle already exists, the fields of the existing bundle are regenerated.
+        """
+        bundle_path = features_dir.joinpath(f"{freq}{BundleFeatureStorage.BUNDLE_SUFFIX}")
+        suffix = f".{freq}{cls.DUMP_FILE_SUFFIX}"
+        bin_files = {p.name[: -len(suffix)]: p for p in features_dir.glob(f"*{suffix}")}
+        if include_fields:
+            fields = [f.lower() for f in include_fields if f.lower() in bin_files]
+        elif bundle_path.exists():
+            fields = [f for f in BundleFeatureStorage.read_bundle(bundle_path) if f in bin_files]
+        else:
+            fields = sorted(set(bin_files) - set(f.lower() for f in exclude_fields))
+        if not fields:
+            return
+        data = {}
+        for field in fields:
+            _data = np.fromfile(bin_files[field], dtype="<f")
+            if len(_data) > 0:
+                data[field] = int(_data[0]), _data[1:]
+        BundleFeatureStorage.write_bundle(bundle_path, data)
+
+    def _bundle(self, features_dir: Path):
+        self.bundle_instrument(features_dir, self.freq, self._include_fields, self._exclude_fields)
+
+    def dump(self):
+        logger.info("start dump bundles......")
+        features_dir_list = sorted(filter(Path.is_dir, self._features_dir.iterdir()))
+        with tqdm(total=len(features_dir_list)) as p_bar:
+            with ProcessPoolExecutor(max_workers=self.works) as executor:
+                for _ in executor.map(self._bundle, features_dir_list):
+                    p_bar.update()
+        logger.info("end of bundles dump.\n")
+
+    def __call__(self, *args, **kwargs):
+        self.dump()
+
+
 if __name__ == "__main__":
-    fire.Fire({"dump_all": DumpDataAll, "dump_fix": DumpDataFix, "dump_update": DumpDataUpdate})
+    fire.Fire(
+        {"dump_all": DumpDataAll, "dump_fix": DumpDataFix, "dump_update": DumpDataUpdate, "dump_bundle": DumpBundle}
+    )
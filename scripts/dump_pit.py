@@ -20,7 +20,7 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 from loguru import logger
-from qlib.utils import fname_to_code, code_to_fname, get_period_offset
+from qlib.utils import fname_to_code, code_to_fname, get_period_offset, read_period_data_batch
 from qlib.config import C
 
 
@@ -45,6 +45,8 @@ class DumpPitData:
     )
 
     NA_INDEX = C.pit_record_nan["index"]
+    # later than any date; it is used to query the last revision
+    MAX_DATE = 99991231
 
     INDEX_DTYPE_SIZE = struct.calcsize(INDEX_DTYPE)
     PERIOD_DTYPE_SIZE = struct.calcsize(PERIOD_DTYPE)
@@ -236,31 +238,33 @@ class DumpPitData:
                 with open(data_file, "wb+" if overwrite else "ab+"):
                     pass
 
+            # the last revision of each period, which the new revision is linked to
+            periods = df_sub[self.period_column_name].unique()
+            _, last_index = read_period_data_batch(
+                index_file, data_file, periods, self.MAX_DATE, interval == self.INTERVAL_quarterly
+            )
+            last_index = dict(zip(periods.tolist(), last_index.tolist()))
+
             with open(data_file, "rb+") as fd, open(index_file, "rb+") as fi:
+                # append the data
+                fd.seek(0, 2)
 
                 # update index if needed
                 for i, row in df_sub.iterrows():
-                    # get index
-                    offset = get_period_offset(first_year, row.period, interval == self.INTERVAL_quarterly)
-
-                    fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
-                    (cur_index,) = struct.unpack(self.INDEX_DTYPE, fi.read(self.INDEX_DTYPE_SIZE))
+                    _cur_fd = fd.tell()
+                    prev_index = last_index.get(row.period, self.NA_INDEX)
 
-                    # Case I: new data => update `_next` with current index
-                    if cur_index == self.NA_INDEX:
+                    # Case I: new data => update the index with current index
+                    if prev_index == self.NA_INDEX:
+                        offset = get_period_offset(first_year, row.period, interval == self.INTERVAL_quarterly)
                         fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
-                        fi.write(struct.pack(self.INDEX_DTYPE, fd.tell()))
-                    # Case II: previous data exists => find and update the last `_next`
+                        fi.write(struct.pack(self.INDEX_DTYPE, _cur_fd))
+                    # Case II: previous data exists => update the `_next` of the last revision
                     else:
-                        _cur_fd = fd.tell()
-                        prev_index = self.NA_INDEX
-                        while cur_index != self.NA_INDEX:  # NOTE: first iter always != NA_INDEX
-                            fd.seek(cur_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE)
-                            prev_index = cur_index
-                            (cur_index,) = struct.unpack(self.INDEX_DTYPE, fd.read(self.INDEX_DTYPE_SIZE))
                         fd.seek(prev_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE)
                         fd.write(struct.pack(self.INDEX_DTYPE, _cur_fd))  # NOTE: add _next pointer
                         fd.seek(_cur_fd)
+                    last_index[row.period] = _cur_fd
 
                     # dump data
                     fd.write(struct.pack(self.DATA_DTYPE, row.date, row.period, row.value, self.NA_INDEX))
@@ -2,10 +2,14 @@
 # Licensed under the MIT License.
 
 import unittest
+from unittest import mock
 import numpy as np
+import pandas as pd
 from qlib.data import D
 from qlib.tests import TestAutoData
-from qlib.data.dataset.processor import MinMaxNorm, ZScoreNorm, CSZScoreNorm, CSZFillna
+from qlib.data.dataset.processor import MinMaxNorm, ZScoreNorm, CSZScoreNorm, CSZFillna, CSRankNorm, CSInTopK
+from qlib.data.dataset.cross_section import CSBlocks
+from qlib.utils.data import robust_zscore, zscore
 
 
 class TestProcessor(TestAutoData):
@@ -70,6 +74,54 @@ class TestProcessor(TestAutoData):
         # taking the 2nd group of data from the original data, to calculate and compare.
         assert (df[2:4] == ((origin_df[2:4] - origin_df[2:4].mean()).div(origin_df[2:4].std()))).all().all()
 
+    @staticmethod
+    def _cs_data(dtype=np.float32):
+        rng = np.random.default_rng(0)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=20), [f"SH{i:06d}" for i in range(30)]],
+            names=["datetime", "instrument"],
+        )
+        columns = pd.MultiIndex.from_product([["feature"], ["a", "b", "c"]]).append(
+            pd.MultiIndex.from_tuples([("label", "y")])
+        )
+        values = rng.normal(size=(len(index), len(columns))).round(1).astype(dtype)  # ties
+        values[rng.random(values.shape) < 0.1] = np.nan
+        values[index.get_level_values("datetime") == "2020-01-05", 0] = np.nan  # a column without any value
+        # the instruments are not on all the dates
+        return pd.DataFrame(values, index=index, columns=columns).sample(frac=0.9, random_state=0).sort_index()
+
+    def test_cs_processors(self):
+        for df in [self._cs_data(), self._cs_data(np.float64), self._cs_data().swaplevel()]:
+            for chunk_size in [CSBlocks.CHUNK_SIZE, 100]:
+                with mock.patch.object(CSBlocks, "CHUNK_SIZE", chunk_size):
+                    self._check_cs_processors(df)
+
+    def _check_cs_processors(self, df):
+        group = lambda x: x.groupby("datetime", group_keys=False)
+        ref = df.copy()
+        ref["feature"] = group(ref["feature"]).apply(zscore)
+        res = CSZScoreNorm(fields_group="feature")(df.copy())
+        pd.testing.assert_frame_equal(res, ref, rtol=1e-5, atol=1e-5)
+
+        ref = df.copy()
+        ref["feature"] = group(ref["feature"]).apply(robust_zscore)
+        res = CSZScoreNorm(fields_group="feature", method="robust")(df.copy())
+        pd.testing.assert_frame_equal(res, ref, rtol=1e-5, atol=1e-5)
+
+        ref = df.copy()
+        ref[ref.columns] = (group(ref).rank(pct=True) - 0.5) * 3.46
+        pd.testing.assert_frame_equal(CSRankNorm()(df.copy()), ref, rtol=1e-5, atol=1e-6, check_dtype=False)
+
+        ref = df.copy()
+        ref[ref.columns] = group(ref).apply(lambda x: x.fillna(x.mean()))
+        pd.testing.assert_frame_equal(CSZFillna()(df.copy()), ref, rtol=1e-5, atol=1e-6)
+
+        res = CSInTopK(fields_group="feature", topk=5)(df.copy())
+        rank = group(df[("feature", "c")]).rank(ascending=False, method="first")
+        for col in res["feature"]:
+            pd.testing.assert_series_equal(res[("feature", col)], (rank <= 5).astype(df.dtypes[0]), check_names=False)
+        pd.testing.assert_series_equal(res[("label", "y")], df[("label", "y")])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,179 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import copy
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.data.dataset.handler import DataHandlerLP
+from qlib.data.dataset.pipeline import ProcessorPipeline, shares_memory
+from qlib.data.dataset.processor import (
+    CSRankNorm,
+    CSZFillna,
+    CSZScoreNorm,
+    DropnaLabel,
+    Fillna,
+    MinMaxNorm,
+    ProcessInf,
+    RobustZScoreNorm,
+    ZScoreNorm,
+)
+
+
+class TestProcessorPipeline(unittest.TestCase):
+    FIT_START, FIT_END = "2020-01-01", "2020-01-30"
+
+    @staticmethod
+    def _data(n_dates=50, n_insts=30, seed=0):
+        rng = np.random.default_rng(seed)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=n_dates), [f"SH{i:06d}" for i in range(n_insts)]],
+            names=["datetime", "instrument"],
+        )
+        columns = pd.MultiIndex.from_tuples([("feature", f"f{i}") for i in range(6)] + [("label", "LABEL0")])
+        values = rng.normal(size=(len(index), len(columns))).astype(np.float32)
+        values[rng.random(values.shape) < 0.05] = np.nan
+        values[rng.random(values.shape) < 0.02] = np.inf
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    @staticmethod
+    def _call(df, proc_l, with_fit=True):
+        # call the processors one by one
+        df = df.copy()
+        for proc in proc_l:
+            if with_fit:
+                proc.fit(df)
+            df = proc(df)
+        return df
+
+    def assert_frame_close(self, res, expected):
+        self.assertTrue(res.index.equals(expected.index))
+        self.assertTrue(res.columns.equals(expected.columns))
+        np.testing.assert_allclose(res.values, expected.values.astype(res.values.dtype), rtol=1e-5, atol=1e-5)
+
+    def test_fused(self):
+        data = self._data()
+        raw = data.copy()
+        proc_l = [
+            ProcessInf(),
+            ZScoreNorm(self.FIT_START, self.FIT_END, fields_group="feature"),
+            RobustZScoreNorm(self.FIT_START, self.FIT_END, fields_group="feature"),
+            Fillna(fields_group="feature"),
+            CSZScoreNorm(fields_group="label"),
+            CSRankNorm(fields_group="feature"),
+            CSZFillna(fields_group="label"),
+            MinMaxNorm(self.FIT_START, self.FIT_END, fields_group="feature"),
+        ]
+        expected = self._call(data, copy.deepcopy(proc_l))
+
+        pipeline = ProcessorPipeline(proc_l, trace_memory=True)
+        self.assert_frame_close(pipeline.run(data, with_fit=True, keep=[data]), expected)
+        self.assertTrue(data.equals(raw))
+        steps = pd.DataFrame(pipeline.stats)
+        # the processors without fitting are fused with the previous ones
+        self.assertListEqual(
+            steps["step"].tolist(),
+            [
+                "ProcessInf",
+                "ZScoreNorm.fit",
+                "ZScoreNorm",
+                "RobustZScoreNorm.fit",
+                "RobustZScoreNorm+Fillna+CSZScoreNorm+CSRankNorm+CSZFillna",
+                "MinMaxNorm.fit",
+                "MinMaxNorm",
+            ],
+        )
+        # the data is copied once before it is written
+        self.assertListEqual(steps["copy"].tolist(), ["full"] + [""] * 6)
+        self.assertTrue((steps["peak_memory"] > 0).all())
+
+        # all the processors are fused without fitting
+        pipeline = ProcessorPipeline(proc_l)
+        self.assert_frame_close(pipeline.run(data, keep=[data]), self._call(data, proc_l, with_fit=False))
+        self.assertEqual(len(pipeline.stats), 1)
+
+    def test_handler(self):
+        data = self._data()
+        raw = data.copy()
+        infer_processors = [ProcessInf(), ZScoreNorm(self.FIT_START, self.FIT_END, "feature"), Fillna("feature")]
+        for process_type in [DataHandlerLP.PTYPE_A, DataHandlerLP.PTYPE_I]:
+            for learn_processors in [[DropnaLabel(), CSZScoreNorm("label")], [CSZScoreNorm("label")]]:
+                handler = DataHandlerLP(
+                    data_loader={"class": "StaticDataLoader", "kwargs": {"config": data}},
+                    infer_processors=copy.deepcopy(infer_processors),
+                    learn_processors=copy.deepcopy(learn_processors),
+                    process_type=process_type,
+                )
+                self.assertTrue(handler._data.equals(raw))
+                infer = self._call(raw, copy.deepcopy(infer_processors))
+                self.assert_frame_close(handler._infer, infer)
+                learn_input = infer if process_type == DataHandlerLP.PTYPE_A else raw
+                self.assert_frame_close(handler._learn, self._call(learn_input, copy.deepcopy(learn_processors)))
+
+                copies = handler.process_stats.set_index(["stage", "step"])["copy"]
+                self.assertEqual(copies["infer", "ProcessInf"], "full")
+                if isinstance(learn_processors[0], DropnaLabel):
+                    # the rows filtered by `DropnaLabel` are not shared with the data for inference
+                    self.assertEqual(copies["learn", "CSZScoreNorm"], "")
+                else:
+                    # the data for inference or the raw data is kept
+                    self.assertEqual(copies["learn", "CSZScoreNorm"], "full")
+                self.assertFalse(shares_memory(handler._learn, [handler._infer, handler._data]))
+
+    def test_fit_cache(self):
+        data = self._data()
+        cache_dir = tempfile.mkdtemp()
+
+        def _handler(data, **kwargs):
+            return DataHandlerLP(
+                data_loader={"class": "StaticDataLoader", "kwargs": {"config": data}},
+                infer_processors=[
+                    ProcessInf(),
+                    RobustZScoreNorm(self.FIT_START, self.FIT_END, "feature"),
+                    Fillna("feature"),
+                    MinMaxNorm(self.FIT_START, self.FIT_END, "feature"),
+                ],
+                learn_processors=[DropnaLabel(), CSZScoreNorm("label")],
+                **kwargs,
+            )
+
+        def _fit_cache(handler):
+            steps = handler.process_stats
+            return steps.loc[steps["step"].str.endswith(".fit"), "fit_cache"].tolist()
+
+        C["processor_fit_cache_dir"] = cache_dir
+        try:
+            expected = _handler(data)
+            self.assertListEqual(_fit_cache(expected), ["miss", "miss"])
+            self.assertEqual(len(list(Path(cache_dir).iterdir())), 2)
+            # the data out of the fit range is different
+            with mock.patch.object(RobustZScoreNorm, "fit", side_effect=AssertionError("fitted again")):
+                handler = _handler(data.loc[:"2020-02-10"].copy())
+            self.assertListEqual(_fit_cache(handler), ["hit", "hit"])
+            self.assert_frame_close(handler._infer, expected._infer.loc[:"2020-02-10"])
+            self.assertListEqual(handler.infer_processors[1].cols.tolist(), expected.infer_processors[1].cols.tolist())
+            # the processors fitted independently on the raw data are cached separately
+            handler = _handler(data, init_data=False)
+            handler.setup_data(init_type=DataHandlerLP.IT_FIT_IND)
+            with mock.patch.object(MinMaxNorm, "fit", side_effect=AssertionError("fitted again")):
+                handler.setup_data(init_type=DataHandlerLP.IT_FIT_IND)
+            self.assertEqual(len(list(Path(cache_dir).iterdir())), 4)
+
+            # the data in the fit range is different
+            changed = data.copy()
+            changed.iloc[0, 0] += 1
+            self.assertListEqual(_fit_cache(_handler(changed)), ["miss", "miss"])
+        finally:
+            C["processor_fit_cache_dir"] = None
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
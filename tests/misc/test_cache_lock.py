@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import shutil
+import tempfile
+import time
+import unittest
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+import qlib
+from qlib.config import C, REG_CN
+from qlib.data import D
+from qlib.data.cache import CacheUtils, fcntl
+from qlib.tests import TestAutoData
+
+
+def _hold_writer_lock(lock_name, entered, seconds):
+    with CacheUtils.writer_lock(None, lock_name):
+        entered.set()
+        time.sleep(seconds)
+
+
+@unittest.skipIf(fcntl is None, "fcntl is not available")
+class TestFileLock(unittest.TestCase):
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+        self._config = {k: C.get(k) for k in ["cache_lock_backend", "cache_lock_dir"]}
+        C["cache_lock_backend"] = "file"
+        C["cache_lock_dir"] = self.lock_dir
+
+    def tearDown(self):
+        C.update(self._config)
+        shutil.rmtree(self.lock_dir)
+
+    def _start_writer(self, lock_name, seconds):
+        ctx = multiprocessing.get_context("fork")
+        entered = ctx.Event()
+        proc = ctx.Process(target=_hold_writer_lock, args=(lock_name, entered, seconds))
+        proc.start()
+        self.assertTrue(entered.wait(10))
+        return proc
+
+    def test_writer_excludes_reader(self):
+        proc = self._start_writer("dataset-a", 1)
+        start = time.time()
+        with CacheUtils.reader_lock(None, "dataset-a"):
+            self.assertGreater(time.time() - start, 0.5)
+        proc.join()
+        # other locks are not affected
+        proc = self._start_writer("dataset-a", 1)
+        start = time.time()
+        with CacheUtils.writer_lock(None, "dataset-b"):
+            self.assertLess(time.time() - start, 0.5)
+        proc.join()
+
+    def test_shared_readers(self):
+        with CacheUtils.reader_lock(None, "dataset-a"):
+            with CacheUtils.reader_lock(None, "dataset-a"):
+                pass
+        CacheUtils.reset_lock()
+        self.assertListEqual(list(Path(self.lock_dir).glob("*.lock")), [])
+
+
+@unittest.skipIf(fcntl is None, "fcntl is not available")
+class TestDiskCacheFileLock(TestAutoData):
+    FIELDS = ["$close", "Mean($close, 5) / $close"]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.lock_dir = tempfile.mkdtemp()
+        qlib.init(
+            provider_uri=cls.provider_uri,
+            region=REG_CN,
+            expression_cache="DiskExpressionCache",
+            dataset_cache="DiskDatasetCache",
+            cache_lock_backend="file",
+            cache_lock_dir=cls.lock_dir,
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        for dir_name in [C.dataset_cache_dir_name, C.features_cache_dir_name]:
+            shutil.rmtree(Path(C.dpm.get_data_uri()).joinpath(dir_name), ignore_errors=True)
+        shutil.rmtree(cls.lock_dir)
+
+    def test_disk_cache(self):
+        # the disk caches are not disabled without redis
+        self.assertEqual(C.dataset_cache, "DiskDatasetCache")
+        instruments = ["SH600519", "SZ300677"]
+        expected = D.features(instruments, self.FIELDS, "2018-01-01", "2018-12-31", disk_cache=0)
+        for _ in range(2):
+            # generate the cache and then read it
+            data = D.features(instruments, self.FIELDS, "2018-01-01", "2018-12-31", disk_cache=1)
+            self.assertTrue(data.index.equals(expected.index))
+            np.testing.assert_allclose(data.values, expected.values)
+        self.assertGreater(len(list(Path(self.lock_dir).glob("*.lock"))), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import bisect
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.data import Cal
+from qlib.tests import TestAutoData
+
+
+class TestCalendar(TestAutoData):
+    def setUp(self):
+        self._cache_dir = C.get("calendar_cache_dir")
+        C["calendar_cache_dir"] = tempfile.mkdtemp()
+        H["c"].clear()
+
+    def tearDown(self):
+        shutil.rmtree(C["calendar_cache_dir"])
+        C["calendar_cache_dir"] = self._cache_dir
+        H["c"].clear()
+
+    def test_calendar_array(self):
+        calendar = Cal.calendar_array(freq="day")
+        self.assertEqual(calendar.dtype, np.dtype("datetime64[ns]"))
+        self.assertIsInstance(calendar, np.memmap)
+        self.assertEqual(len(list(Cal.get_calendar_cache_dir().glob("*.npy"))), 1)
+        # the dumped calendar is reused
+        H["c"].clear()
+        np.testing.assert_array_equal(Cal.calendar_array(freq="day"), calendar)
+        self.assertEqual(len(list(Cal.get_calendar_cache_dir().glob("*.npy"))), 1)
+
+        timestamps = D.calendar(start_time="2018-01-01", end_time="2018-12-31")
+        self.assertIsInstance(timestamps[0], pd.Timestamp)
+        expected = pd.DatetimeIndex(calendar)
+        expected = expected[(expected >= "2018-01-01") & (expected <= "2018-12-31")]
+        self.assertTrue(pd.DatetimeIndex(timestamps).equals(expected))
+
+    def test_locate_index(self):
+        calendar = list(D.calendar())
+        for start_time, end_time in [
+            ("2018-01-01", "2018-12-31"),
+            (calendar[100], calendar[200]),
+            ("2000-01-01", calendar[-1] + pd.Timedelta(days=10)),
+            (calendar[5] + pd.Timedelta(hours=1), calendar[5] + pd.Timedelta(hours=1)),
+        ]:
+            start_time, end_time = pd.Timestamp(start_time), pd.Timestamp(end_time)
+            si = bisect.bisect_left(calendar, start_time)
+            ei = bisect.bisect_right(calendar, end_time) - 1
+            self.assertTupleEqual(Cal.locate_index(start_time, end_time, "day"), (calendar[si], calendar[ei], si, ei))
+        with self.assertRaises(IndexError):
+            Cal.locate_index(calendar[-1] + pd.Timedelta(days=1), calendar[-1] + pd.Timedelta(days=2), "day")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import io
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from qlib.data import D
+from qlib.data.client import ArrowClient, LocalFeatureClient
+from qlib.data.data import ClientCalendarProvider, ClientDatasetProvider, ClientInstrumentProvider
+from qlib.data.protocol import recv_message, send_message
+from qlib.data.server import FeatureServer, LocalFeatureServer
+from qlib.tests import TestAutoData
+
+
+class TestArrowClient(TestAutoData):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.server = FeatureServer(("127.0.0.1", 0))
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def _client(self, **kwargs):
+        client = ArrowClient(*self.server.server_address, **kwargs)
+        self.addCleanup(client.disconnect)
+        return client
+
+    def test_providers(self):
+        client = self._client()
+        cal = ClientCalendarProvider()
+        cal.set_conn(client)
+        self.assertListEqual(cal.calendar("2018-01-01", "2018-12-31"), list(D.calendar("2018-01-01", "2018-12-31")))
+
+        inst = ClientInstrumentProvider()
+        inst.set_conn(client)
+        instruments = D.instruments("csi300")
+        self.assertDictEqual(
+            inst.list_instruments(instruments, "2018-01-01", "2018-12-31"),
+            D.list_instruments(instruments, "2018-01-01", "2018-12-31"),
+        )
+
+        dataset = ClientDatasetProvider()
+        dataset.set_conn(client)
+        fields = ["$close", "Ref($close, 1) / $close"]
+        pd.testing.assert_frame_equal(
+            dataset.dataset(instruments, fields, "2018-01-01", "2018-12-31"),
+            D.features(instruments, fields, "2018-01-01", "2018-12-31"),
+        )
+
+    def test_batch(self):
+        requests = [
+            {"instruments": D.instruments("csi300"), "fields": ["$close"], "start_time": "2018-01-01"},
+            {"instruments": ["SH600000"], "fields": ["$open", "$volume"], "end_time": "2010-12-31"},
+            {"instruments": ["SH600000"], "fields": ["$open"], "start_time": "2030-01-01"},
+        ]
+        for compression in [None, "zstd", "lz4"]:
+            client = self._client(compression=compression, pool_size=1)
+            for res, req in zip(client.features_batch(requests), requests):
+                pd.testing.assert_frame_equal(res, D.features(**req), check_index_type=len(res) > 0)
+            # the connection is reused
+            self.assertEqual(client._pool.qsize(), 1)
+            client.features_batch(requests[:1])
+            self.assertEqual(client._pool.qsize(), 1)
+
+    def test_error(self):
+        client = self._client()
+        with self.assertRaises(ValueError):
+            client.request("feature", {"instruments": ["SH600000"], "fields": ["Unknown($close)"]})
+        # the connection still works after the error
+        self.assertEqual(
+            client.request("calendar", {"start_time": "2018-01-01", "end_time": "2018-01-05"})[0].year, 2018
+        )
+
+        msg_queue = queue.Queue()
+        client.send_request("unknown", {}, msg_queue)
+        self.assertIsInstance(msg_queue.get(), ValueError)
+
+    def test_head(self):
+        buf = io.BytesIO()
+        send_message(buf, {"time": pd.Timestamp("2018-01-02"), "spans": [("SH600000", np.int64(1))]})
+        buf.seek(0)
+        head, data = recv_message(buf)
+        self.assertDictEqual(head, {"time": pd.Timestamp("2018-01-02"), "spans": [["SH600000", 1]]})
+        self.assertIsNone(data)
+        # the head is encoded in JSON instead of being pickled
+        with self.assertRaises(TypeError):
+            send_message(io.BytesIO(), {"body": object()})
+
+
+class CountingProvider:
+    def __init__(self):
+        self.n_features = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(D, name)
+
+    def features(self, *args, **kwargs):
+        with self._lock:
+            self.n_features += 1
+        return D.features(*args, **kwargs)
+
+
+class TestLocalFeatureServer(TestAutoData):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.provider = CountingProvider()
+        self.server = LocalFeatureServer(
+            os.path.join(self.work_dir, "qlib.sock"), provider=self.provider, shm_dir=self.work_dir
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = LocalFeatureClient(self.server.server_address)
+
+    def tearDown(self):
+        self.client.disconnect()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.work_dir)
+
+    def test_shared_features(self):
+        request = {"instruments": D.instruments("csi300"), "fields": ["$close", "$volume"], "start_time": "2018-01-01"}
+        expected = D.features(**request)
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda _: self.client.features_batch([request])[0], range(8)))
+        # the features are computed once
+        self.assertEqual(self.provider.n_features, 1)
+        for res in results:
+            pd.testing.assert_frame_equal(res, expected)
+        # the features are mapped copy-on-write, the modifications are not seen by the other clients
+        results[0].iloc[0, 0] = 0.0
+        self.assertEqual(results[0].iloc[0, 0], 0.0)
+        pd.testing.assert_frame_equal(self.client.features_batch([request])[0], expected)
+
+        self.assertListEqual(
+            self.client.request("calendar", {"start_time": "2018-01-01", "end_time": "2018-12-31"}),
+            list(D.calendar("2018-01-01", "2018-12-31")),
+        )
+        # the empty features are transferred in the stream
+        empty = self.client.features_batch([dict(request, start_time="2030-01-01")])[0]
+        self.assertEqual(len(empty), 0)
+
+    def test_evict(self):
+        self.server.cache_size = 1
+        requests = [
+            {"instruments": ["SH600000"], "fields": ["$close"]},
+            {"instruments": ["SH600000"], "fields": ["$open"]},
+        ]
+        first = self.client.features_batch(requests[:1])[0]
+        self.client.features_batch(requests[1:])
+        self.assertEqual(len(os.listdir(self.server.shm_dir)), 1)
+        # the evicted features are still available in the process which has mapped them
+        pd.testing.assert_frame_equal(first, D.features(**requests[0]))
+        self.client.features_batch(requests[:1])
+        self.assertEqual(self.provider.n_features, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
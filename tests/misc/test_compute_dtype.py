@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.contrib.data.handler import Alpha158
+from qlib.data import D
+from qlib.data.cache import H, DiskDatasetCache
+from qlib.data.data import ExpressionD
+from qlib.log import get_module_logger
+from qlib.tests import TestAutoData
+
+
+class TestComputeDtype(TestAutoData):
+    def setUp(self):
+        H["f"].clear()
+
+    def tearDown(self):
+        C["compute_dtype"] = None
+        H["f"].clear()
+
+    def _features(self, dtype, instruments, fields):
+        # the cached expressions are not distinguished by the compute dtype
+        H["f"].clear()
+        C["compute_dtype"] = dtype
+        return D.features(instruments, fields, "2018-01-01", "2019-12-31")
+
+    def test_float32(self):
+        C["compute_dtype"] = "float32"
+        series = D.features(["SH600000"], ["Corr($close, $volume, 10)", "$close > $open"], "2018-01-01", "2018-12-31")
+        self.assertListEqual(series.dtypes.tolist(), [np.dtype(np.float32)] * 2)
+        # the intermediate results of the operators keep the dtype
+        H["f"].clear()
+        ExpressionD.expression("SH600000", "Corr($close, $volume, 10) / Mean($close, 5)", "2018-01-01", "2018-12-31")
+        cached = [v for v in H["f"].od.values() if isinstance(v, pd.Series)]
+        self.assertGreater(len(cached), 0)
+        self.assertTrue(all(v.dtype == np.float32 for v in cached))
+
+        df = pd.DataFrame({"$close": np.arange(3, dtype=np.float64), "$flag": [True, False, True]})
+        self.assertListEqual(
+            DiskDatasetCache.cache_to_origin_data(df, ["$close", "$flag"]).dtypes.tolist(),
+            [np.dtype(np.float32), np.dtype(bool)],
+        )
+
+    def test_precision(self):
+        fields, names = Alpha158.parse_config_to_fields(
+            {"kbar": {}, "price": {"windows": [0], "feature": ["OPEN", "HIGH", "LOW", "VWAP"]}, "rolling": {}}
+        )
+        instruments = D.list_instruments(D.instruments("csi300"), as_list=True)[:5]
+        expected = self._features("float64", instruments, fields)
+        res = self._features("float32", instruments, fields)
+        self.assertTrue((res.dtypes == np.float32).all())
+        self.assertTrue((expected.dtypes == np.float64).all())
+        self.assertLess(res.memory_usage().sum(), expected.memory_usage().sum() * 0.6)
+
+        pd.testing.assert_frame_equal(res.isna(), expected.isna())
+        abs_err = (res.astype(np.float64) - expected).abs()
+        rel_err = abs_err / (expected.abs() + 1e-6)
+        report = pd.DataFrame({"max_abs_err": abs_err.max().values, "max_rel_err": rel_err.max().values}, index=names)
+        get_module_logger("test_compute_dtype").info(
+            f"the max deviation of float32 from float64:\n{report.sort_values('max_rel_err').tail(10)}"
+        )
+        self.assertLess(report["max_abs_err"].max(), 1e-4)
+        # the relative error is large only for the ill-conditioned values (e.g. the correlation close to 0)
+        self.assertLess(rel_err.stack().quantile(0.999), 1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.config import C, REG_CN
+from qlib.data import D
+from qlib.data.data import DatasetD
+from qlib.data.cache import DiskDatasetCache, fcntl
+from qlib.tests import TestAutoData
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+@unittest.skipIf(fcntl is None or pq is None, "fcntl or pyarrow is not available")
+class TestParquetDatasetCache(TestAutoData):
+    FIELDS = ["$close", "Mean($close, 5) / $close", "Ref($volume, 1)"]
+    INSTRUMENTS = ["SH600519", "SZ300677", "SH600110"]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.lock_dir = tempfile.mkdtemp()
+        qlib.init(
+            provider_uri=cls.provider_uri,
+            region=REG_CN,
+            expression_cache=None,
+            dataset_cache="DiskDatasetCache",
+            dataset_cache_format="parquet",
+            cache_lock_backend="file",
+            cache_lock_dir=cls.lock_dir,
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(Path(C.dpm.get_data_uri()).joinpath(C.dataset_cache_dir_name), ignore_errors=True)
+        shutil.rmtree(cls.lock_dir)
+
+    def _check(self, data, expected):
+        self.assertTrue(data.index.equals(expected.index))
+        self.assertListEqual(list(data.columns), list(expected.columns))
+        np.testing.assert_allclose(data.values, expected.values, rtol=1e-6)
+
+    def test_parquet_cache(self):
+        expected = D.features(self.INSTRUMENTS, self.FIELDS, "2017-01-01", "2020-12-31", disk_cache=0)
+        self._check(D.features(self.INSTRUMENTS, self.FIELDS, "2017-01-01", "2020-12-31", disk_cache=2), expected)
+
+        cache_paths = [
+            p for p in Path(C.dpm.get_data_uri()).joinpath(C.dataset_cache_dir_name).iterdir() if not p.suffix
+        ]
+        self.assertEqual(len(cache_paths), 1)
+        cache_path = cache_paths[0]
+        self.assertTrue(DiskDatasetCache.is_parquet_cache(cache_path))
+        self.assertGreater(pq.ParquetFile(cache_path).num_row_groups, 0)
+
+        # read the sub-ranges and the sub-fields from the cache
+        for start_time, end_time in [
+            ("2017-01-01", "2020-12-31"),
+            ("2018-03-01", "2018-06-30"),
+            ("2000-01-01", "2000-12-31"),
+        ]:
+            fields = self.FIELDS[::-1]
+            data = DiskDatasetCache.read_data_from_cache(cache_path, start_time, end_time, fields)
+            self._check(data, expected.loc(axis=0)[:, start_time:end_time][fields])
+        self._check(
+            D.features(self.INSTRUMENTS, self.FIELDS, "2018-03-01", "2018-06-30", disk_cache=1),
+            expected.loc(axis=0)[:, "2018-03-01":"2018-06-30"],
+        )
+
+    @staticmethod
+    def _truncate(cache_path, last_date):
+        """roll the cache back to the state updated at `last_date`"""
+        im = DiskDatasetCache.IndexManager(cache_path)
+        index_data = im.get_index()
+        kept_index = index_data.loc[:last_date]
+        rm_lines = index_data["end"].iloc[-1] - kept_index["end"].iloc[-1]
+        meta = pd.read_pickle(cache_path.with_suffix(".meta"))
+        if DiskDatasetCache.is_parquet_cache(cache_path):
+            data = DiskDatasetCache.read_data_from_cache(cache_path, None, None, meta["info"]["fields"])
+            DiskDatasetCache._update_parquet_cache(cache_path, data.swaplevel().iloc[:0], rm_lines)
+        else:
+            with pd.HDFStore(cache_path) as store:
+                store.remove(key=im.KEY, start=-rm_lines)
+        im.update(kept_index)
+        meta["info"]["last_update"] = str(last_date)
+        pd.to_pickle(meta, cache_path.with_suffix(".meta"))
+
+    def test_update(self):
+        fields = ["$close", "Mean($close, 5)", "Ref($close, -2)"]
+        calendar = D.calendar()
+        expected = D.features(self.INSTRUMENTS, fields, disk_cache=0)
+        cache_dir = Path(C.dpm.get_data_uri()).joinpath(C.dataset_cache_dir_name)
+        for cache_format in ["hdf", "parquet"]:
+            C["dataset_cache_format"] = cache_format
+            try:
+                D.features(self.INSTRUMENTS, fields, disk_cache=2)
+                cache_path = [p for p in cache_dir.iterdir() if not p.suffix][0]
+                self.assertEqual(DiskDatasetCache.is_parquet_cache(cache_path), cache_format == "parquet")
+                # update the cache day by day
+                for last_date in [calendar[-30], calendar[-20], calendar[-2]]:
+                    self._truncate(cache_path, last_date)
+                    self.assertEqual(DatasetD.update(cache_path.name), 0)
+                    data = DiskDatasetCache.read_data_from_cache(cache_path, None, None, fields)
+                    # the updated cache is the same as the rebuilt one
+                    self._check(data, expected)
+            finally:
+                C["dataset_cache_format"] = "parquet"
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+    def test_update_parquet_cache(self):
+        data = pd.DataFrame(
+            {"a": np.arange(6, dtype=np.float32)},
+            index=pd.MultiIndex.from_product(
+                [pd.date_range("2020-01-01", periods=3), ["SH600000", "SH600001"]], names=["datetime", "instrument"]
+            ),
+        )
+        cache_path = Path(tempfile.mkdtemp()).joinpath("cache")
+        try:
+            DiskDatasetCache._write_parquet_cache(cache_path, data.iloc[:4])
+            # the last date is replaced and the new date is appended; float64 is cast to float32
+            DiskDatasetCache._update_parquet_cache(cache_path, (data.iloc[2:] * 2).astype(np.float64), 2)
+            paths = DiskDatasetCache._parquet_paths(cache_path)
+            self.assertEqual(len(paths), 2)
+            table = pa.concat_tables([pq.read_table(path) for path in paths])
+            self.assertEqual(str(table.schema.field("a").type), "float")
+            np.testing.assert_array_equal(table.column("a").to_numpy(), [0, 1, 4, 6, 8, 10])
+        finally:
+            shutil.rmtree(cache_path.parent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import os
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.data import MmapDatasetPanel
+from qlib.tests import TestAutoData
+from qlib.utils.file import get_shm_dir
+
+
+class TestDatasetTransfer(TestAutoData):
+    FIELDS = ["$close", "Ref($close, 1) / $close", "Ref($close,1)/$close", "$close", "Mean($volume, 5)"]
+
+    def tearDown(self):
+        C["dataset_transfer"] = "pickle"
+
+    def _features(self, transfer, *args):
+        C["dataset_transfer"] = transfer
+        H["f"].clear()
+        return D.features(*args)
+
+    def _panel_files(self):
+        return [p for p in os.listdir(get_shm_dir()) if p.startswith(f"qlib_dataset_{os.getpid()}_")]
+
+    def test_transfer(self):
+        for args in [
+            (D.instruments("csi300"), self.FIELDS, "2018-01-01", "2018-12-31"),
+            # the instruments with the spans
+            ({"SH600000": [(pd.Timestamp("2018-02-01"), pd.Timestamp("2018-03-01"))]}, self.FIELDS, "2018-01-01"),
+            (["SH600000", "SZ000001", "NOT_EXIST"], self.FIELDS, "2018-01-01", "2018-03-01"),
+            (["SH600000"], self.FIELDS, "2030-01-01", "2030-03-01"),
+        ]:
+            expected = self._features("pickle", *args)
+            res = self._features("mmap", *args)
+            pd.testing.assert_frame_equal(res, expected)
+            self.assertListEqual(self._panel_files(), [])
+
+    def test_zero_copy(self):
+        args = (["SH600000", "SZ000001"], self.FIELDS, "2018-01-01", "2018-03-01")
+        res = self._features("mmap", *args)
+        pd.testing.assert_frame_equal(res, self._features("pickle", *args))
+        # the data of all the instruments covers the calendar, so the dataset is built on the mapped panel
+        base = res._mgr.blocks[0].values
+        while base is not None and not isinstance(base, np.memmap):
+            base = base.base
+        self.assertIsInstance(base, np.memmap)
+
+    def test_write(self):
+        panel = MmapDatasetPanel.create(["a", "b"], ["x", "y"], "2018-01-01", "2018-01-31", "day", np.float32)
+        try:
+            calendar = D.calendar("2018-01-01", "2018-01-31")
+            data = pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}, index=pd.DatetimeIndex(calendar[[2, 5]]))
+            pos = panel.write(1, data)
+            np.testing.assert_array_equal(pos, [2, 5])
+            pd.testing.assert_frame_equal(panel.read(1, pos), data.rename_axis("datetime").astype(np.float32))
+            # the dates out of the calendar can't be written
+            self.assertIsNone(panel.write(0, data.set_axis(data.index + pd.Timedelta(hours=1))))
+        finally:
+            panel.close()
+
+    def test_no_space(self):
+        args = (["SH600000", "SZ000001"], self.FIELDS, "2018-01-01", "2018-03-01")
+        stat = os.statvfs(get_shm_dir())
+        with mock.patch("qlib.data.data.os.statvfs", return_value=mock.Mock(f_bavail=0, f_frsize=stat.f_frsize)):
+            self.assertIsNone(MmapDatasetPanel.create(["a"], ["x"], "2018-01-01", "2018-01-31", "day", np.float32))
+            # fall back to pickle
+            res = self._features("mmap", *args)
+        pd.testing.assert_frame_equal(res, self._features("pickle", *args))
+        self.assertListEqual(self._panel_files(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
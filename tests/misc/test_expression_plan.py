@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+
+from qlib.data.cache import H
+from qlib.data.data import DatasetProvider
+from qlib.tests import TestAutoData
+
+
+class TestExpressionPlan(TestAutoData):
+    FIELDS = [
+        "$close",
+        "Ref($close, 1) / $close",
+        "Mean($close, 5) / $close",
+        "Std($close, 5) / $close",
+        "Corr($close, Log($volume + 1), 5)",
+        "ChangeInstrument('SH600519', $close) / $close",
+    ]
+
+    def test_plan_stats(self):
+        plan = DatasetProvider.get_expression_plan(self.FIELDS, "2018-01-01", "2018-12-31", "day")
+        stats = plan.stats
+        self.assertEqual(stats["fields"], len(self.FIELDS))
+        self.assertEqual(stats["nodes"], 21)
+        self.assertEqual(stats["unique"], 15)
+        # $close is loaded with 3 ranges ([s, e], [s-1, e] and [s-4, e]), each of them is shared;
+        # the $close inside ChangeInstrument is calculated by ChangeInstrument itself
+        self.assertEqual(stats["shared"], 3)
+        self.assertEqual(plan.feature_range["$close"], plan.feature_range["$volume"])
+
+    def test_plan_execute(self):
+        plan = DatasetProvider.get_expression_plan(self.FIELDS, "2018-01-01", "2018-12-31", "day")
+        for inst in ["SH600519", "SZ300677"]:
+            H["f"].clear()
+            expected = DatasetProvider.inst_calculator(inst, "2018-01-01", "2018-12-31", "day", self.FIELDS)
+            H["f"].clear()
+            data = DatasetProvider.inst_calculator(inst, "2018-01-01", "2018-12-31", "day", self.FIELDS, plan=plan)
+            self.assertTrue(data.index.equals(expected.index))
+            np.testing.assert_array_equal(data.values, expected.values)
+
+            # the intermediate results are released and the fields are kept
+            keys = {(key[0], key[2], key[3]) for key in H["f"].keys() if key[1] == inst}
+            lft, rght = plan.feature_range["$close"]
+            self.assertNotIn(("$close", lft, rght), keys)
+            self.assertNotIn(("Mean($close,5)", lft, rght), keys)
+            self.assertIn(("Div(Mean($close,5),$close)", lft, rght), keys)
+            self.assertIn(("$close", lft + 4, rght), keys)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.data import Inst
+from qlib.data.filter import ExpressionDFilter, NameDFilter
+from qlib.data.inst_index import InstrumentSpanIndex
+from qlib.tests import TestAutoData
+
+
+class TestInstrumentSpanIndex(TestAutoData):
+    @staticmethod
+    def _members(spans, start_time, end_time):
+        res = {}
+        for inst, inst_spans in spans.items():
+            clipped = [(max(start_time, s), min(end_time, e)) for s, e in inst_spans]
+            clipped = [(s, e) for s, e in clipped if s <= e]
+            if clipped:
+                res[inst] = clipped
+        return res
+
+    def test_members(self):
+        spans = Inst._load_instruments("csi300", freq="day")
+        index = Inst.span_index("csi300")
+        self.assertIs(index, H["i"]["csi300", "day"])
+        calendar = D.calendar()
+        for start_time, end_time in [
+            (calendar[0], calendar[-1]),
+            (pd.Timestamp("2010-01-01"), pd.Timestamp("2012-12-31")),
+            (pd.Timestamp("2018-03-05"), pd.Timestamp("2018-03-05")),
+        ]:
+            expected = self._members(spans, start_time, end_time)
+            members = index.members(start_time, end_time).to_dict()
+            self.assertListEqual(list(members), list(expected))
+            self.assertDictEqual(members, expected)
+        self.assertDictEqual(
+            D.list_instruments(D.instruments("csi300"), "2010-01-01", "2012-12-31"),
+            self._members(spans, pd.Timestamp("2010-01-01"), pd.Timestamp("2012-12-31")),
+        )
+
+    def test_mask(self):
+        calendar = D.calendar(start_time="2010-01-01", end_time="2012-12-31")
+        index = Inst.span_index("csi300").members(calendar[0], calendar[-1])
+        mask = index.mask(calendar)
+        self.assertEqual(mask.shape, (len(calendar), len(index)))
+        for i, (inst, spans) in enumerate(index.to_dict().items()):
+            expected = np.zeros(len(calendar), dtype=bool)
+            for start, end in spans:
+                expected |= (calendar >= start) & (calendar <= end)
+            np.testing.assert_array_equal(mask[:, i], expected, err_msg=inst)
+        # the spans are recovered from the mask
+        self.assertDictEqual(
+            InstrumentSpanIndex.from_mask(index.instruments, calendar, mask).to_dict(), index.to_dict()
+        )
+
+    def test_filter(self):
+        start_time, end_time = "2018-01-01", "2018-12-31"
+        instruments = D.instruments("csi300", filter_pipe=[ExpressionDFilter("$close > 50"), NameDFilter("SH")])
+        res = D.list_instruments(instruments, start_time, end_time)
+        self.assertTrue(all(inst.startswith("SH") for inst in res))
+
+        calendar = pd.DatetimeIndex(D.calendar(start_time=start_time, end_time=end_time))
+        members = D.list_instruments(D.instruments("csi300"), start_time, end_time)
+        close = D.features(list(members), ["$close"], start_time, end_time)["$close"]
+        for inst, spans in members.items():
+            if not inst.startswith("SH"):
+                continue
+            expected = np.zeros(len(calendar), dtype=bool)
+            for start, end in spans:
+                expected |= (calendar >= start) & (calendar <= end)
+            if inst in close:
+                # the dates out of the range of the features are not filtered
+                rule = close[inst] > 50
+                in_range = (calendar >= rule.index[0]) & (calendar <= rule.index[-1])
+                expected &= ~in_range | rule.reindex(calendar, fill_value=False).values
+            else:
+                expected[:] = False
+            result = np.zeros(len(calendar), dtype=bool)
+            for start, end in res.get(inst, []):
+                result |= (calendar >= start) & (calendar <= end)
+            np.testing.assert_array_equal(result, expected, err_msg=inst)
+
+    @staticmethod
+    def _to_mask(spans, calendar):
+        mask = pd.DataFrame(False, index=calendar, columns=list(spans))
+        for inst, inst_spans in spans.items():
+            for start, end in inst_spans:
+                mask.loc[start:end, inst] = True
+        return mask
+
+    def test_panel_filter(self):
+        start_time, end_time = "2018-01-01", "2018-03-31"
+        calendar = pd.DatetimeIndex(D.calendar(start_time=start_time, end_time=end_time))
+        members = D.list_instruments(D.instruments("csi300"), start_time, end_time)
+        close = D.features(list(members), ["$close"], start_time, end_time)["$close"].unstack(level="instrument")
+        close = close.reindex(index=calendar, columns=list(members)).where(self._to_mask(members, calendar))
+
+        # the bool rule gives the same result as the series mode
+        self.assertDictEqual(
+            D.list_instruments(
+                D.instruments("csi300", filter_pipe=[ExpressionDFilter("$close > 50", panel=True)]),
+                start_time,
+                end_time,
+            ),
+            D.list_instruments(
+                D.instruments("csi300", filter_pipe=[ExpressionDFilter("$close > 50")]), start_time, end_time
+            ),
+        )
+
+        top_k = ExpressionDFilter("$close", top_k=10)
+        self.assertTrue(top_k.panel)
+        res = D.list_instruments(D.instruments("csi300", filter_pipe=[top_k]), start_time, end_time)
+        expected = close.rank(axis=1, method="first", ascending=False) <= 10
+        pd.testing.assert_frame_equal(self._to_mask(res, calendar), expected.loc[:, expected.any()], check_names=False)
+
+        pct = ExpressionDFilter("$close", pct_range=(0.9, 1.0), fstart_time="2018-02-01")
+        res = D.list_instruments(D.instruments("csi300", filter_pipe=[pct]), start_time, end_time)
+        expected = close.rank(axis=1, pct=True) >= 0.9
+        # the dates before the filter start time are not filtered
+        expected.loc[:"2018-01-31"] = self._to_mask(members, calendar).loc[:"2018-01-31"]
+        pd.testing.assert_frame_equal(self._to_mask(res, calendar), expected.loc[:, expected.any()], check_names=False)
+
+        # the config is recovered
+        self.assertDictEqual(ExpressionDFilter.from_config(pct.to_config()).to_config(), pct.to_config())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import pandas as pd
+
+from qlib.data import D
+from qlib.data.filter import NameDFilter
+from qlib.tests import TestAutoData
+
+
+class TestIterFeatures(TestAutoData):
+    FIELDS = ["$close", "Mean($close, 5)", "Ref($volume, 1)"]
+
+    def test_chunk_by_instrument(self):
+        instruments = D.instruments("csi300", filter_pipe=[NameDFilter("SH")])
+        expected = D.features(instruments, self.FIELDS, "2018-01-01", "2018-12-31")
+        chunks = list(D.iter_features(instruments, self.FIELDS, "2018-01-01", "2018-12-31", chunk_size=50))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.index.unique(level="instrument")), 50)
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+    def test_chunk_by_date(self):
+        instruments = ["SH600000", "SH600004", "SZ000001"]
+        expected = D.features(instruments, self.FIELDS, "2018-01-01", "2018-12-31")
+        chunks = list(
+            D.iter_features(instruments, self.FIELDS, "2018-01-01", "2018-12-31", chunk_by="date", chunk_size=20)
+        )
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.index.unique(level="datetime")), 20)
+        pd.testing.assert_frame_equal(pd.concat(chunks).sort_index(), expected)
+
+        with self.assertRaises(ValueError):
+            next(D.iter_features(instruments, self.FIELDS, chunk_by="month"))
+
+    def test_chunk_by_date_range_variant(self):
+        # the fields depending on all the history of the range are interleaved with the others
+        fields = ["$close", "Mean($close, 0)", "Ref($volume, 1)", "EMA($close, 0)", "Sum($volume, 0)", "$open"]
+        instruments = ["SH600000", "SZ000001"]
+        expected = D.features(instruments, fields, "2018-01-01", "2018-12-31")
+        chunks = list(D.iter_features(instruments, fields, "2018-01-01", "2018-12-31", chunk_by="date", chunk_size=20))
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertListEqual(chunk.columns.tolist(), fields)
+            self.assertLessEqual(len(chunk.index.unique(level="datetime")), 20)
+        pd.testing.assert_frame_equal(pd.concat(chunks).sort_index(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
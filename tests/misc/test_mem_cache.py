@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.cache import MemCache, MemCacheBytesUnit, MemCacheLengthUnit
+
+
+class TestMemCache(unittest.TestCase):
+    def test_lru_stats(self):
+        unit = MemCacheLengthUnit(3)
+        for i in range(3):
+            unit[i] = i
+        self.assertEqual(unit.get(0), 0)  # 0 becomes the latest
+        unit[3] = 3
+        self.assertIsNone(unit.get(1))
+        self.assertListEqual(unit.keys(), [2, 0, 3])
+        # the membership checks and `__getitem__` don't change the counters
+        self.assertNotIn(1, unit)
+        self.assertEqual(unit[3], 3)
+        with self.assertRaises(KeyError):
+            unit[1]  # pylint: disable=W0104
+        stats = unit.stats
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["items"], 3)
+
+    def test_pin(self):
+        unit = MemCacheLengthUnit(3)
+        unit["leaf"] = 0
+        unit.pin("leaf")
+        for i in range(4):
+            unit[i] = i
+        # the pinned item is kept although it is the oldest
+        self.assertIn("leaf", unit)
+        self.assertListEqual(unit.keys(), [2, 3, "leaf"])
+        self.assertEqual(unit.stats["pinned"], 1)
+
+        unit.set_limit_size(1)
+        self.assertListEqual(unit.keys(), ["leaf"])
+        self.assertEqual(unit.pop("leaf"), 0)
+        self.assertEqual(unit.total_size, 0)
+
+    def test_bytes(self):
+        unit = MemCacheBytesUnit(3000)
+        s = pd.Series(np.zeros(100, dtype=np.float32), index=np.arange(100))
+        size = s.values.nbytes + s.index.nbytes
+        unit["a"] = s
+        self.assertEqual(unit.total_size, size)
+        unit["b"] = s
+        unit["c"] = s
+        self.assertListEqual(unit.keys(), ["b", "c"])
+        unit["b"] = s.iloc[:10]
+        self.assertEqual(unit.total_size, size + s.values[:10].nbytes + s.index[:10].nbytes)
+
+    def test_namespace_limit(self):
+        cache = MemCache({"c": 1, "f": 2}, {"c": "length", "f": "bytes"})
+        self.assertIsInstance(cache["f"], MemCacheBytesUnit)
+        self.assertFalse(cache["i"].limited)
+        for i in range(3):
+            cache["i"][i] = i
+            cache["c"][i] = i
+        self.assertEqual(len(cache["i"]), 3)
+        self.assertEqual(len(cache["c"]), 1)
+
+        # the items are kept after changing the limits
+        cache.set_limit(2, "length")
+        self.assertIsInstance(cache["f"], MemCacheLengthUnit)
+        self.assertListEqual(cache["i"].keys(), [1, 2])
+        self.assertListEqual(cache["c"].keys(), [2])
+        self.assertEqual(cache.stats["i"]["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data import D, LocalDatasetProvider, PanelDatasetProvider
+from qlib.tests import TestAutoData
+
+
+class TestPanelDataset(TestAutoData):
+    FIELDS = [
+        "$close",
+        "Ref($close, 1) / $close - 1",
+        "Mean($close, 5) / $close",
+        "Std($volume, 20)",
+        "EMA($close, 10)",
+        "Delta($close, 3)",
+        "Max($high, 5) - Min($low, 5)",
+        "Sign($close - $open)",
+        "If($close > Ref($close, 1), 1, 0)",
+        "Rank($close, 10)",
+        "Quantile($close, 10, 0.8)",
+        "Slope($close, 10)",
+        "Rsquare($close, 10)",
+        "Corr($close, Log($volume + 1), 10)",
+        "Cov($close, $volume, 10)",
+        "Mean($close, 0)",
+        # fields without panel calculation fall back to the per-instrument calculation
+        "IdxMax($high, 10)",
+        "Ref($close, 0)",
+    ]
+
+    def _check(self, instruments, start_time, end_time):
+        expected = LocalDatasetProvider().dataset(instruments, self.FIELDS, start_time, end_time)
+        # small chunks to check the results of different chunks are concatenated in order
+        data = PanelDatasetProvider(chunk_size=7).dataset(instruments, self.FIELDS, start_time, end_time)
+
+        self.assertTrue(data.index.equals(expected.index))
+        self.assertListEqual(list(data.columns), list(expected.columns))
+        for col in self.FIELDS:
+            self.assertEqual(data[col].dtype, np.float32)
+            np.testing.assert_allclose(data[col].values, expected[col].values, rtol=1e-4, atol=1e-5, err_msg=col)
+
+    def test_panel_dataset(self):
+        self._check(D.instruments("csi300"), "2018-01-01", "2020-12-31")
+
+    def test_panel_dataset_list(self):
+        # SZ300677 is listed during the queried range
+        self._check(["SH600519", "SZ300677", "SH600110"], "2017-01-01", "2020-12-31")
+
+    def test_panel_dataset_empty(self):
+        data = PanelDatasetProvider().dataset(["SH600519"], self.FIELDS, "2000-01-01", "2000-12-31")
+        self.assertTrue(data.empty)
+        self.assertListEqual(list(data.columns), self.FIELDS)
+        self.assertIsInstance(data.index, pd.MultiIndex)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import shutil
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import qlib
+from qlib.config import C, REG_CN
+from qlib.data import D
+from qlib.data.data import Cal, ExpressionD, PITD, PITTimeline
+from qlib.tests import TestAutoData
+from qlib.utils import read_period_data, read_period_data_batch
+from scripts.dump_pit import DumpPitData
+
+
+class TestPITTimeline(TestAutoData):
+    # (date, period, value); 201804 is published after 201901, and 201901 & 201902 are revised later
+    RECORDS = [
+        ("2019-04-20", 201901, 1.0),
+        ("2019-04-25", 201804, 4.0),
+        ("2019-05-10", 201901, 1.5),
+        ("2019-08-20", 201902, 2.0),
+        ("2019-10-25", 201903, 3.0),
+        ("2019-12-02", 201902, 2.5),
+        ("2020-04-28", 201904, 4.5),
+        ("2020-04-29", 202001, 5.5),
+    ]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        # the period data are placed under the `provider_uri` of all the frequencies
+        qlib.init(provider_uri=cls.provider_uri, region=REG_CN, expression_cache=None, dataset_cache=None)
+        csv_dir = Path(tempfile.mkdtemp())
+        df = pd.DataFrame(cls.RECORDS, columns=["date", "period", "value"])
+        df["field"] = "roe"
+        # the revisions of the second dump are linked to the existing ones (a new year is required to update)
+        for n in [4, len(df)]:
+            df.iloc[:n].to_csv(csv_dir.joinpath("sh600519.csv"), index=False)
+            DumpPitData(csv_path=csv_dir, qlib_dir=cls.provider_uri, max_workers=1).dump(interval="quarterly")
+        shutil.rmtree(csv_dir)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(Path(cls.provider_uri).expanduser().joinpath("financial"))
+
+    def test_timeline(self):
+        timeline = PITD.period_timeline("SH600519", "$$roe_q")
+        self.assertIs(timeline, PITD.period_timeline("SH600519", "$$roe_q"))
+        fin_dir = C.dpm.get_data_uri() / "financial" / "sh600519"
+        calendar = D.calendar(start_time="2019-04-01", end_time="2020-06-30")
+        cur_date_int = PITTimeline.date_to_int(pd.DatetimeIndex(calendar)).values
+        periods = [201804, 201901, 201902, 201903, 201904]
+        # the same as walking the linked revisions on the disk
+        for period in periods:
+            expected = [
+                read_period_data(fin_dir / "roe_q.index", fin_dir / "roe_q.data", period, cur, True)[0]
+                for cur in cur_date_int
+            ]
+            np.testing.assert_array_equal(timeline.values(period, cur_date_int), expected)
+        values, indexes = read_period_data_batch(
+            fin_dir / "roe_q.index", fin_dir / "roe_q.data", [201901, 201902, 201902, 201904], 20191202, True
+        )
+        np.testing.assert_array_equal(values, [1.5, 2.5, 2.5, np.nan])
+        record_size = struct.calcsize("".join(C.pit_record_type.values()))
+        np.testing.assert_array_equal(indexes, [2 * record_size, 5 * record_size, 5 * record_size, 0xFFFFFFFF])
+        self.assertListEqual(timeline.period_list(20190420), [201901])
+        self.assertListEqual(timeline.period_list(20190425), [201804, 201901])
+        self.assertListEqual(timeline.period_list(20190101), [])
+
+    def test_operator(self):
+        fields = ["P($$roe_q)", "PRef($$roe_q, 201902)", "P(Mean($$roe_q, 2))", "P($$roe_q / ($$roe_q + 1))"]
+        df = D.features(["SH600519", "SZ300677"], fields, start_time="2019-04-01", end_time="2020-06-30")
+        data = df.loc["SH600519"]
+        expected = {
+            "2019-04-19": [np.nan, np.nan, np.nan],
+            "2019-04-22": [1.0, np.nan, 1.0],
+            "2019-04-25": [1.0, np.nan, 2.5],
+            "2019-05-10": [1.5, np.nan, 2.75],
+            "2019-08-20": [2.0, 2.0, 1.75],
+            "2019-12-02": [3.0, 2.5, 2.75],
+            "2020-04-28": [4.5, 2.5, 3.75],
+        }
+        for date, values in expected.items():
+            np.testing.assert_allclose(data.loc[date, fields[:3]].values.astype(float), values)
+        np.testing.assert_allclose(data[fields[3]], data[fields[0]] / (data[fields[0]] + 1), rtol=1e-6)
+        # the period data of SZ300677 do not exist
+        self.assertTrue(df.drop("SH600519", level="instrument").isna().all().all())
+
+        # the same as calculating the expression day by day
+        expression = ExpressionD.get_expression_instance(fields[2])
+        _, _, start_index, end_index = Cal.locate_index("2019-04-01", "2020-06-30", "day")
+        series = expression.load("SH600519", start_index, end_index, "day")
+        cur_times = D.calendar(start_time="2019-04-01", end_time="2020-06-30")
+        expected = [expression._load_feature("SH600519", -1, 0, cur_time) for cur_time in cur_times]
+        expected = [s.iloc[-1] if len(s) > 0 else np.nan for s in expected]
+        np.testing.assert_allclose(series.values, expected, rtol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
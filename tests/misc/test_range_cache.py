@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+
+from qlib.contrib.ops.high_freq import FFillNan
+from qlib.data.cache import H
+from qlib.data.base import Feature
+from qlib.data.data import DatasetProvider, ExpressionD
+from qlib.data.ops import Mean
+from qlib.tests import TestAutoData
+
+
+class TestRangeCache(TestAutoData):
+    _setup_kwargs = {"mem_cache_range": True}
+    FIELDS = ["$close", "Mean($close, 5) / $close", "Corr($close, Log($volume + 1), 10)", "Ref($close, -2)"]
+
+    def _expected(self, instrument, field, start_time, end_time):
+        H["f"].clear()
+        series = ExpressionD.expression(instrument, field, start_time, end_time)
+        H["f"].clear()
+        return series
+
+    @staticmethod
+    def _ranges(instrument, field):
+        return H["f"].get_ranges(str(ExpressionD.get_expression_instance(field)), instrument, "day")
+
+    def test_sub_range(self):
+        for field in self.FIELDS:
+            expected = self._expected("SH600519", field, "2018-03-01", "2018-06-30")
+            ExpressionD.expression("SH600519", field, "2018-01-01", "2018-12-31")
+            ranges = self._ranges("SH600519", field)
+            self.assertEqual(len(ranges), 1)
+            # served by slicing the cached range
+            series = ExpressionD.expression("SH600519", field, "2018-03-01", "2018-06-30")
+            self.assertListEqual(self._ranges("SH600519", field), ranges)
+            self.assertTrue(series.index.equals(expected.index))
+            np.testing.assert_array_equal(series.values, expected.values)
+
+    def test_merge_range(self):
+        field = "Mean($close, 5) / $close"
+        expected = self._expected("SZ300677", field, "2017-06-01", "2018-12-31")
+        # SZ300677 is listed during the first range
+        ExpressionD.expression("SZ300677", field, "2017-06-01", "2017-12-31")
+        ExpressionD.expression("SZ300677", field, "2018-03-01", "2018-12-31")
+        self.assertEqual(len(self._ranges("SZ300677", field)), 2)
+        # the gap between the ranges is calculated and all of them are merged
+        series = ExpressionD.expression("SZ300677", field, "2017-06-01", "2018-12-31")
+        self.assertEqual(len(self._ranges("SZ300677", field)), 1)
+        self.assertEqual(len(self._ranges("SZ300677", "$close")), 1)
+        self.assertTrue(series.index.equals(expected.index))
+        np.testing.assert_array_equal(series.values, expected.values)
+
+    def _calculate(self, instrument, start_time, end_time):
+        plan = DatasetProvider.get_expression_plan(self.FIELDS, start_time, end_time, "day")
+        return DatasetProvider.inst_calculator(instrument, start_time, end_time, "day", self.FIELDS, plan=plan)
+
+    def test_dataset(self):
+        for inst in ["SH600519", "SZ300677"]:
+            H["f"].clear()
+            expected = self._calculate(inst, "2018-02-01", "2018-10-31")
+            H["f"].clear()
+            self._calculate(inst, "2018-01-01", "2018-12-31")
+            keys = set(H["f"].keys())
+            data = self._calculate(inst, "2018-02-01", "2018-10-31")
+            # the fields are sliced from the cache without calculating the sub-expressions
+            self.assertEqual(len(set(H["f"].keys()) - keys), len(self.FIELDS))
+            self.assertTrue(data.index.equals(expected.index))
+            np.testing.assert_array_equal(data.values, expected.values)
+
+    def test_range_variant(self):
+        for field in ["EMA($close, 10)", "Mean($close, 0)", "Corr($close, $open, 0)"]:
+            expression = ExpressionD.get_expression_instance(field)
+            self.assertFalse(expression.is_range_invariant())
+            self.assertIsNone(expression.find_range("SH600519", 3000, 3100, "day"))
+        # opt-in: the subclasses and the custom operators are not range invariant unless they are audited
+        for expression in [FFillNan(Feature("close")), type("CustomMean", (Mean,), {})(Feature("close"), 5)]:
+            self.assertFalse(expression.is_range_invariant())
+        self.assertTrue(Mean(Feature("close"), 5).is_range_invariant())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from qlib.config import C
+from qlib.data.dataset import TSDataSampler, TSDatasetH
+from qlib.tests import TestAutoData
+
+
+class TestTSDataSampler(unittest.TestCase):
+    @staticmethod
+    def _data(n_dates=60, n_insts=8, seed=0):
+        rng = np.random.default_rng(seed)
+        index = pd.MultiIndex.from_product(
+            [pd.date_range("2020-01-01", periods=n_dates), [f"SH{i:06d}" for i in range(n_insts)]],
+            names=["datetime", "instrument"],
+        )
+        data = pd.DataFrame(rng.normal(size=(len(index), 3)), index=index, columns=["a", "b", "label"])
+        # the instruments are listed or delisted during the period, and some dates are missing
+        return data[rng.random(len(index)) > 0.2]
+
+    @staticmethod
+    def _expected(sampler, i):
+        indices = sampler._get_indices(*sampler._get_row_col(i))
+        return sampler.data_arr[np.nan_to_num(indices, nan=sampler.nan_idx).astype(int)]
+
+    def test_batch(self):
+        data = self._data()
+        flt_data = pd.Series(np.arange(len(data)) % 3 > 0, index=data.index)
+        for fillna_type in ["none", "ffill", "ffill+bfill"]:
+            for kwargs in [{}, {"flt_data": flt_data}]:
+                sampler = TSDataSampler(
+                    data.copy(), "2020-01-10", "2020-02-20", step_len=7, fillna_type=fillna_type, **kwargs
+                )
+                idx = np.random.default_rng(1).permutation(len(sampler))
+                expected = np.stack([self._expected(sampler, i) for i in idx])
+                np.testing.assert_array_equal(sampler[idx], expected)
+                np.testing.assert_array_equal(sampler[idx.tolist()], expected)
+                np.testing.assert_array_equal(sampler[int(idx[0])], expected[0])
+                # the sample by <datetime, instrument> is the same one
+                date, inst = sampler.get_index()[idx[0]]
+                np.testing.assert_array_equal(sampler[date, inst], expected[0])
+
+        with self.assertRaises(KeyError):
+            sampler[[0, len(sampler)]]
+
+    def test_config(self):
+        sampler = TSDataSampler(self._data(), "2020-01-10", "2020-02-20", step_len=7)
+        sampler.config(step_len=3, fillna_type="ffill")
+        idx = np.arange(len(sampler))
+        self.assertEqual(sampler[idx].shape, (len(sampler), 3, 3))
+        np.testing.assert_array_equal(sampler[idx], np.stack([self._expected(sampler, i) for i in idx]))
+
+    def test_cache(self):
+        cache_dir = Path(tempfile.mkdtemp())
+        try:
+            data = self._data()
+            expected = TSDataSampler(data.copy(), "2020-01-10", "2020-02-20", step_len=7, fillna_type="ffill")
+            sampler = TSDataSampler(
+                data.copy(), "2020-01-10", "2020-02-20", step_len=7, fillna_type="ffill", cache_path=cache_dir / "seg"
+            )
+            # only the cache is left in the directory
+            self.assertListEqual([p.name for p in cache_dir.iterdir()], ["seg"])
+            for res in [sampler, TSDataSampler.load(cache_dir / "seg"), pickle.loads(pickle.dumps(sampler))]:
+                self.assertIsInstance(res.data_arr, np.memmap)
+                self.assertEqual(res.fillna_type, "ffill")
+                idx = np.arange(len(expected))
+                np.testing.assert_array_equal(res[idx], expected[idx])
+                self.assertTrue(res.get_index().equals(expected.get_index()))
+                date, inst = expected.get_index()[3]
+                np.testing.assert_array_equal(res[date, inst], expected[date, inst])
+            # the pickled sampler only contains the path of the cache
+            self.assertLess(len(pickle.dumps(sampler)), sampler.data_arr.nbytes)
+
+            sampler.config(fillna_type="none")
+            expected.config(fillna_type="none")
+            np.testing.assert_array_equal(pickle.loads(pickle.dumps(sampler))[[0, 5]], expected[[0, 5]])
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+class TestTSDatasetCache(TestAutoData):
+    def test_cache(self):
+        handler = {
+            "class": "DataHandlerLP",
+            "module_path": "qlib.data.dataset.handler",
+            "kwargs": {
+                "instruments": ["SH600000", "SH600004", "SZ000001"],
+                "start_time": "2017-01-01",
+                "end_time": "2017-12-31",
+                "data_loader": {
+                    "class": "QlibDataLoader",
+                    "kwargs": {"config": {"feature": ["$close", "$volume"], "label": ["Ref($close, -1) / $close"]}},
+                },
+                "learn_processors": ["DropnaLabel"],
+            },
+        }
+        segments = {"train": ("2017-03-01", "2017-08-31"), "test": ("2017-09-01", "2017-12-31")}
+        cache_dir = tempfile.mkdtemp()
+        try:
+            expected = TSDatasetH(handler=handler, segments=segments, step_len=5)
+            dataset = TSDatasetH(handler=handler, segments=segments, step_len=5, cache_dir=cache_dir)
+            for kwargs in [{}, {"data_key": "learn"}]:
+                res = dataset.prepare(["train", "test"], **kwargs)
+                for seg, exp in zip(res, expected.prepare(["train", "test"], **kwargs)):
+                    self.assertIsInstance(seg.data_arr, np.memmap)
+                    np.testing.assert_array_equal(seg[np.arange(len(exp))], exp[np.arange(len(exp))])
+
+            # the handler is not set up when all the segments hit the cache
+            dataset = TSDatasetH(handler=handler, segments=segments, step_len=5, cache_dir=cache_dir)
+            train = dataset.prepare("train", data_key="learn")
+            self.assertFalse(hasattr(dataset.handler, "_data"))
+            exp = expected.prepare("train", data_key="learn")
+            np.testing.assert_array_equal(train[np.arange(len(exp))], exp[np.arange(len(exp))])
+            # the segment missing the cache sets up the handler
+            dataset.prepare(("2017-06-01", "2017-12-31"))
+            self.assertTrue(hasattr(dataset.handler, "_data"))
+
+            # the caches are not reused after the data is updated
+            path = C.dpm.get_data_uri("day").joinpath("features", "sh600000", "close.day.bin")
+            stat = path.stat()
+            try:
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+                dataset = TSDatasetH(handler=handler, segments=segments, step_len=5, cache_dir=cache_dir)
+                dataset.prepare("train", data_key="learn")
+                self.assertTrue(hasattr(dataset.handler, "_data"))
+            finally:
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qlib.data._libs.rolling import rolling_idxmax, rolling_idxmin, rolling_mad, rolling_wma
+from qlib.data._libs.expanding import expanding_idxmax, expanding_idxmin, expanding_mad, expanding_wma, expanding_ema
+
+
+# the pandas implementations which the compiled kernels replace
+def idxmax(x):
+    return x.argmax() + 1
+
+
+def idxmin(x):
+    return x.argmin() + 1
+
+
+def mad(x):
+    x1 = x[~np.isnan(x)]
+    return np.mean(np.abs(x1 - x1.mean()))
+
+
+def weighted_mean(x):
+    w = np.arange(len(x)) + 1
+    w = w / w.sum()
+    return np.nanmean(w * x)
+
+
+def exp_weighted_mean(x):
+    a = 1 - 2 / (1 + len(x))
+    w = a ** np.arange(len(x))[::-1]
+    w /= w.sum()
+    return np.nansum(w * x)
+
+
+class TestRollingKernels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        data = rng.normal(size=500).astype(np.float32)
+        # leading NaN, NaN gaps longer than the windows and ties
+        data[[0, 1, 50, 51, 52]] = np.nan
+        data[200:215] = np.nan
+        data[300:305] = 1.0
+        self.series = pd.Series(data)
+
+    def test_rolling(self):
+        for N in [1, 5, 10, 60]:
+            rolling = self.series.rolling(N, min_periods=1)
+            for func, kernel in [
+                (idxmax, rolling_idxmax),
+                (idxmin, rolling_idxmin),
+                (mad, rolling_mad),
+                (weighted_mean, rolling_wma),
+            ]:
+                np.testing.assert_allclose(
+                    kernel(self.series.values, N),
+                    rolling.apply(func, raw=True).values,
+                    rtol=1e-9,
+                    atol=1e-12,
+                    err_msg=f"{kernel.__name__}, N={N}",
+                )
+
+    def test_expanding(self):
+        expanding = self.series.expanding(min_periods=1)
+        for func, kernel in [
+            (idxmax, expanding_idxmax),
+            (idxmin, expanding_idxmin),
+            (mad, expanding_mad),
+            (weighted_mean, expanding_wma),
+            (exp_weighted_mean, expanding_ema),
+        ]:
+            np.testing.assert_allclose(
+                kernel(self.series.values),
+                expanding.apply(func, raw=True).values,
+                rtol=1e-9,
+                atol=1e-12,
+                err_msg=kernel.__name__,
+            )
+
+    def test_inf(self):
+        # the window functions of pandas treat +/-inf as NaN, e.g. the division by a zero volume
+        data = self.series.values.copy()
+        data[[3, 100, 101]] = np.inf
+        data[[40, 250]] = -np.inf
+        series = pd.Series(data)
+        for N in [3, 10, 60]:
+            rolling = series.rolling(N, min_periods=1)
+            for func, kernel in [
+                (idxmax, rolling_idxmax),
+                (idxmin, rolling_idxmin),
+                (mad, rolling_mad),
+                (weighted_mean, rolling_wma),
+            ]:
+                np.testing.assert_allclose(
+                    kernel(data, N),
+                    rolling.apply(func, raw=True).values,
+                    rtol=1e-9,
+                    atol=1e-12,
+                    err_msg=f"{kernel.__name__}, N={N}",
+                )
+        expanding = series.expanding(min_periods=1)
+        for func, kernel in [
+            (idxmax, expanding_idxmax),
+            (idxmin, expanding_idxmin),
+            (mad, expanding_mad),
+            (weighted_mean, expanding_wma),
+            (exp_weighted_mean, expanding_ema),
+        ]:
+            np.testing.assert_allclose(
+                kernel(data), expanding.apply(func, raw=True).values, rtol=1e-9, atol=1e-12, err_msg=kernel.__name__
+            )
+
+    def test_mad_level(self):
+        # the prices far from 0 and a window longer than the data
+        series = self.series.cumsum() + 1e4
+        for N in [5, 60, 1000]:
+            np.testing.assert_allclose(
+                rolling_mad(series.values, N),
+                series.rolling(N, min_periods=1).apply(mad, raw=True).values,
+                rtol=1e-9,
+                atol=1e-9,
+            )
+
+    def test_empty(self):
+        empty = np.array([], dtype=np.float32)
+        for kernel in [rolling_idxmax, rolling_idxmin, rolling_mad, rolling_wma]:
+            self.assertEqual(len(kernel(empty, 5)), 0)
+        for kernel in [expanding_idxmax, expanding_idxmin, expanding_mad, expanding_wma, expanding_ema]:
+            self.assertEqual(len(kernel(empty)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,18 +2,26 @@
 # Licensed under the MIT License.
 
 
+import sys
+import shutil
 from pathlib import Path
 from collections.abc import Iterable
 
 import numpy as np
+import pandas as pd
 from qlib.tests import TestAutoData
 
 from qlib.data.storage.file_storage import (
     FileCalendarStorage as CalendarStorage,
     FileInstrumentStorage as InstrumentStorage,
     FileFeatureStorage as FeatureStorage,
+    MmapFeatureStorage,
+    BundleFeatureStorage,
 )
 
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.joinpath("scripts")))
+from dump_bin import DumpBundle
+
 _file_name = Path(__file__).name.split(".")[0]
 DATA_DIR = Path(__file__).parent.joinpath(f"{_file_name}_data")
 QLIB_DIR = DATA_DIR.joinpath("qlib")
@@ -169,3 +177,71 @@ class TestStorage(TestAutoData):
             print(feature[:].empty)
         with self.assertRaises(ValueError):
             print(feature.data.empty)
+
+    def test_mmap_feature_storage(self):
+        file_feature = FeatureStorage(instrument="SZ300677", field="close", freq="day", provider_uri=self.provider_uri)
+        feature = MmapFeatureStorage(instrument="SZ300677", field="close", freq="day", provider_uri=self.provider_uri)
+
+        assert feature.start_index == file_feature.start_index
+        assert len(feature) == len(file_feature)
+        with self.assertRaises(IndexError):
+            print(feature[0])
+        assert feature[3049] == file_feature[3049]
+        for s in [slice(3049, 3052), slice(None, 3052), slice(3049, None), slice(None, None), slice(0, 10)]:
+            pd.testing.assert_series_equal(feature[s], file_feature[s])
+
+        # The slices are views of the same mapped file
+        data = feature[:].values
+        assert not data.flags.writeable
+        assert np.shares_memory(data, feature[3049:3052].values)
+
+        # The mapped handle is released after writing
+        qlib_dir = QLIB_DIR.joinpath("mmap")
+        qlib_dir.joinpath("calendars").mkdir(parents=True, exist_ok=True)
+        qlib_dir.joinpath("calendars", "day.txt").write_text("2020-01-01\n")
+        feature = MmapFeatureStorage(instrument="SH600000", field="close", freq="day", provider_uri=str(qlib_dir))
+        feature.uri.parent.mkdir(parents=True, exist_ok=True)
+        feature.clear()
+        assert feature[:].empty
+        feature.uri.unlink()
+        feature.write(np.arange(3), index=2)
+        assert feature.start_index == 2 and feature.end_index == 4
+        feature.write(np.arange(2), index=6)
+        pd.testing.assert_series_equal(
+            feature[:], pd.Series([0, 1, 2, np.nan, 0, 1], index=pd.RangeIndex(2, 8), dtype=np.float32)
+        )
+
+        feature = MmapFeatureStorage(instrument="SH600004", field="close", freq="day", provider_uri="not_fount")
+        with self.assertRaises(ValueError):
+            print(feature[:].empty)
+
+    def test_bundle_feature_storage(self):
+        src_dir = Path(self.provider_uri).expanduser()
+        qlib_dir = QLIB_DIR.joinpath("bundle")
+        shutil.rmtree(qlib_dir, ignore_errors=True)
+        shutil.copytree(src_dir.joinpath("calendars"), qlib_dir.joinpath("calendars"))
+        shutil.copytree(src_dir.joinpath("features", "sz300677"), qlib_dir.joinpath("features", "sz300677"))
+        DumpBundle.bundle_instrument(qlib_dir.joinpath("features", "sz300677"), "day", include_fields=["open", "close"])
+        assert set(BundleFeatureStorage.read_bundle(qlib_dir.joinpath("features", "sz300677", "day.bundle"))) == {
+            "open",
+            "close",
+        }
+
+        for field in ["close", "open", "volume"]:
+            file_feature = FeatureStorage(instrument="SZ300677", field=field, freq="day", provider_uri=str(qlib_dir))
+            feature = BundleFeatureStorage(instrument="SZ300677", field=field, freq="day", provider_uri=str(qlib_dir))
+            assert feature.start_index == file_feature.start_index
+            assert len(feature) == len(file_feature)
+            assert feature[3049] == file_feature[3049]
+            for s in [slice(3049, 3052), slice(None, 3052), slice(3049, None), slice(None, None), slice(0, 10)]:
+                pd.testing.assert_series_equal(feature[s], file_feature[s])
+
+        # the data of bundled fields comes from the bundle
+        qlib_dir.joinpath("features", "sz300677", "close.day.bin").unlink()
+        feature = BundleFeatureStorage(instrument="SZ300677", field="close", freq="day", provider_uri=str(qlib_dir))
+        assert not feature[:].empty
+        with self.assertRaises(PermissionError):
+            feature.write(np.arange(3))
+
+        feature = BundleFeatureStorage(instrument="SZ300677", field="not_found", freq="day", provider_uri=str(qlib_dir))
+        assert feature[:].empty